@@ -450,7 +450,8 @@ if gpu_sparse:
   if gpu_sparse.cuda_is_supported:
     mlir.register_lowering(
         csr_matvec_p,
-        partial(_csr_matvec_gpu_lowering, gpu_sparse.cuda_csr_matvec),
+        partial(_csr_matvec_gpu_lowering,
+                getattr(gpu_sparse, "cuda_spmv_auto", gpu_sparse.cuda_csr_matvec)),
         platform='cuda')
   if gpu_sparse.rocm_is_supported:
     mlir.register_lowering(
@@ -509,10 +510,17 @@ def _csr_matmat_abstract_eval(data, indices, indptr, B, *, shape, transpose):
 _csr_matmat_lowering = mlir.lower_fun(_csr_matmat_impl, multiple_results=False)
 
 def _csr_matmat_gpu_lowering(csr_matmat_mhlo, ctx, data, indices, indptr, B, *,
-                             shape, transpose):
+                             shape, transpose, float16_supported=None):
   data_aval, indices_aval, _, B_aval = ctx.avals_in
   dtype = data_aval.dtype
-  if dtype not in [np.float32, np.float64, np.complex64, np.complex128]:
+  # `float16_supported`, if given, tells which float16 products
+  # `csr_matmat_mhlo` handles.
+  float16 = (dtype == np.float16 and float16_supported is not None and
+             float16_supported(transpose=transpose, compute_dtype=None,
+                               index_dtype=indices_aval.dtype, data_dtype=dtype,
+                               B_dtype=B_aval.dtype))
+  if not float16 and dtype not in [np.float32, np.float64, np.complex64,
+                                   np.complex128]:
     warnings.warn(f"csr_matmat cusparse/hipsparse lowering not available for dtype={dtype}. "
                   "Falling back to default implementation.", CuSparseEfficiencyWarning)
     return _csr_matmat_lowering(ctx, data, indices, indptr, B, shape=shape,
@@ -548,7 +556,10 @@ if gpu_sparse:
   if gpu_sparse.cuda_is_supported:
     mlir.register_lowering(
         csr_matmat_p,
-        partial(_csr_matmat_gpu_lowering, gpu_sparse.cuda_csr_matmat),
+        partial(_csr_matmat_gpu_lowering,
+                getattr(gpu_sparse, "cuda_spmm_auto", gpu_sparse.cuda_csr_matmat),
+                float16_supported=getattr(
+                    gpu_sparse, "cuda_csr_matmat_tiled_supported", None)),
         platform='cuda')
   if gpu_sparse.rocm_is_supported:
     mlir.register_lowering(
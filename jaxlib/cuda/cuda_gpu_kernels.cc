@@ -19,6 +19,7 @@ limitations under the License.
 #include "jaxlib/cuda/cublas_kernels.h"
 #include "jaxlib/cuda/cuda_lu_pivot_kernels.h"
 #include "jaxlib/cuda/cuda_prng_kernels.h"
+#include "jaxlib/cuda/cuda_sparse_kernels.h"
 #include "jaxlib/cuda/cusolver_kernels.h"
 #include "jaxlib/cuda/cusparse_kernels.h"
 #include "tensorflow/compiler/xla/service/custom_call_target_registry.h"
@@ -56,15 +57,42 @@ XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_coo_todense", CooToDense,
                                          "CUDA");
 XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_coo_fromdense", CooFromDense,
                                          "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_coo_fromdense_packed",
+                                         CooFromDensePacked, "CUDA");
 XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_coo_matvec", CooMatvec,
                                          "CUDA");
 XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_coo_matmat", CooMatmat,
                                          "CUDA");
 #endif
+#if JAX_CUSPARSE_11400
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_bsr_matmat", BsrMatmat,
+                                         "CUDA");
+#endif
+#if JAX_CUSPARSELT
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_spmm24", Spmm24, "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_spmm24_compress",
+                                         Spmm24Compress, "CUDA");
+#endif
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_csr2coo", Csr2Coo, "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_csr2csc", Csr2Csc, "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_densemv_sparse",
+                                         DenseMvSparse, "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_csr_matvec_light",
+                                         CsrMatvecLight, "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_csr_fromdense_fast",
+                                         CsrFromDenseFast, "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_csr_matvec_grouped",
+                                         CsrMatvecGrouped, "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_csr_matmat_tiled",
+                                         CsrMatmatTiled, "CUDA");
 XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_gtsv2_f32", gtsv2_f32,
                                          "CUDA");
 XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_gtsv2_f64", gtsv2_f64,
                                          "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_gtsv2_batched_f32",
+                                         gtsv2_batched_f32, "CUDA");
+XLA_REGISTER_CUSTOM_CALL_TARGET_WITH_SYM("cusparse_gtsv2_batched_f64",
+                                         gtsv2_batched_f64, "CUDA");
 
 }  // namespace
 }  // namespace jax
@@ -0,0 +1,179 @@
+/* Copyright 2022 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+==============================================================================*/
+
+#include "jaxlib/cuda/cuda_sparse_kernels.h"
+
+#include <cstring>
+#include <string_view>
+#include <vector>
+
+#include "absl/status/status.h"
+#include "absl/strings/str_format.h"
+#include "jaxlib/cuda/cuda_gpu_kernel_helpers.h"
+#include "jaxlib/kernel_helpers.h"
+#include "tensorflow/compiler/xla/service/custom_call_status.h"
+
+namespace jax {
+namespace {
+
+// Returns an error unless the hand-written kernels support `type`.
+absl::Status CheckKernelType(cudaDataType type) {
+  if (type != CUDA_R_32F && type != CUDA_R_64F) {
+    return absl::InvalidArgumentError(
+        absl::StrFormat("Unsupported data type: %d", type));
+  }
+  return absl::OkStatus();
+}
+
+absl::Status DenseMvSparse_(cudaStream_t stream, void** buffers,
+                            const char* opaque, std::size_t opaque_len) {
+  auto s = UnpackDescriptor<DenseMvSparseDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  JAX_RETURN_IF_ERROR(CheckKernelType((**s).type));
+  LaunchDenseMvSparseKernel(stream, buffers, **s);
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaGetLastError()));
+  return absl::OkStatus();
+}
+
+absl::Status CsrMatvecLight_(cudaStream_t stream, void** buffers,
+                             const char* opaque, std::size_t opaque_len) {
+  auto s = UnpackDescriptor<CsrMatvecLightDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  JAX_RETURN_IF_ERROR(CheckKernelType((**s).type));
+  JAX_RETURN_IF_ERROR(LaunchCsrMatvecLightKernel(stream, buffers, **s));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaGetLastError()));
+  return absl::OkStatus();
+}
+
+absl::Status CsrFromDenseFast_(cudaStream_t stream, void** buffers,
+                               const char* opaque, std::size_t opaque_len) {
+  auto s = UnpackDescriptor<CsrFromDenseFastDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  JAX_RETURN_IF_ERROR(CheckKernelType((**s).value_type));
+  if ((**s).index_type != CUDA_R_32I && (**s).index_type != CUDA_R_64I) {
+    return absl::InvalidArgumentError(
+        absl::StrFormat("Unsupported index type: %d", (**s).index_type));
+  }
+  JAX_RETURN_IF_ERROR(LaunchCsrFromDenseFastKernels(stream, buffers, **s));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaGetLastError()));
+  return absl::OkStatus();
+}
+
+absl::Status CsrMatvecGrouped_(cudaStream_t stream, void** buffers,
+                               const char* opaque, std::size_t opaque_len) {
+  if (opaque_len < sizeof(CsrMatvecGroupedDescriptor)) {
+    return absl::InternalError("Invalid size for operation descriptor.");
+  }
+  CsrMatvecGroupedDescriptor d;
+  std::memcpy(&d, opaque, sizeof(d));
+  if (opaque_len != sizeof(d) + d.group_count * sizeof(CsrMatvecGroupShape)) {
+    return absl::InternalError("Invalid size for operation descriptor.");
+  }
+  JAX_RETURN_IF_ERROR(CheckKernelType(d.type));
+  std::vector<CsrMatvecGroupShape> shapes(d.group_count);
+  std::memcpy(shapes.data(), opaque + sizeof(d),
+              d.group_count * sizeof(CsrMatvecGroupShape));
+
+  std::vector<CsrMatvecGroupTask> tasks(d.group_count);
+  std::int64_t total_rows = 0;
+  for (int i = 0; i < d.group_count; ++i) {
+    void** group = buffers + 4 * i;
+    tasks[i] = CsrMatvecGroupTask{
+        group[0],
+        static_cast<const std::int32_t*>(group[1]),
+        static_cast<const std::int32_t*>(group[2]),
+        group[3],
+        buffers[4 * d.group_count + i],
+        total_rows,
+        shapes[i].rows};
+    total_rows += shapes[i].rows;
+  }
+  if (total_rows == 0) {
+    return absl::OkStatus();
+  }
+  // The copy is staged from pageable memory before cudaMemcpyAsync returns,
+  // so `tasks` may go out of scope afterwards.
+  auto* device_tasks =
+      static_cast<CsrMatvecGroupTask*>(buffers[5 * d.group_count]);
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaMemcpyAsync(
+      device_tasks, tasks.data(), tasks.size() * sizeof(CsrMatvecGroupTask),
+      cudaMemcpyHostToDevice, stream)));
+  LaunchCsrMatvecGroupedKernel(stream, d.type, device_tasks, d.group_count,
+                               total_rows);
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaGetLastError()));
+  return absl::OkStatus();
+}
+
+absl::Status CsrMatmatTiled_(cudaStream_t stream, void** buffers,
+                             const char* opaque, std::size_t opaque_len) {
+  auto s = UnpackDescriptor<CsrMatmatTiledDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  if ((**s).out_type != CUDA_R_16F && (**s).out_type != CUDA_R_32F) {
+    return absl::InvalidArgumentError(
+        absl::StrFormat("Unsupported data type: %d", (**s).out_type));
+  }
+  LaunchCsrMatmatTiledKernel(stream, buffers, **s);
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaGetLastError()));
+  return absl::OkStatus();
+}
+
+}  // namespace
+
+void DenseMvSparse(cudaStream_t stream, void** buffers, const char* opaque,
+                   size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = DenseMvSparse_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    std::string_view message = s.message();
+    XlaCustomCallStatusSetFailure(status, message.data(), message.length());
+  }
+}
+
+void CsrFromDenseFast(cudaStream_t stream, void** buffers, const char* opaque,
+                      size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = CsrFromDenseFast_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    std::string_view message = s.message();
+    XlaCustomCallStatusSetFailure(status, message.data(), message.length());
+  }
+}
+
+void CsrMatvecLight(cudaStream_t stream, void** buffers, const char* opaque,
+                    size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = CsrMatvecLight_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    std::string_view message = s.message();
+    XlaCustomCallStatusSetFailure(status, message.data(), message.length());
+  }
+}
+
+void CsrMatvecGrouped(cudaStream_t stream, void** buffers, const char* opaque,
+                      size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = CsrMatvecGrouped_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    std::string_view message = s.message();
+    XlaCustomCallStatusSetFailure(status, message.data(), message.length());
+  }
+}
+
+void CsrMatmatTiled(cudaStream_t stream, void** buffers, const char* opaque,
+                    size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = CsrMatmatTiled_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    std::string_view message = s.message();
+    XlaCustomCallStatusSetFailure(status, message.data(), message.length());
+  }
+}
+
+}  // namespace jax
@@ -0,0 +1,712 @@
+/* Copyright 2022 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+==============================================================================*/
+
+#include "jaxlib/cuda/cuda_sparse_kernels.h"
+
+#include <algorithm>
+#include <cassert>
+#include <climits>
+#include <cstdint>
+
+#include "absl/status/status.h"
+#include "cub/device/device_scan.cuh"
+#include "jaxlib/cuda/cuda_gpu_kernel_helpers.h"
+#include "third_party/gpus/cuda/include/cuda_fp16.h"
+
+namespace jax {
+namespace {
+
+constexpr int kWarpSize = 32;
+
+template <typename T>
+__device__ T WarpSum(T value) {
+  for (int offset = kWarpSize / 2; offset > 0; offset /= 2) {
+    value += __shfl_down_sync(0xffffffff, value, offset);
+  }
+  return value;
+}
+
+template <typename I>
+__global__ void CsrCheckInvariantsKernel(const I* indptr, std::int32_t rows,
+                                         std::int32_t nnz) {
+  assert(indptr[rows] == nnz);
+}
+
+// Whether the product with a matrix entry is skipped. NaNs are never skipped,
+// as they are nonzeros of the matrix.
+template <typename T>
+__device__ bool Negligible(T value, T eps) {
+  return fabs(value) <= eps;
+}
+
+// Computes y = A @ x. Each warp reduces one row of A, reading it with
+// coalesced loads and skipping the products of negligible entries.
+template <typename T>
+__global__ void DenseMvSparseKernel(const T* a, const T* x, T* y,
+                                    std::int32_t rows, std::int32_t cols,
+                                    T eps) {
+  const int lane = threadIdx.x % kWarpSize;
+  const std::int64_t num_warps =
+      static_cast<std::int64_t>(gridDim.x) * blockDim.x / kWarpSize;
+  for (std::int64_t row =
+           (static_cast<std::int64_t>(blockIdx.x) * blockDim.x + threadIdx.x) /
+           kWarpSize;
+       row < rows; row += num_warps) {
+    const T* a_row = a + row * cols;
+    T sum = 0;
+    for (std::int32_t j = lane; j < cols; j += kWarpSize) {
+      T value = a_row[j];
+      if (!Negligible(value, eps)) {
+        sum += value * x[j];
+      }
+    }
+    sum = WarpSum(sum);
+    if (lane == 0) {
+      y[row] = sum;
+    }
+  }
+}
+
+constexpr int kDenseMvTransposeWarps = 8;
+
+// Computes y = A^T @ x. Each block reduces tiles of kWarpSize consecutive
+// columns: lane j of every warp accumulates column j of the tile over every
+// kDenseMvTransposeWarps-th row, so that each warp reads a row of the tile with
+// one coalesced load, and the partial sums of the warps are then added in
+// shared memory.
+template <typename T>
+__global__ void DenseMvSparseTransposeKernel(const T* a, const T* x, T* y,
+                                             std::int32_t rows,
+                                             std::int32_t cols, T eps) {
+  __shared__ T partial[kDenseMvTransposeWarps][kWarpSize];
+  const int lane = threadIdx.x % kWarpSize;
+  const int warp = threadIdx.x / kWarpSize;
+  for (std::int64_t col0 = static_cast<std::int64_t>(blockIdx.x) * kWarpSize;
+       col0 < cols; col0 += static_cast<std::int64_t>(gridDim.x) * kWarpSize) {
+    const std::int64_t col = col0 + lane;
+    T sum = 0;
+    if (col < cols) {
+      for (std::int64_t i = warp; i < rows; i += kDenseMvTransposeWarps) {
+        T value = a[i * cols + col];
+        if (!Negligible(value, eps)) {
+          sum += value * x[i];
+        }
+      }
+    }
+    partial[warp][lane] = sum;
+    __syncthreads();
+    if (warp == 0) {
+      for (int w = 1; w < kDenseMvTransposeWarps; ++w) {
+        sum += partial[w][lane];
+      }
+      if (col < cols) {
+        y[col] = sum;
+      }
+    }
+    __syncthreads();
+  }
+}
+
+template <typename T>
+void LaunchDenseMvSparse(cudaStream_t stream, void** buffers,
+                         const DenseMvSparseDescriptor& d) {
+  const T* a = reinterpret_cast<const T*>(buffers[0]);
+  const T* x = reinterpret_cast<const T*>(buffers[1]);
+  T* y = reinterpret_cast<T*>(buffers[2]);
+  if (d.transpose) {
+    const std::int64_t grid_dim = std::min<std::int64_t>(
+        1024, (static_cast<std::int64_t>(d.cols) + kWarpSize - 1) / kWarpSize);
+    if (grid_dim == 0) {
+      return;
+    }
+    DenseMvSparseTransposeKernel<T>
+        <<<grid_dim, kDenseMvTransposeWarps * kWarpSize,
+           /*dynamic_shared_mem_bytes=*/0, stream>>>(a, x, y, d.rows, d.cols,
+                                                     static_cast<T>(d.eps));
+  } else {
+    const int block_dim = 256;
+    const std::int64_t threads = static_cast<std::int64_t>(d.rows) * kWarpSize;
+    const std::int64_t grid_dim =
+        std::min<std::int64_t>(1024, (threads + block_dim - 1) / block_dim);
+    if (grid_dim == 0) {
+      return;
+    }
+    DenseMvSparseKernel<T><<<grid_dim, block_dim,
+                             /*dynamic_shared_mem_bytes=*/0, stream>>>(
+        a, x, y, d.rows, d.cols, static_cast<T>(d.eps));
+  }
+}
+
+// Computes y = A @ x for every task. Rows of all tasks are numbered
+// consecutively and reduced one per warp; each warp locates the task of its
+// row by binary search over the tasks' first rows.
+template <typename T>
+__global__ void CsrMatvecGroupedKernel(const CsrMatvecGroupTask* tasks,
+                                       int group_count,
+                                       std::int64_t total_rows) {
+  const int lane = threadIdx.x % kWarpSize;
+  const std::int64_t num_warps =
+      static_cast<std::int64_t>(gridDim.x) * blockDim.x / kWarpSize;
+  for (std::int64_t global_row =
+           (static_cast<std::int64_t>(blockIdx.x) * blockDim.x + threadIdx.x) /
+           kWarpSize;
+       global_row < total_rows; global_row += num_warps) {
+    int lo = 0, hi = group_count - 1;
+    while (lo < hi) {
+      int mid = (lo + hi + 1) / 2;
+      if (tasks[mid].row_begin <= global_row) {
+        lo = mid;
+      } else {
+        hi = mid - 1;
+      }
+    }
+    const CsrMatvecGroupTask& task = tasks[lo];
+    const T* data = static_cast<const T*>(task.data);
+    const T* x = static_cast<const T*>(task.x);
+    const std::int32_t row = global_row - task.row_begin;
+    const std::int32_t end = task.indptr[row + 1];
+    T sum = 0;
+    for (std::int32_t k = task.indptr[row] + lane; k < end; k += kWarpSize) {
+      sum += data[k] * x[task.indices[k]];
+    }
+    sum = WarpSum(sum);
+    if (lane == 0) {
+      static_cast<T*>(task.y)[row] = sum;
+    }
+  }
+}
+
+constexpr int kTileM = 16;
+constexpr int kTileN = 8;
+constexpr int kTileK = 16;
+constexpr int kPanelK = 4 * kTileK;
+constexpr int kTiledWarps = 4;
+constexpr int kTiledThreads = kTiledWarps * kWarpSize;
+constexpr int kThreadsPerTileRow = kTiledThreads / kTileM;
+
+// Packs two floats into the half2 register layout used by mma fragments; `lo`
+// is the element with the smaller index.
+__device__ std::uint32_t PackHalf2(float lo, float hi) {
+  __half2 h = __floats2half2_rn(lo, hi);
+  return *reinterpret_cast<std::uint32_t*>(&h);
+}
+
+__device__ float LoadB(const __half* b, std::int32_t k, std::int32_t col,
+                       std::int32_t cols, std::int32_t n) {
+  if (k >= cols || col >= n) {
+    return 0.0f;
+  }
+  return __half2float(b[static_cast<std::int64_t>(k) * n + col]);
+}
+
+// Computes C = A @ B. Block (i, j) computes rows [16 i, 16 i + 16) and columns
+// [32 j, 32 j + 32) of C; each of its warps owns one 16 x 8 tile of C. The
+// block keeps one cursor per row of its 16 rows of A. Each step picks the
+// 64-column panel of the smallest column under the cursors, consumes the run
+// of entries of every row that falls in that panel, expands them into shared
+// memory and multiplies the panel by the matching 64 rows of B, 16 x 16 x 8 at
+// a time. With sorted column indices every panel is visited once; otherwise a
+// panel may be visited several times, which is slower but still exact.
+template <typename OutT>
+__global__ void CsrMatmatTiledKernel(const __half* data,
+                                     const std::int32_t* indices,
+                                     const std::int32_t* indptr,
+                                     const __half* b, OutT* c,
+                                     std::int32_t rows, std::int32_t cols,
+                                     std::int32_t n) {
+  __shared__ float panel[kTileM][kPanelK];
+  __shared__ bool k_tile_nonempty[kPanelK / kTileK];
+  __shared__ std::int32_t cursor[kTileM];
+  __shared__ std::int32_t row_end[kTileM];
+  __shared__ std::int32_t next_col[kTileM];
+
+  const int warp = threadIdx.x / kWarpSize;
+  const int lane = threadIdx.x % kWarpSize;
+  const int group = lane / 4;
+  const int thread_in_group = lane % 4;
+  const std::int32_t row0 = blockIdx.x * kTileM;
+  const std::int32_t col = (blockIdx.y * kTiledWarps + warp) * kTileN + group;
+
+  if (threadIdx.x < kTileM) {
+    const std::int32_t row = row0 + threadIdx.x;
+    cursor[threadIdx.x] = row < rows ? indptr[row] : 0;
+    row_end[threadIdx.x] = row < rows ? indptr[row + 1] : 0;
+  }
+  float acc[4] = {0.0f, 0.0f, 0.0f, 0.0f};
+  __syncthreads();
+
+  while (true) {
+    if (threadIdx.x < kTileM) {
+      next_col[threadIdx.x] = cursor[threadIdx.x] < row_end[threadIdx.x]
+                                  ? indices[cursor[threadIdx.x]]
+                                  : INT_MAX;
+    }
+    __syncthreads();
+    std::int32_t k0 = INT_MAX;
+    for (int i = 0; i < kTileM; ++i) {
+      k0 = min(k0, next_col[i]);
+    }
+    if (k0 == INT_MAX) {
+      break;
+    }
+    k0 -= k0 % kPanelK;
+    const std::int32_t k_limit = k0 + kPanelK;
+
+    for (int i = threadIdx.x; i < kTileM * kPanelK; i += kTiledThreads) {
+      panel[i / kPanelK][i % kPanelK] = 0.0f;
+    }
+    if (threadIdx.x < kPanelK / kTileK) {
+      k_tile_nonempty[threadIdx.x] = false;
+    }
+    __syncthreads();
+
+    // The threads of a row agree on the first position past its cursor whose
+    // column lies outside the panel, the row's next cursor, then scatter the
+    // entries before it. Duplicate columns are summed.
+    const int r = threadIdx.x / kThreadsPerTileRow;
+    const int t = threadIdx.x % kThreadsPerTileRow;
+    const std::int32_t begin = cursor[r];
+    const std::int32_t end = row_end[r];
+    std::int32_t p = begin + t;
+    for (; p < end; p += kThreadsPerTileRow) {
+      const std::int32_t k = indices[p];
+      if (k < k0 || k >= k_limit) {
+        break;
+      }
+    }
+    p = min(p, end);
+    for (int offset = kThreadsPerTileRow / 2; offset > 0; offset /= 2) {
+      p = min(p, __shfl_xor_sync(0xffffffff, p, offset, kThreadsPerTileRow));
+    }
+    for (std::int32_t q = begin + t; q < p; q += kThreadsPerTileRow) {
+      const std::int32_t k = indices[q];
+      atomicAdd(&panel[r][k - k0], __half2float(data[q]));
+      k_tile_nonempty[(k - k0) / kTileK] = true;
+    }
+    __syncthreads();
+    if (t == 0) {
+      cursor[r] = p;
+    }
+
+    for (int kk = 0; kk < kPanelK / kTileK; ++kk) {
+      if (!k_tile_nonempty[kk]) {
+        continue;
+      }
+      const int a_col = kk * kTileK + 2 * thread_in_group;
+      const std::int32_t b_row = k0 + a_col;
+#if defined(__CUDA_ARCH__) && __CUDA_ARCH__ >= 800
+      const std::uint32_t a0 =
+          PackHalf2(panel[group][a_col], panel[group][a_col + 1]);
+      const std::uint32_t a1 =
+          PackHalf2(panel[group + 8][a_col], panel[group + 8][a_col + 1]);
+      const std::uint32_t a2 =
+          PackHalf2(panel[group][a_col + 8], panel[group][a_col + 9]);
+      const std::uint32_t a3 =
+          PackHalf2(panel[group + 8][a_col + 8], panel[group + 8][a_col + 9]);
+      const std::uint32_t b0 = PackHalf2(LoadB(b, b_row, col, cols, n),
+                                         LoadB(b, b_row + 1, col, cols, n));
+      const std::uint32_t b1 = PackHalf2(LoadB(b, b_row + 8, col, cols, n),
+                                         LoadB(b, b_row + 9, col, cols, n));
+      asm volatile(
+          "mma.sync.aligned.m16n8k16.row.col.f32.f16.f16.f32 "
+          "{%0, %1, %2, %3}, {%4, %5, %6, %7}, {%8, %9}, "
+          "{%0, %1, %2, %3};\n"
+          : "+f"(acc[0]), "+f"(acc[1]), "+f"(acc[2]), "+f"(acc[3])
+          : "r"(a0), "r"(a1), "r"(a2), "r"(a3), "r"(b0), "r"(b1));
+#else
+      // Before sm_80, compute the same accumulator fragment with FMAs. The
+      // thread holds C[group + 8 i][n0 + 2 thread_in_group + j] in
+      // acc[2 i + j], where n0 is the first column of the warp's tile.
+      const std::int32_t c_col = col - group + 2 * thread_in_group;
+      for (int k = 0; k < kTileK; ++k) {
+        const std::int32_t bk = k0 + kk * kTileK + k;
+        const float b0 = LoadB(b, bk, c_col, cols, n);
+        const float b1 = LoadB(b, bk, c_col + 1, cols, n);
+        const float a0 =
+            __half2float(__float2half(panel[group][kk * kTileK + k]));
+        const float a1 =
+            __half2float(__float2half(panel[group + 8][kk * kTileK + k]));
+        acc[0] += a0 * b0;
+        acc[1] += a0 * b1;
+        acc[2] += a1 * b0;
+        acc[3] += a1 * b1;
+      }
+#endif
+    }
+    __syncthreads();
+  }
+
+  const std::int32_t c_col = col - group + 2 * thread_in_group;
+  for (int i = 0; i < 4; ++i) {
+    const std::int32_t row = row0 + group + (i / 2) * 8;
+    const std::int32_t j = c_col + i % 2;
+    if (row < rows && j < n) {
+      c[static_cast<std::int64_t>(row) * n + j] = static_cast<OutT>(acc[i]);
+    }
+  }
+}
+
+// Computes y = A @ x for a CSR matrix A. Lane 0 of each warp claims the next
+// kWarpSize / kVectorSize rows from `row_counter`; each group of kVectorSize
+// lanes then reduces one of them with warp shuffles. The loop bounds are
+// uniform across the warp so that every lane takes part in the shuffles.
+template <typename T, int kVectorSize>
+__global__ void CsrMatvecLightKernel(const T* data,
+                                     const std::int32_t* indices,
+                                     const std::int32_t* indptr, const T* x,
+                                     T* y, std::int32_t rows,
+                                     std::int32_t* row_counter) {
+  constexpr int kVectorsPerWarp = kWarpSize / kVectorSize;
+  const int lane = threadIdx.x % kWarpSize;
+  const int vector_lane = lane % kVectorSize;
+  const int vector_id = lane / kVectorSize;
+  std::int32_t base = 0;
+  if (lane == 0) {
+    base = atomicAdd(row_counter, kVectorsPerWarp);
+  }
+  base = __shfl_sync(0xffffffff, base, 0);
+  while (base < rows) {
+    const std::int32_t row = base + vector_id;
+    T sum = 0;
+    if (row < rows) {
+      const std::int32_t end = indptr[row + 1];
+      for (std::int32_t k = indptr[row] + vector_lane; k < end;
+           k += kVectorSize) {
+        sum += data[k] * x[indices[k]];
+      }
+    }
+    for (int offset = kVectorSize / 2; offset > 0; offset /= 2) {
+      sum += __shfl_down_sync(0xffffffff, sum, offset, kVectorSize);
+    }
+    if (vector_lane == 0 && row < rows) {
+      y[row] = sum;
+    }
+    if (lane == 0) {
+      base = atomicAdd(row_counter, kVectorsPerWarp);
+    }
+    base = __shfl_sync(0xffffffff, base, 0);
+  }
+}
+
+template <typename T, int kVectorSize>
+absl::Status LaunchCsrMatvecLight(cudaStream_t stream, void** buffers,
+                                  const CsrMatvecLightDescriptor& d) {
+  const T* data = reinterpret_cast<const T*>(buffers[0]);
+  const std::int32_t* indices =
+      reinterpret_cast<const std::int32_t*>(buffers[1]);
+  const std::int32_t* indptr =
+      reinterpret_cast<const std::int32_t*>(buffers[2]);
+  const T* x = reinterpret_cast<const T*>(buffers[3]);
+  T* y = reinterpret_cast<T*>(buffers[4]);
+  std::int32_t* row_counter = reinterpret_cast<std::int32_t*>(buffers[5]);
+  const int block_dim = 256;
+  const std::int64_t threads = static_cast<std::int64_t>(d.rows) * kVectorSize;
+  const std::int64_t grid_dim =
+      std::min<std::int64_t>(1024, (threads + block_dim - 1) / block_dim);
+  if (grid_dim == 0) {
+    return absl::OkStatus();
+  }
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cudaMemsetAsync(row_counter, 0, sizeof(std::int32_t), stream)));
+  CsrMatvecLightKernel<T, kVectorSize>
+      <<<grid_dim, block_dim, /*dynamic_shared_mem_bytes=*/0, stream>>>(
+          data, indices, indptr, x, y, d.rows, row_counter);
+  return absl::OkStatus();
+}
+
+template <typename T>
+absl::Status LaunchCsrMatvecLightForType(cudaStream_t stream, void** buffers,
+                                         const CsrMatvecLightDescriptor& d) {
+  switch (d.vector_size) {
+    case 2:
+      return LaunchCsrMatvecLight<T, 2>(stream, buffers, d);
+    case 4:
+      return LaunchCsrMatvecLight<T, 4>(stream, buffers, d);
+    case 8:
+      return LaunchCsrMatvecLight<T, 8>(stream, buffers, d);
+    case 16:
+      return LaunchCsrMatvecLight<T, 16>(stream, buffers, d);
+    default:
+      return LaunchCsrMatvecLight<T, kWarpSize>(stream, buffers, d);
+  }
+}
+
+// Writes the number of nonzeros of row i of the rows x cols matrix `a` to
+// indptr[i + 1], and zero to indptr[0]. Each warp counts one row, 32 columns
+// at a time, with a ballot.
+template <typename T, typename I>
+__global__ void CsrCountRowNnzKernel(const T* a, I* indptr, std::int32_t rows,
+                                     std::int32_t cols) {
+  const int lane = threadIdx.x % kWarpSize;
+  const std::int64_t num_warps =
+      static_cast<std::int64_t>(gridDim.x) * blockDim.x / kWarpSize;
+  const std::int64_t first_warp =
+      (static_cast<std::int64_t>(blockIdx.x) * blockDim.x + threadIdx.x) /
+      kWarpSize;
+  if (first_warp == 0 && lane == 0) {
+    indptr[0] = 0;
+  }
+  for (std::int64_t row = first_warp; row < rows; row += num_warps) {
+    const T* a_row = a + row * cols;
+    I count = 0;
+    for (std::int32_t j0 = 0; j0 < cols; j0 += kWarpSize) {
+      const std::int32_t j = j0 + lane;
+      const unsigned mask =
+          __ballot_sync(0xffffffff, j < cols && a_row[j] != T(0));
+      count += __popc(mask);
+    }
+    if (lane == 0) {
+      indptr[row + 1] = count;
+    }
+  }
+}
+
+// Writes the nonzeros of each row of `a`, in column order, starting at
+// indptr[row]. Nonzeros beyond the first `nnz` are dropped.
+template <typename T, typename I>
+__global__ void CsrCompactKernel(const T* a, const I* indptr, T* data,
+                                 I* indices, std::int32_t rows,
+                                 std::int32_t cols, std::int32_t nnz) {
+  const int lane = threadIdx.x % kWarpSize;
+  const unsigned lanes_below = (1u << lane) - 1;
+  const std::int64_t num_warps =
+      static_cast<std::int64_t>(gridDim.x) * blockDim.x / kWarpSize;
+  for (std::int64_t row =
+           (static_cast<std::int64_t>(blockIdx.x) * blockDim.x + threadIdx.x) /
+           kWarpSize;
+       row < rows; row += num_warps) {
+    const T* a_row = a + row * cols;
+    I offset = indptr[row];
+    for (std::int32_t j0 = 0; j0 < cols; j0 += kWarpSize) {
+      const std::int32_t j = j0 + lane;
+      const T value = j < cols ? a_row[j] : T(0);
+      const unsigned mask = __ballot_sync(0xffffffff, value != T(0));
+      if (value != T(0)) {
+        const I k = offset + __popc(mask & lanes_below);
+        if (k < nnz) {
+          data[k] = value;
+          indices[k] = j;
+        }
+      }
+      offset += __popc(mask);
+    }
+  }
+}
+
+// Replaces each of the rows + 1 row offsets by min(indptr[i], nnz), so that
+// the rows whose nonzeros CsrCompactKernel dropped end at nnz.
+template <typename I>
+__global__ void CsrClampIndptrKernel(I* indptr, std::int32_t rows,
+                                     std::int32_t nnz) {
+  for (std::int64_t i = blockIdx.x * blockDim.x + threadIdx.x; i <= rows;
+       i += blockDim.x * gridDim.x) {
+    indptr[i] = min(indptr[i], static_cast<I>(nnz));
+  }
+}
+
+template <typename T, typename I>
+absl::Status LaunchCsrFromDenseFast(cudaStream_t stream, void** buffers,
+                                    const CsrFromDenseFastDescriptor& d) {
+  const T* a = reinterpret_cast<const T*>(buffers[0]);
+  T* data = reinterpret_cast<T*>(buffers[1]);
+  I* indices = reinterpret_cast<I*>(buffers[2]);
+  I* indptr = reinterpret_cast<I*>(buffers[3]);
+  size_t workspace_size = d.workspace_size;
+  void* workspace = workspace_size > 0 ? buffers[4] : nullptr;
+  const int block_dim = 256;
+  const std::int64_t threads = static_cast<std::int64_t>(d.rows) * kWarpSize;
+  const std::int64_t grid_dim = std::max<std::int64_t>(
+      1, std::min<std::int64_t>(1024, (threads + block_dim - 1) / block_dim));
+  // Nonzeros the matrix does not have are left as zeros.
+  if (d.nnz > 0) {
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(cudaMemsetAsync(data, 0, d.nnz * sizeof(T), stream)));
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(cudaMemsetAsync(indices, 0, d.nnz * sizeof(I), stream)));
+  }
+  CsrCountRowNnzKernel<T, I><<<grid_dim, block_dim,
+                               /*dynamic_shared_mem_bytes=*/0, stream>>>(
+      a, indptr, d.rows, d.cols);
+  if (d.rows == 0) {
+    return absl::OkStatus();
+  }
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cub::DeviceScan::InclusiveSum(workspace, workspace_size, indptr + 1,
+                                    indptr + 1, d.rows, stream)));
+  CsrCompactKernel<T, I><<<grid_dim, block_dim,
+                           /*dynamic_shared_mem_bytes=*/0, stream>>>(
+      a, indptr, data, indices, d.rows, d.cols, d.nnz);
+  // The offsets count every nonzero of the matrix, including those beyond
+  // the first nnz that were dropped.
+  const std::int64_t clamp_grid_dim = std::min<std::int64_t>(
+      1024, (static_cast<std::int64_t>(d.rows) + block_dim) / block_dim);
+  CsrClampIndptrKernel<I><<<clamp_grid_dim, block_dim,
+                            /*dynamic_shared_mem_bytes=*/0, stream>>>(
+      indptr, d.rows, d.nnz);
+  return absl::OkStatus();
+}
+
+template <typename I>
+size_t CsrFromDenseFastWorkspaceSizeForType(int rows) {
+  size_t size = 0;
+  cub::DeviceScan::InclusiveSum(nullptr, size, static_cast<I*>(nullptr),
+                                static_cast<I*>(nullptr), rows);
+  return size;
+}
+
+}  // namespace
+
+void LaunchCsrCheckInvariantsKernel(cudaStream_t stream, const void* indptr,
+                                    size_t index_size, int rows, int nnz) {
+#ifndef NDEBUG
+  switch (index_size) {
+    case 2:
+      CsrCheckInvariantsKernel<<<1, 1, /*dynamic_shared_mem_bytes=*/0,
+                                 stream>>>(
+          static_cast<const std::uint16_t*>(indptr), rows, nnz);
+      break;
+    case 4:
+      CsrCheckInvariantsKernel<<<1, 1, /*dynamic_shared_mem_bytes=*/0,
+                                 stream>>>(
+          static_cast<const std::int32_t*>(indptr), rows, nnz);
+      break;
+    case 8:
+      CsrCheckInvariantsKernel<<<1, 1, /*dynamic_shared_mem_bytes=*/0,
+                                 stream>>>(
+          static_cast<const std::int64_t*>(indptr), rows, nnz);
+      break;
+    default:
+      break;
+  }
+#endif  // NDEBUG
+}
+
+void LaunchDenseMvSparseKernel(cudaStream_t stream, void** buffers,
+                               DenseMvSparseDescriptor descriptor) {
+  switch (descriptor.type) {
+    case CUDA_R_32F:
+      LaunchDenseMvSparse<float>(stream, buffers, descriptor);
+      break;
+    case CUDA_R_64F:
+      LaunchDenseMvSparse<double>(stream, buffers, descriptor);
+      break;
+    default:
+      break;
+  }
+}
+
+size_t CsrFromDenseFastWorkspaceSize(cudaDataType index_type, int rows) {
+  if (index_type == CUDA_R_64I) {
+    return CsrFromDenseFastWorkspaceSizeForType<std::int64_t>(rows);
+  }
+  return CsrFromDenseFastWorkspaceSizeForType<std::int32_t>(rows);
+}
+
+absl::Status LaunchCsrFromDenseFastKernels(
+    cudaStream_t stream, void** buffers,
+    CsrFromDenseFastDescriptor descriptor) {
+  const bool index_64 = descriptor.index_type == CUDA_R_64I;
+  switch (descriptor.value_type) {
+    case CUDA_R_32F:
+      if (index_64) {
+        return LaunchCsrFromDenseFast<float, std::int64_t>(stream, buffers,
+                                                           descriptor);
+      }
+      return LaunchCsrFromDenseFast<float, std::int32_t>(stream, buffers,
+                                                         descriptor);
+    case CUDA_R_64F:
+      if (index_64) {
+        return LaunchCsrFromDenseFast<double, std::int64_t>(stream, buffers,
+                                                            descriptor);
+      }
+      return LaunchCsrFromDenseFast<double, std::int32_t>(stream, buffers,
+                                                          descriptor);
+    default:
+      return absl::OkStatus();
+  }
+}
+
+void LaunchCsrMatvecGroupedKernel(cudaStream_t stream, cudaDataType type,
+                                  const CsrMatvecGroupTask* tasks,
+                                  int group_count, std::int64_t total_rows) {
+  const int block_dim = 256;
+  const std::int64_t grid_dim = std::min<std::int64_t>(
+      1024, (total_rows * kWarpSize + block_dim - 1) / block_dim);
+  if (grid_dim == 0) {
+    return;
+  }
+  switch (type) {
+    case CUDA_R_32F:
+      CsrMatvecGroupedKernel<float>
+          <<<grid_dim, block_dim, /*dynamic_shared_mem_bytes=*/0, stream>>>(
+              tasks, group_count, total_rows);
+      break;
+    case CUDA_R_64F:
+      CsrMatvecGroupedKernel<double>
+          <<<grid_dim, block_dim, /*dynamic_shared_mem_bytes=*/0, stream>>>(
+              tasks, group_count, total_rows);
+      break;
+    default:
+      break;
+  }
+}
+
+void LaunchCsrMatmatTiledKernel(cudaStream_t stream, void** buffers,
+                                CsrMatmatTiledDescriptor descriptor) {
+  const __half* data = reinterpret_cast<const __half*>(buffers[0]);
+  const std::int32_t* indices =
+      reinterpret_cast<const std::int32_t*>(buffers[1]);
+  const std::int32_t* indptr =
+      reinterpret_cast<const std::int32_t*>(buffers[2]);
+  const __half* b = reinterpret_cast<const __half*>(buffers[3]);
+  const dim3 grid_dim((descriptor.rows + kTileM - 1) / kTileM,
+                      (descriptor.n + kTiledWarps * kTileN - 1) /
+                          (kTiledWarps * kTileN));
+  if (grid_dim.x == 0 || grid_dim.y == 0) {
+    return;
+  }
+  switch (descriptor.out_type) {
+    case CUDA_R_16F:
+      CsrMatmatTiledKernel<__half>
+          <<<grid_dim, kTiledThreads, /*dynamic_shared_mem_bytes=*/0,
+             stream>>>(data, indices, indptr, b,
+                       reinterpret_cast<__half*>(buffers[4]), descriptor.rows,
+                       descriptor.cols, descriptor.n);
+      break;
+    case CUDA_R_32F:
+      CsrMatmatTiledKernel<float>
+          <<<grid_dim, kTiledThreads, /*dynamic_shared_mem_bytes=*/0,
+             stream>>>(data, indices, indptr, b,
+                       reinterpret_cast<float*>(buffers[4]), descriptor.rows,
+                       descriptor.cols, descriptor.n);
+      break;
+    default:
+      break;
+  }
+}
+
+absl::Status LaunchCsrMatvecLightKernel(cudaStream_t stream, void** buffers,
+                                        CsrMatvecLightDescriptor descriptor) {
+  switch (descriptor.type) {
+    case CUDA_R_32F:
+      return LaunchCsrMatvecLightForType<float>(stream, buffers, descriptor);
+    case CUDA_R_64F:
+      return LaunchCsrMatvecLightForType<double>(stream, buffers, descriptor);
+    default:
+      return absl::OkStatus();
+  }
+}
+
+}  // namespace jax
@@ -0,0 +1,152 @@
+/* Copyright 2022 Google LLC
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+==============================================================================*/
+
+#ifndef JAXLIB_CUDA_SPARSE_KERNELS_H_
+#define JAXLIB_CUDA_SPARSE_KERNELS_H_
+
+#include <cstddef>
+#include <cstdint>
+#include <string>
+
+#include "absl/status/status.h"
+#include "jaxlib/kernel_helpers.h"
+#include "third_party/gpus/cuda/include/cuda_runtime_api.h"
+#include "third_party/gpus/cuda/include/library_types.h"
+#include "tensorflow/compiler/xla/service/custom_call_status.h"
+
+// Hand-written sparse kernels, for operations that cuSPARSE does not provide.
+
+namespace jax {
+
+// Checks on the device that a CSR matrix with `rows` rows and `nnz` nonzeros,
+// whose row offsets of `index_size` bytes are `indptr`, has
+// indptr[rows] == nnz, failing a device assertion otherwise. A no-op if NDEBUG
+// is defined.
+void LaunchCsrCheckInvariantsKernel(cudaStream_t stream, const void* indptr,
+                                    size_t index_size, int rows, int nnz);
+
+// DenseMvSparse: Product of a dense matrix and a dense vector that skips the
+// matrix entries whose magnitude is at most eps, without first converting the
+// matrix to a sparse format. With eps = 0 it equals the product of the CSR
+// form of the matrix.
+
+struct DenseMvSparseDescriptor {
+  cudaDataType type;
+  int rows, cols;
+  int transpose;
+  double eps;
+};
+
+void LaunchDenseMvSparseKernel(cudaStream_t stream, void** buffers,
+                               DenseMvSparseDescriptor descriptor);
+
+void DenseMvSparse(cudaStream_t stream, void** buffers, const char* opaque,
+                   size_t opaque_len, XlaCustomCallStatus* status);
+
+// CsrFromDenseFast: Converts a dense matrix to CSR format without cuSPARSE.
+// One kernel counts the nonzeros of each row with warp ballots, a device-wide
+// scan turns the counts into row offsets, and a second kernel compacts the
+// nonzeros. The scan needs `workspace_size` bytes of scratch space.
+
+struct CsrFromDenseFastDescriptor {
+  cudaDataType value_type, index_type;
+  int rows, cols, nnz;
+  DescriptorSize workspace_size;
+};
+
+// Returns the scratch space in bytes needed to convert a matrix with `rows`
+// rows and indices of `index_type`.
+size_t CsrFromDenseFastWorkspaceSize(cudaDataType index_type, int rows);
+
+absl::Status LaunchCsrFromDenseFastKernels(
+    cudaStream_t stream, void** buffers,
+    CsrFromDenseFastDescriptor descriptor);
+
+void CsrFromDenseFast(cudaStream_t stream, void** buffers, const char* opaque,
+                      size_t opaque_len, XlaCustomCallStatus* status);
+
+// CsrMatvecLight: Product of a CSR matrix with 32-bit indices and a dense
+// vector, after LightSpMV. Rows are handed out dynamically through an atomic
+// row counter, so warps that draw short rows simply draw more of them; this
+// keeps the device busy on matrices whose row lengths vary widely. Each row is
+// reduced by a group of `vector_size` lanes of a warp.
+
+struct CsrMatvecLightDescriptor {
+  cudaDataType type;
+  int rows, cols, nnz;
+  int vector_size;
+};
+
+absl::Status LaunchCsrMatvecLightKernel(cudaStream_t stream, void** buffers,
+                                        CsrMatvecLightDescriptor descriptor);
+
+void CsrMatvecLight(cudaStream_t stream, void** buffers, const char* opaque,
+                    size_t opaque_len, XlaCustomCallStatus* status);
+
+// CsrMatvecGrouped: Independent products of CSR matrices with 32-bit indices
+// and dense vectors, computed by a single kernel launch. The opaque descriptor
+// is a CsrMatvecGroupedDescriptor followed by `group_count`
+// CsrMatvecGroupShapes. The buffers are the data, indices, indptr and x of
+// each group, then the y of each group, then a workspace in which the kernel
+// receives one CsrMatvecGroupTask per group.
+
+struct CsrMatvecGroupedDescriptor {
+  cudaDataType type;
+  int group_count;
+};
+
+struct CsrMatvecGroupShape {
+  int rows, cols, nnz;
+};
+
+struct CsrMatvecGroupTask {
+  const void* data;
+  const std::int32_t* indices;
+  const std::int32_t* indptr;
+  const void* x;
+  void* y;
+  // Index of the first row of this group among the rows of all groups.
+  std::int64_t row_begin;
+  std::int32_t rows;
+};
+
+void LaunchCsrMatvecGroupedKernel(cudaStream_t stream, cudaDataType type,
+                                  const CsrMatvecGroupTask* tasks,
+                                  int group_count, std::int64_t total_rows);
+
+void CsrMatvecGrouped(cudaStream_t stream, void** buffers, const char* opaque,
+                      size_t opaque_len, XlaCustomCallStatus* status);
+
+// CsrMatmatTiled: Product of a float16 CSR matrix with 32-bit column indices
+// and a dense float16 matrix, on Tensor Cores. For each 16-row tile of the
+// sparse matrix, the nonempty 16 x 64 panels are expanded into shared memory
+// and multiplied with mma.m16n8k16, accumulating in float32; empty panels are
+// skipped. Sorted column indices are fastest, but any order is accepted. The
+// result is float16 or float32 (`out_type`).
+
+struct CsrMatmatTiledDescriptor {
+  cudaDataType out_type;
+  int rows, cols, n, nnz;
+};
+
+void LaunchCsrMatmatTiledKernel(cudaStream_t stream, void** buffers,
+                                CsrMatmatTiledDescriptor descriptor);
+
+void CsrMatmatTiled(cudaStream_t stream, void** buffers, const char* opaque,
+                    size_t opaque_len, XlaCustomCallStatus* status);
+
+}  // namespace jax
+
+#endif  // JAXLIB_CUDA_SPARSE_KERNELS_H_
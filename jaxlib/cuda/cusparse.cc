@@ -17,7 +17,10 @@ limitations under the License.
 
 #include <algorithm>
 #include <cstdint>
+#include <limits>
 #include <stdexcept>
+#include <string>
+#include <tuple>
 #include <utility>
 #include <vector>
 
@@ -30,6 +33,7 @@ limitations under the License.
 #include "third_party/gpus/cuda/include/cuda.h"
 #include "third_party/gpus/cuda/include/cuda_runtime_api.h"
 #include "jaxlib/cuda/cuda_gpu_kernel_helpers.h"
+#include "jaxlib/cuda/cuda_sparse_kernels.h"
 #include "jaxlib/cuda/cusparse_kernels.h"
 #include "jaxlib/kernel_pybind11_helpers.h"
 #include "include/pybind11/numpy.h"
@@ -98,13 +102,122 @@ DenseVecDescriptor BuildDenseVecDescriptor(const py::dtype& data_dtype,
   return DenseVecDescriptor{value_type, size};
 }
 
+// CsrFromDenseFast: Dense to CSR conversion with hand-written kernels.
+
+std::pair<size_t, py::bytes> BuildCsrFromDenseFastDescriptor(
+    const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
+    int cols, int nnz) {
+  cudaDataType value_type = DtypeToCudaDataType(data_dtype);
+  if (value_type != CUDA_R_32F && value_type != CUDA_R_64F) {
+    throw std::invalid_argument(
+        "csr_fromdense_fast only supports float32 and float64");
+  }
+  if (index_dtype.kind() != 'i' ||
+      (index_dtype.itemsize() != 4 && index_dtype.itemsize() != 8)) {
+    throw std::invalid_argument(
+        "csr_fromdense_fast requires int32 or int64 indices");
+  }
+  cudaDataType index_type =
+      index_dtype.itemsize() == 8 ? CUDA_R_64I : CUDA_R_32I;
+  size_t workspace_size = CsrFromDenseFastWorkspaceSize(index_type, rows);
+  return {workspace_size,
+          PackDescriptor(CsrFromDenseFastDescriptor{
+              value_type, index_type, rows, cols, nnz, workspace_size})};
+}
+
+// CsrMatvecGrouped: Several CSR matrix/vector products in one launch.
+
+// Returns the workspace size and the descriptor of a grouped matvec whose
+// group i multiplies a CSR matrix of shape `shapes[i]` = (rows, cols, nnz).
+std::pair<size_t, py::bytes> BuildCsrMatvecGroupedDescriptor(
+    const py::dtype& data_dtype, const py::dtype& x_dtype,
+    const py::dtype& index_dtype,
+    const std::vector<std::tuple<int, int, int>>& shapes) {
+  cudaDataType type = DtypeToCudaDataType(data_dtype);
+  if (DtypeToCudaDataType(x_dtype) != type) {
+    throw std::invalid_argument(
+        "csr_matvec_grouped requires matching matrix and vector dtypes");
+  }
+  if (type != CUDA_R_32F && type != CUDA_R_64F) {
+    throw std::invalid_argument(
+        "csr_matvec_grouped only supports float32 and float64");
+  }
+  if (index_dtype.kind() != 'i' || index_dtype.itemsize() != 4) {
+    throw std::invalid_argument("csr_matvec_grouped requires int32 indices");
+  }
+  std::string opaque = PackDescriptorAsString(
+      CsrMatvecGroupedDescriptor{type, static_cast<int>(shapes.size())});
+  for (const auto& [rows, cols, nnz] : shapes) {
+    opaque += PackDescriptorAsString(CsrMatvecGroupShape{rows, cols, nnz});
+  }
+  return {shapes.size() * sizeof(CsrMatvecGroupTask), py::bytes(opaque)};
+}
+
+// CsrMatmatTiled: Tensor Core CSR matrix/matrix product.
+
+py::bytes BuildCsrMatmatTiledDescriptor(const py::dtype& data_dtype,
+                                        const py::dtype& b_dtype,
+                                        const py::dtype& out_dtype,
+                                        const py::dtype& index_dtype, int rows,
+                                        int cols, int n, int nnz) {
+  if (DtypeToCudaDataType(data_dtype) != CUDA_R_16F ||
+      DtypeToCudaDataType(b_dtype) != CUDA_R_16F) {
+    throw std::invalid_argument("csr_matmat_tiled requires float16 operands");
+  }
+  cudaDataType out_type = DtypeToCudaDataType(out_dtype);
+  if (out_type != CUDA_R_16F && out_type != CUDA_R_32F) {
+    throw std::invalid_argument(
+        "csr_matmat_tiled only supports float16 and float32 results");
+  }
+  if (index_dtype.kind() != 'i' || index_dtype.itemsize() != 4) {
+    throw std::invalid_argument("csr_matmat_tiled requires int32 indices");
+  }
+  return PackDescriptor(
+      CsrMatmatTiledDescriptor{out_type, rows, cols, n, nnz});
+}
+
+// CsrMatvecLight: LightSpMV-style CSR matrix/vector product.
+
+CsrMatvecLightDescriptor BuildCsrMatvecLightDescriptorStruct(
+    const py::dtype& data_dtype, const py::dtype& x_dtype,
+    const py::dtype& index_dtype, int rows, int cols, int nnz) {
+  cudaDataType type = DtypeToCudaDataType(data_dtype);
+  if (DtypeToCudaDataType(x_dtype) != type) {
+    throw std::invalid_argument(
+        "csr_matvec_light requires matching matrix and vector dtypes");
+  }
+  if (type != CUDA_R_32F && type != CUDA_R_64F) {
+    throw std::invalid_argument(
+        "csr_matvec_light only supports float32 and float64");
+  }
+  if (index_dtype.kind() != 'i' || index_dtype.itemsize() != 4) {
+    throw std::invalid_argument("csr_matvec_light requires int32 indices");
+  }
+  // As in LightSpMV, size the group of lanes reducing a row to the mean row
+  // length, so that short rows do not leave most of a warp idle.
+  int mean_row_length = rows > 0 ? (nnz + rows - 1) / rows : 0;
+  int vector_size = 2;
+  while (vector_size < 32 && vector_size < mean_row_length) {
+    vector_size *= 2;
+  }
+  return CsrMatvecLightDescriptor{type, rows, cols, nnz, vector_size};
+}
+
+py::bytes BuildCsrMatvecLightDescriptor(const py::dtype& data_dtype,
+                                        const py::dtype& x_dtype,
+                                        const py::dtype& index_dtype, int rows,
+                                        int cols, int nnz) {
+  return PackDescriptor(BuildCsrMatvecLightDescriptorStruct(
+      data_dtype, x_dtype, index_dtype, rows, cols, nnz));
+}
+
 #if JAX_CUSPARSE_11300
 // CsrToDense: Convert CSR matrix to dense matrix
 
 // Returns the descriptor for a Sparse matrix.
 std::pair<size_t, py::bytes> BuildCsrToDenseDescriptor(
     const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz) {
+    int cols, int nnz, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -133,46 +246,9 @@ std::pair<size_t, py::bytes> BuildCsrToDenseDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
 
-  return {buffer_size, PackDescriptor(d)};
-}
-
-absl::Status CsrToDense_(cudaStream_t stream, void** buffers,
-                         const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
-  JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
-  auto h = SparseHandlePool::Borrow(stream);
-  JAX_RETURN_IF_ERROR(h.status());
-  auto& handle = *h;
-
-  cusparseSpMatDescr_t mat_a = 0;
-  cusparseDnMatDescr_t mat_b = 0;
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      cusparseCreateCsr(&mat_a, d.rows, d.cols, d.nnz,
-                        /*csrRowOffsets=*/buffers[2],
-                        /*csrColInd=*/buffers[1],
-                        /*csrValues=*/buffers[0], d.index_type, d.index_type,
-                        CUSPARSE_INDEX_BASE_ZERO, d.value_type)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateDnMat(
-      &mat_b, d.rows, d.cols,
-      /*ld=*/d.cols, buffers[3], d.value_type, CUSPARSE_ORDER_ROW)));
-
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      cusparseSparseToDense(handle.get(), mat_a, mat_b,
-                            CUSPARSE_SPARSETODENSE_ALG_DEFAULT, buffers[4])));
-
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
-  return absl::OkStatus();
-}
-
-void CsrToDense(cudaStream_t stream, void** buffers, const char* opaque,
-                size_t opaque_len, XlaCustomCallStatus* status) {
-  auto s = CsrToDense_(stream, buffers, opaque, opaque_len);
-  if (!s.ok()) {
-    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
-                                  s.message().length());
-  }
+  return {buffer_size,
+          PackDescriptor(SparseConvertDescriptor{
+              d, {buffer_size, external_workspace}})};
 }
 
 // CsrFromDense: Convert dense matrix to CSR matrix
@@ -180,7 +256,7 @@ void CsrToDense(cudaStream_t stream, void** buffers, const char* opaque,
 // Returns the descriptor for a CsrFromDense operation.
 std::pair<size_t, py::bytes> BuildCsrFromDenseDescriptor(
     const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz) {
+    int cols, int nnz, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -207,47 +283,9 @@ std::pair<size_t, py::bytes> BuildCsrFromDenseDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_b)));
 
-  return {buffer_size, PackDescriptor(d)};
-}
-
-absl::Status CsrFromDense_(cudaStream_t stream, void** buffers,
-                           const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
-  JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
-  auto h = SparseHandlePool::Borrow(stream);
-  JAX_RETURN_IF_ERROR(h.status());
-  auto& handle = *h;
-
-  cusparseDnMatDescr_t mat_a = 0;
-  cusparseSpMatDescr_t mat_b = 0;
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateDnMat(
-      &mat_a, d.rows, d.cols,
-      /*ld=*/d.cols, buffers[0], d.value_type, CUSPARSE_ORDER_ROW)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      cusparseCreateCsr(&mat_b, d.rows, d.cols, d.nnz,
-                        /*csrRowOffsets=*/buffers[3],
-                        /*csrColInd=*/buffers[2],
-                        /*csrValues=*/buffers[1], d.index_type, d.index_type,
-                        CUSPARSE_INDEX_BASE_ZERO, d.value_type)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDenseToSparse_analysis(
-      handle.get(), mat_a, mat_b, CUSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDenseToSparse_convert(
-      handle.get(), mat_a, mat_b, CUSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_a)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_b)));
-  return absl::OkStatus();
-}
-
-void CsrFromDense(cudaStream_t stream, void** buffers, const char* opaque,
-                  size_t opaque_len, XlaCustomCallStatus* status) {
-  auto s = CsrFromDense_(stream, buffers, opaque, opaque_len);
-  if (!s.ok()) {
-    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
-                                  s.message().length());
-  }
+  return {buffer_size,
+          PackDescriptor(SparseConvertDescriptor{
+              d, {buffer_size, external_workspace}})};
 }
 
 // CsrMatvec: Product of CSR matrix and dense vector.
@@ -256,7 +294,7 @@ void CsrFromDense(cudaStream_t stream, void** buffers, const char* opaque,
 std::pair<size_t, py::bytes> BuildCsrMatvecDescriptor(
     const py::dtype& data_dtype, const py::dtype& x_dtype,
     const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz, bool transpose) {
+    int cols, int nnz, bool transpose, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -294,16 +332,20 @@ std::pair<size_t, py::bytes> BuildCsrMatvecDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_x)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_y)));
 
-  return {buffer_size, PackDescriptor(CsrMatvecDescriptor{A, x, y, op})};
+  return {buffer_size,
+          PackDescriptor(CsrMatvecDescriptor{
+              A, x, y, op, {buffer_size, external_workspace}})};
 }
 
 // CsrMatmat: Product of CSR matrix and dense matrix.
 
-// Returns the descriptor for a CsrMatmat operation.
+// Returns the descriptor for a CsrMatmat operation. `alg` is the
+// cusparseSpMMAlg_t with which cusparseSpMM computes the product.
 std::pair<size_t, py::bytes> BuildCsrMatmatDescriptor(
     const py::dtype& data_dtype, const py::dtype& b_dtype,
     const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int BCcols, int nnz, bool transpose) {
+    int cols, int BCcols, int nnz, bool transpose, int alg,
+    bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -337,13 +379,17 @@ std::pair<size_t, py::bytes> BuildCsrMatmatDescriptor(
   CudaConst beta = CudaZero(C.type);
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseSpMM_bufferSize(
       handle.get(), op_A, CUSPARSE_OPERATION_NON_TRANSPOSE, &alpha, mat_a,
-      mat_b, &beta, mat_c, C.type, CUSPARSE_SPMM_ALG_DEFAULT, &buffer_size)));
+      mat_b, &beta, mat_c, C.type, static_cast<cusparseSpMMAlg_t>(alg),
+      &buffer_size)));
 
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_c)));
 
-  return {buffer_size, PackDescriptor(CsrMatmatDescriptor{A, B, C, op_A})};
+  return {buffer_size,
+          PackDescriptor(CsrMatmatDescriptor{
+              A, B, C, op_A, static_cast<cusparseSpMMAlg_t>(alg),
+              {buffer_size, external_workspace}})};
 }
 
 // CooToDense: Convert COO matrix to dense matrix
@@ -351,7 +397,7 @@ std::pair<size_t, py::bytes> BuildCsrMatmatDescriptor(
 // Returns the descriptor for a CooToDense operation.
 std::pair<size_t, py::bytes> BuildCooToDenseDescriptor(
     const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz) {
+    int cols, int nnz, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -379,20 +425,18 @@ std::pair<size_t, py::bytes> BuildCooToDenseDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
 
-  return {buffer_size, PackDescriptor(d)};
+  return {buffer_size,
+          PackDescriptor(SparseConvertDescriptor{
+              d, {buffer_size, external_workspace}})};
 }
 
 // CooFromDense: Convert dense matrix to COO matrix
 
-// Returns the descriptor for a CooFromDense operation.
-std::pair<size_t, py::bytes> BuildCooFromDenseDescriptor(
-    const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz) {
+// Returns the workspace size of a CooFromDense operation.
+size_t CooFromDenseBufferSize(const SparseMatDescriptor& d) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
-  SparseMatDescriptor d =
-      BuildSparseMatDescriptor(data_dtype, index_dtype, rows, cols, nnz);
 
   cusparseDnMatDescr_t mat_a = 0;
   cusparseSpMatDescr_t mat_b = 0;
@@ -413,8 +457,38 @@ std::pair<size_t, py::bytes> BuildCooFromDenseDescriptor(
 
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_b)));
+  return buffer_size;
+}
 
-  return {buffer_size, PackDescriptor(d)};
+// Returns the descriptor for a CooFromDense operation.
+std::pair<size_t, py::bytes> BuildCooFromDenseDescriptor(
+    const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
+    int cols, int nnz, bool external_workspace) {
+  SparseMatDescriptor d =
+      BuildSparseMatDescriptor(data_dtype, index_dtype, rows, cols, nnz);
+  size_t buffer_size = CooFromDenseBufferSize(d);
+  return {buffer_size,
+          PackDescriptor(SparseConvertDescriptor{
+              d, {buffer_size, external_workspace}})};
+}
+
+// Returns the workspace size, the byte offsets of the row and column indices
+// in the packed result, and the descriptor for a CooFromDensePacked
+// operation. Each array of the result starts at a multiple of 16 bytes.
+std::tuple<size_t, size_t, size_t, py::bytes>
+BuildCooFromDensePackedDescriptor(const py::dtype& data_dtype,
+                                  const py::dtype& index_dtype, int rows,
+                                  int cols, int nnz, bool external_workspace) {
+  SparseMatDescriptor d =
+      BuildSparseMatDescriptor(data_dtype, index_dtype, rows, cols, nnz);
+  size_t buffer_size = CooFromDenseBufferSize(d);
+  auto align = [](size_t n) { return (n + 15) / 16 * 16; };
+  size_t row_offset = align(size_t{1} * nnz * data_dtype.itemsize());
+  size_t col_offset =
+      row_offset + align(size_t{1} * nnz * index_dtype.itemsize());
+  return {buffer_size, row_offset, col_offset,
+          PackDescriptor(CooFromDensePackedDescriptor{
+              d, row_offset, col_offset, {buffer_size, external_workspace}})};
 }
 
 // CooMatvec: Product of COO matrix and dense vector.
@@ -423,7 +497,7 @@ std::pair<size_t, py::bytes> BuildCooFromDenseDescriptor(
 std::pair<size_t, py::bytes> BuildCooMatvecDescriptor(
     const py::dtype& data_dtype, const py::dtype& x_dtype,
     const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz, bool transpose) {
+    int cols, int nnz, bool transpose, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -461,7 +535,9 @@ std::pair<size_t, py::bytes> BuildCooMatvecDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_x)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_y)));
 
-  return {buffer_size, PackDescriptor(CooMatvecDescriptor{A, x, y, op})};
+  return {buffer_size,
+          PackDescriptor(CooMatvecDescriptor{
+              A, x, y, op, {buffer_size, external_workspace}})};
 }
 
 // CooMatmat: Product of COO matrix and dense matrix.
@@ -470,7 +546,8 @@ std::pair<size_t, py::bytes> BuildCooMatvecDescriptor(
 std::pair<size_t, py::bytes> BuildCooMatmatDescriptor(
     const py::dtype& data_dtype, const py::dtype& b_dtype,
     const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int BCcols, int nnz, bool transpose) {
+    int cols, int BCcols, int nnz, bool transpose,
+    bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -510,13 +587,466 @@ std::pair<size_t, py::bytes> BuildCooMatmatDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_c)));
 
-  return {buffer_size, PackDescriptor(CooMatmatDescriptor{A, B, C, op_A})};
+  return {buffer_size,
+          PackDescriptor(CooMatmatDescriptor{
+              A, B, C, op_A, {buffer_size, external_workspace}})};
+}
+
+#if JAX_CUSPARSE_11400
+// BsrMatmat: Product of a blocked-ELL sparse matrix and a dense matrix.
+
+// Returns the descriptor for a BsrMatmat operation.
+std::pair<size_t, py::bytes> BuildBsrMatmatDescriptor(
+    const py::dtype& data_dtype, const py::dtype& b_dtype,
+    const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
+    int cols, int BCcols, int ell_cols, int block_size,
+    bool external_workspace) {
+  auto h = SparseHandlePool::Borrow();
+  JAX_THROW_IF_ERROR(h.status());
+  auto& handle = *h;
+  if (block_size <= 0 || rows % block_size != 0 ||
+      cols % block_size != 0 || ell_cols % block_size != 0) {
+    throw std::invalid_argument(absl::StrFormat(
+        "Blocked-ELL dimensions (rows=%d, cols=%d, ell_cols=%d) must be "
+        "multiples of the block size %d",
+        rows, cols, ell_cols, block_size));
+  }
+  BlockedEllMatDescriptor A{DtypeToCudaDataType(data_dtype),
+                            DtypeToCuSparseIndexType(index_dtype),
+                            rows,
+                            cols,
+                            ell_cols,
+                            block_size};
+  DenseMatDescriptor B = BuildDenseMatDescriptor(b_dtype, cols, BCcols);
+  DenseMatDescriptor C = BuildDenseMatDescriptor(compute_dtype, rows, BCcols);
+
+  cusparseSpMatDescr_t mat_a = 0;
+  cusparseDnMatDescr_t mat_b = 0;
+  cusparseDnMatDescr_t mat_c = 0;
+
+  // bufferSize does not reference these pointers, but does error on NULL.
+  int val = 0;
+  void* empty = &val;
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseCreateBlockedEll(
+      &mat_a, A.rows, A.cols, A.block_size, A.ell_cols, empty, empty,
+      A.index_type, CUSPARSE_INDEX_BASE_ZERO, A.value_type)));
+  JAX_THROW_IF_ERROR(
+      JAX_AS_STATUS(cusparseCreateDnMat(&mat_b, B.rows, B.cols, /*ld=*/B.cols,
+                                        empty, B.type, CUSPARSE_ORDER_ROW)));
+  JAX_THROW_IF_ERROR(
+      JAX_AS_STATUS(cusparseCreateDnMat(&mat_c, C.rows, C.cols, /*ld=*/C.cols,
+                                        empty, C.type, CUSPARSE_ORDER_ROW)));
+  size_t buffer_size;
+  CudaConst alpha = CudaOne(C.type);
+  CudaConst beta = CudaZero(C.type);
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseSpMM_bufferSize(
+      handle.get(), CUSPARSE_OPERATION_NON_TRANSPOSE,
+      CUSPARSE_OPERATION_NON_TRANSPOSE, &alpha, mat_a, mat_b, &beta, mat_c,
+      C.type, CUSPARSE_SPMM_BLOCKED_ELL_ALG1, &buffer_size)));
+
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_c)));
+
+  return {buffer_size,
+          PackDescriptor(BsrMatmatDescriptor{
+              A, B, C, {buffer_size, external_workspace}})};
+}
+#endif  // if JAX_CUSPARSE_11400
+
+#if JAX_CUSPARSELT
+// Spmm24: Product of a 2:4 structured-sparse matrix and a dense matrix.
+
+cusparseComputeType DtypeToCusparseLtComputeType(const py::dtype& np_type) {
+  static auto* types =
+      new absl::flat_hash_map<std::pair<char, int>, cusparseComputeType>({
+          {{'f', 2}, CUSPARSE_COMPUTE_16F},
+          {{'V', 2}, CUSPARSE_COMPUTE_16F},
+          {{'f', 4}, CUSPARSE_COMPUTE_TF32},
+          {{'i', 4}, CUSPARSE_COMPUTE_32I},
+      });
+  auto it = types->find({np_type.kind(), np_type.itemsize()});
+  if (it == types->end()) {
+    throw std::invalid_argument(
+        absl::StrFormat("Unsupported compute dtype: %s", py::repr(np_type)));
+  }
+  return it->second;
+}
+
+// Returns the workspace size, the size of the compressed sparse matrix, and
+// the descriptor for an Spmm24 operation computing op(A) @ B, where op(A) is
+// m x k and B is k x n. If `tuned`, the fastest kernel for the problem is
+// found by benchmarking on the current device. float32 products are computed
+// in TF32 precision.
+std::tuple<size_t, size_t, py::bytes> BuildSpmm24Descriptor(
+    const py::dtype& data_dtype, const py::dtype& compute_dtype, int m, int n,
+    int k, bool transpose, bool tuned) {
+  Spmm24Descriptor d{DtypeToCudaDataType(data_dtype),
+                     DtypeToCusparseLtComputeType(compute_dtype),
+                     m,
+                     n,
+                     k,
+                     transpose,
+                     tuned};
+  auto sizes = Spmm24BufferSizes(d);
+  JAX_THROW_IF_ERROR(sizes.status());
+  return {sizes->first, sizes->second, PackDescriptor(d)};
+}
+#endif  // if JAX_CUSPARSELT
+
+// Autotuning: benchmarks used by gpu_sparse.py to choose between kernels.
+
+// Owns a device allocation for the duration of a benchmark.
+class DeviceBuffer {
+ public:
+  explicit DeviceBuffer(size_t size) {
+    JAX_THROW_IF_ERROR(
+        JAX_AS_STATUS(cudaMalloc(&ptr_, std::max<size_t>(size, 1))));
+  }
+  ~DeviceBuffer() { cudaFree(ptr_); }
+
+  DeviceBuffer(const DeviceBuffer&) = delete;
+  DeviceBuffer& operator=(const DeviceBuffer&) = delete;
+
+  void* get() const { return ptr_; }
+
+ private:
+  void* ptr_ = nullptr;
+};
+
+// Copies `indices` to `dst`, narrowing each entry to `index_size` bytes.
+void CopyIndicesToDevice(const std::vector<int64_t>& indices,
+                         size_t index_size, void* dst) {
+  auto copy = [&](auto zero) {
+    using T = decltype(zero);
+    std::vector<T> narrowed(indices.begin(), indices.end());
+    JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaMemcpy(dst, narrowed.data(),
+                                                narrowed.size() * sizeof(T),
+                                                cudaMemcpyHostToDevice)));
+  };
+  switch (index_size) {
+    case 2:
+      copy(uint16_t{0});
+      break;
+    case 4:
+      copy(int32_t{0});
+      break;
+    case 8:
+      copy(int64_t{0});
+      break;
+    default:
+      throw std::invalid_argument(
+          absl::StrFormat("Unsupported index size: %d", index_size));
+  }
+}
+
+// Returns the number of nonzeros in each row of a synthetic matrix. Real sparse
+// matrices rarely have rows of equal length, which would favor cuSPARSE's CSR
+// kernel, so row i gets a share of the nonzeros proportional to 1 / (i + 1),
+// as in a Zipf distribution. Rows hold at most `cols` nonzeros, unless there
+// are more than rows * cols of them; the excess is spread over the rows that
+// still have room.
+std::vector<int64_t> SkewedRowLengths(int rows, int cols, int nnz) {
+  std::vector<int64_t> lengths(rows, 0);
+  if (rows == 0) {
+    return lengths;
+  }
+  int64_t cap = std::max<int64_t>(cols, (int64_t{nnz} + rows - 1) / rows);
+  double harmonic = 0;
+  for (int i = 0; i < rows; ++i) {
+    harmonic += 1.0 / (i + 1);
+  }
+  int64_t assigned = 0;
+  for (int i = 0; i < rows; ++i) {
+    lengths[i] = std::min<int64_t>(
+        cap, static_cast<int64_t>(nnz / (harmonic * (i + 1))));
+    assigned += lengths[i];
+  }
+  for (int i = 0; assigned < nnz; i = (i + 1) % rows) {
+    if (lengths[i] < cap) {
+      ++lengths[i];
+      ++assigned;
+    }
+  }
+  return lengths;
+}
+
+// A synthetic sparse matrix in device memory with the row lengths of
+// SkewedRowLengths, whose nonzeros are spread evenly over the columns of each
+// row. The values are all zero: only the sparsity structure matters for
+// timing.
+struct SyntheticSparseMatrix {
+  SyntheticSparseMatrix(const SparseMatDescriptor& d, size_t value_size,
+                        size_t index_size)
+      : values(d.nnz * value_size),
+        row_offsets((d.rows + 1) * index_size),
+        row_ind(d.nnz * index_size),
+        col_ind(d.nnz * index_size) {
+    std::vector<int64_t> lengths = SkewedRowLengths(d.rows, d.cols, d.nnz);
+    std::vector<int64_t> offsets(d.rows + 1, 0), rows, cols;
+    rows.reserve(d.nnz);
+    cols.reserve(d.nnz);
+    for (int i = 0; i < d.rows; ++i) {
+      int64_t row_nnz = lengths[i];
+      for (int64_t k = 0; k < row_nnz; ++k) {
+        rows.push_back(i);
+        cols.push_back(k * d.cols / row_nnz);
+      }
+      offsets[i + 1] = offsets[i] + row_nnz;
+    }
+    CopyIndicesToDevice(offsets, index_size, row_offsets.get());
+    CopyIndicesToDevice(rows, index_size, row_ind.get());
+    CopyIndicesToDevice(cols, index_size, col_ind.get());
+    JAX_THROW_IF_ERROR(
+        JAX_AS_STATUS(cudaMemset(values.get(), 0, d.nnz * value_size)));
+  }
+
+  DeviceBuffer values, row_offsets, row_ind, col_ind;
+};
+
+// Returns the mean time in milliseconds of `iterations` calls to `fn` on the
+// default stream, after one untimed warm-up call.
+template <typename F>
+float TimeOnDefaultStream(int iterations, F fn) {
+  cudaEvent_t start, stop;
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaEventCreate(&start)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaEventCreate(&stop)));
+  JAX_THROW_IF_ERROR(fn());
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaEventRecord(start, /*stream=*/0)));
+  for (int i = 0; i < iterations; ++i) {
+    JAX_THROW_IF_ERROR(fn());
+  }
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaEventRecord(stop, /*stream=*/0)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaEventSynchronize(stop)));
+  float ms;
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaEventElapsedTime(&ms, start, stop)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaEventDestroy(start)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaEventDestroy(stop)));
+  return ms / std::max(iterations, 1);
+}
+
+// Returns the mean time in milliseconds of the LightSpMV kernel on a synthetic
+// CSR matrix.
+float BenchmarkCsrMatvecLight(const py::dtype& data_dtype,
+                              const py::dtype& x_dtype,
+                              const py::dtype& index_dtype, int rows, int cols,
+                              int nnz, int iterations) {
+  CsrMatvecLightDescriptor d = BuildCsrMatvecLightDescriptorStruct(
+      data_dtype, x_dtype, index_dtype, rows, cols, nnz);
+  SparseMatDescriptor A =
+      BuildSparseMatDescriptor(data_dtype, index_dtype, rows, cols, nnz);
+  SyntheticSparseMatrix mat(A, data_dtype.itemsize(), index_dtype.itemsize());
+  DeviceBuffer xbuf(cols * x_dtype.itemsize());
+  DeviceBuffer ybuf(rows * data_dtype.itemsize());
+  DeviceBuffer row_counter(sizeof(int32_t));
+  JAX_THROW_IF_ERROR(
+      JAX_AS_STATUS(cudaMemset(xbuf.get(), 0, cols * x_dtype.itemsize())));
+  void* buffers[] = {mat.values.get(), mat.col_ind.get(),
+                     mat.row_offsets.get(), xbuf.get(),
+                     ybuf.get(), row_counter.get()};
+  return TimeOnDefaultStream(iterations, [&]() {
+    JAX_RETURN_IF_ERROR(LaunchCsrMatvecLightKernel(/*stream=*/0, buffers, d));
+    return JAX_AS_STATUS(cudaGetLastError());
+  });
+}
+
+// Returns the mean time in milliseconds of a sparse matrix/vector product on a
+// synthetic matrix stored in `format` ("csr", "coo" or "light", the LightSpMV
+// CSR kernel).
+float BenchmarkSpmv(const std::string& format, const py::dtype& data_dtype,
+                    const py::dtype& x_dtype, const py::dtype& compute_dtype,
+                    const py::dtype& index_dtype, int rows, int cols, int nnz,
+                    bool transpose, int iterations) {
+  if (format == "light") {
+    return BenchmarkCsrMatvecLight(data_dtype, x_dtype, index_dtype, rows,
+                                   cols, nnz, iterations);
+  }
+  auto h = SparseHandlePool::Borrow();
+  JAX_THROW_IF_ERROR(h.status());
+  auto& handle = *h;
+  SparseMatDescriptor A =
+      BuildSparseMatDescriptor(data_dtype, index_dtype, rows, cols, nnz);
+  DenseVecDescriptor x =
+      BuildDenseVecDescriptor(x_dtype, transpose ? rows : cols);
+  DenseVecDescriptor y =
+      BuildDenseVecDescriptor(compute_dtype, transpose ? cols : rows);
+  cusparseOperation_t op = transpose ? CUSPARSE_OPERATION_TRANSPOSE
+                                     : CUSPARSE_OPERATION_NON_TRANSPOSE;
+
+  SyntheticSparseMatrix mat(A, data_dtype.itemsize(), index_dtype.itemsize());
+  DeviceBuffer xbuf(x.size * x_dtype.itemsize());
+  DeviceBuffer ybuf(y.size * compute_dtype.itemsize());
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(
+      cudaMemset(xbuf.get(), 0, x.size * x_dtype.itemsize())));
+
+  cusparseSpMatDescr_t mat_a = 0;
+  cusparseDnVecDescr_t vec_x = 0;
+  cusparseDnVecDescr_t vec_y = 0;
+  if (format == "csr") {
+    JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseCreateCsr(
+        &mat_a, A.rows, A.cols, A.nnz, mat.row_offsets.get(),
+        mat.col_ind.get(), mat.values.get(), A.index_type, A.index_type,
+        CUSPARSE_INDEX_BASE_ZERO, A.value_type)));
+  } else if (format == "coo") {
+    JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseCreateCoo(
+        &mat_a, A.rows, A.cols, A.nnz, mat.row_ind.get(), mat.col_ind.get(),
+        mat.values.get(), A.index_type, CUSPARSE_INDEX_BASE_ZERO,
+        A.value_type)));
+  } else {
+    throw std::invalid_argument(
+        absl::StrFormat("Unsupported sparse format: %s", format));
+  }
+  JAX_THROW_IF_ERROR(
+      JAX_AS_STATUS(cusparseCreateDnVec(&vec_x, x.size, xbuf.get(), x.type)));
+  JAX_THROW_IF_ERROR(
+      JAX_AS_STATUS(cusparseCreateDnVec(&vec_y, y.size, ybuf.get(), y.type)));
+  size_t buffer_size;
+  CudaConst alpha = CudaOne(y.type);
+  CudaConst beta = CudaZero(y.type);
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseSpMV_bufferSize(
+      handle.get(), op, &alpha, mat_a, vec_x, &beta, vec_y, y.type,
+      CUSPARSE_MV_ALG_DEFAULT, &buffer_size)));
+  DeviceBuffer buf(buffer_size);
+
+  float ms = TimeOnDefaultStream(iterations, [&]() {
+    return JAX_AS_STATUS(cusparseSpMV(handle.get(), op, &alpha, mat_a, vec_x,
+                                      &beta, vec_y, y.type,
+                                      CUSPARSE_MV_ALG_DEFAULT, buf.get()));
+  });
+
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_x)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_y)));
+  return ms;
+}
+
+// Returns the cusparseSpMMAlg_t values that apply to CSR matrices, starting
+// with the default.
+std::vector<int> SpmmCsrAlgorithms() {
+  return {
+      CUSPARSE_SPMM_ALG_DEFAULT, CUSPARSE_SPMM_CSR_ALG1,
+      CUSPARSE_SPMM_CSR_ALG2,
+#if JAX_CUSPARSE_11400
+      CUSPARSE_SPMM_CSR_ALG3,
+#endif  // if JAX_CUSPARSE_11400
+  };
+}
+
+// Returns the mean time in milliseconds of a CSR matrix/matrix product computed
+// by cusparseSpMM with algorithm `alg` on a synthetic matrix, or infinity if
+// cuSPARSE does not support `alg` for this problem.
+float TimeCsrmm(int alg, const py::dtype& data_dtype, const py::dtype& b_dtype,
+                const py::dtype& compute_dtype, const py::dtype& index_dtype,
+                int rows, int cols, int BCcols, int nnz, bool transpose,
+                int iterations) {
+  auto h = SparseHandlePool::Borrow();
+  JAX_THROW_IF_ERROR(h.status());
+  auto& handle = *h;
+  SparseMatDescriptor A =
+      BuildSparseMatDescriptor(data_dtype, index_dtype, rows, cols, nnz);
+  DenseMatDescriptor B =
+      BuildDenseMatDescriptor(b_dtype, transpose ? rows : cols, BCcols);
+  DenseMatDescriptor C =
+      BuildDenseMatDescriptor(compute_dtype, transpose ? cols : rows, BCcols);
+  cusparseOperation_t op_A = transpose ? CUSPARSE_OPERATION_TRANSPOSE
+                                       : CUSPARSE_OPERATION_NON_TRANSPOSE;
+  auto spmm_alg = static_cast<cusparseSpMMAlg_t>(alg);
+
+  SyntheticSparseMatrix mat(A, data_dtype.itemsize(), index_dtype.itemsize());
+  size_t b_size = size_t{1} * B.rows * B.cols * b_dtype.itemsize();
+  DeviceBuffer bbuf(b_size);
+  DeviceBuffer cbuf(size_t{1} * C.rows * C.cols * compute_dtype.itemsize());
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cudaMemset(bbuf.get(), 0, b_size)));
+
+  cusparseSpMatDescr_t mat_a = 0;
+  cusparseDnMatDescr_t mat_b = 0;
+  cusparseDnMatDescr_t mat_c = 0;
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseCreateCsr(
+      &mat_a, A.rows, A.cols, A.nnz, mat.row_offsets.get(), mat.col_ind.get(),
+      mat.values.get(), A.index_type, A.index_type, CUSPARSE_INDEX_BASE_ZERO,
+      A.value_type)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseCreateDnMat(
+      &mat_b, B.rows, B.cols, /*ld=*/B.cols, bbuf.get(), B.type,
+      CUSPARSE_ORDER_ROW)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseCreateDnMat(
+      &mat_c, C.rows, C.cols, /*ld=*/C.cols, cbuf.get(), C.type,
+      CUSPARSE_ORDER_ROW)));
+  CudaConst alpha = CudaOne(C.type);
+  CudaConst beta = CudaZero(C.type);
+  auto spmm = [&](void* buf) {
+    return cusparseSpMM(handle.get(), op_A, CUSPARSE_OPERATION_NON_TRANSPOSE,
+                        &alpha, mat_a, mat_b, &beta, mat_c, C.type, spmm_alg,
+                        buf);
+  };
+
+  // Not every algorithm supports every operation, layout and dtype; cuSPARSE
+  // reports unsupported combinations from bufferSize or from the first call.
+  float ms = std::numeric_limits<float>::infinity();
+  size_t buffer_size;
+  if (cusparseSpMM_bufferSize(handle.get(), op_A,
+                              CUSPARSE_OPERATION_NON_TRANSPOSE, &alpha, mat_a,
+                              mat_b, &beta, mat_c, C.type, spmm_alg,
+                              &buffer_size) == CUSPARSE_STATUS_SUCCESS) {
+    DeviceBuffer buf(buffer_size);
+    if (spmm(buf.get()) == CUSPARSE_STATUS_SUCCESS) {
+      ms = TimeOnDefaultStream(
+          iterations, [&]() { return JAX_AS_STATUS(spmm(buf.get())); });
+    }
+  }
+
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_c)));
+  return ms;
 }
 
 #endif  // if JAX_CUSPARSE_11300
 
-py::bytes BuildGtsv2Descriptor(int m, int n, int ldb) {
-  return PackDescriptor(Gtsv2Descriptor{m, n, ldb});
+py::bytes BuildCsr2CooDescriptor(int rows, int nnz) {
+  return PackDescriptor(Csr2CooDescriptor{rows, nnz});
+}
+
+// Returns the workspace size and the descriptor of a CSR to CSC conversion.
+std::pair<size_t, py::bytes> BuildCsr2CscDescriptor(const py::dtype& data_dtype,
+                                                    int rows, int cols, int nnz,
+                                                    bool external_workspace) {
+  auto h = SparseHandlePool::Borrow();
+  JAX_THROW_IF_ERROR(h.status());
+  auto& handle = *h;
+  cudaDataType value_type = DtypeToCudaDataType(data_dtype);
+  size_t buffer_size;
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(cusparseCsr2cscEx2_bufferSize(
+      handle.get(), rows, cols, nnz, /*csrVal=*/nullptr, /*csrRowPtr=*/nullptr,
+      /*csrColInd=*/nullptr, /*cscVal=*/nullptr, /*cscColPtr=*/nullptr,
+      /*cscRowInd=*/nullptr, value_type, CUSPARSE_ACTION_NUMERIC,
+      CUSPARSE_INDEX_BASE_ZERO, CUSPARSE_CSR2CSC_ALG1, &buffer_size)));
+  return {buffer_size,
+          PackDescriptor(Csr2CscDescriptor{
+              value_type, rows, cols, nnz, {buffer_size, external_workspace}})};
+}
+
+// Returns the descriptor of a dense matrix-vector product that skips the
+// matrix entries whose magnitude is at most `eps`.
+py::bytes BuildDenseMvSparseDescriptor(const py::dtype& data_dtype,
+                                       const py::dtype& x_dtype, int rows,
+                                       int cols, bool transpose, double eps) {
+  cudaDataType type = DtypeToCudaDataType(data_dtype);
+  if (DtypeToCudaDataType(x_dtype) != type) {
+    throw std::invalid_argument(
+        "densemv_sparse requires matching matrix and vector dtypes");
+  }
+  if (type != CUDA_R_32F && type != CUDA_R_64F) {
+    throw std::invalid_argument(
+        "densemv_sparse only supports float32 and float64");
+  }
+  return PackDescriptor(
+      DenseMvSparseDescriptor{type, rows, cols, transpose, eps});
+}
+
+py::bytes BuildGtsv2Descriptor(int m, int n, int ldb, size_t buffer_size,
+                               bool external_workspace) {
+  return PackDescriptor(
+      Gtsv2Descriptor{m, n, ldb, {buffer_size, external_workspace}});
 }
 
 template <typename F>
@@ -539,6 +1069,35 @@ size_t Gtsv2BufferSizeF64(int m, int n, int ldb) {
   return Gtsv2BufferSize(cusparseDgtsv2_bufferSizeExt, m, n, ldb);
 }
 
+py::bytes BuildGtsv2BatchedDescriptor(int m, int batch_count, int batch_stride,
+                                      size_t buffer_size,
+                                      bool external_workspace) {
+  return PackDescriptor(Gtsv2BatchedDescriptor{
+      m, batch_count, batch_stride, {buffer_size, external_workspace}});
+}
+
+template <typename F>
+size_t Gtsv2BatchedBufferSize(F f, int m, int batch_count, int batch_stride) {
+  auto h = SparseHandlePool::Borrow();
+  JAX_THROW_IF_ERROR(h.status());
+  auto& handle = *h;
+  size_t size;
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(
+      f(handle.get(), m, /*dl=*/nullptr, /*d=*/nullptr, /*du=*/nullptr,
+        /*x=*/nullptr, batch_count, batch_stride, &size)));
+  return size;
+}
+
+size_t Gtsv2BatchedBufferSizeF32(int m, int batch_count, int batch_stride) {
+  return Gtsv2BatchedBufferSize(cusparseSgtsv2StridedBatch_bufferSizeExt, m,
+                                batch_count, batch_stride);
+}
+
+size_t Gtsv2BatchedBufferSizeF64(int m, int batch_count, int batch_stride) {
+  return Gtsv2BatchedBufferSize(cusparseDgtsv2StridedBatch_bufferSizeExt, m,
+                                batch_count, batch_stride);
+}
+
 py::dict Registrations() {
   py::dict dict;
 #if JAX_CUSPARSE_11300
@@ -548,17 +1107,36 @@ py::dict Registrations() {
   dict["cusparse_csr_matmat"] = EncapsulateFunction(CsrMatmat);
   dict["cusparse_coo_todense"] = EncapsulateFunction(CooToDense);
   dict["cusparse_coo_fromdense"] = EncapsulateFunction(CooFromDense);
+  dict["cusparse_coo_fromdense_packed"] =
+      EncapsulateFunction(CooFromDensePacked);
   dict["cusparse_coo_matvec"] = EncapsulateFunction(CooMatvec);
   dict["cusparse_coo_matmat"] = EncapsulateFunction(CooMatmat);
 #endif
+#if JAX_CUSPARSE_11400
+  dict["cusparse_bsr_matmat"] = EncapsulateFunction(BsrMatmat);
+#endif
+#if JAX_CUSPARSELT
+  dict["cusparse_spmm24"] = EncapsulateFunction(Spmm24);
+  dict["cusparse_spmm24_compress"] = EncapsulateFunction(Spmm24Compress);
+#endif
+  dict["cusparse_csr2coo"] = EncapsulateFunction(Csr2Coo);
+  dict["cusparse_csr2csc"] = EncapsulateFunction(Csr2Csc);
+  dict["cusparse_densemv_sparse"] = EncapsulateFunction(DenseMvSparse);
+  dict["cusparse_csr_matvec_light"] = EncapsulateFunction(CsrMatvecLight);
+  dict["cusparse_csr_fromdense_fast"] = EncapsulateFunction(CsrFromDenseFast);
+  dict["cusparse_csr_matvec_grouped"] = EncapsulateFunction(CsrMatvecGrouped);
+  dict["cusparse_csr_matmat_tiled"] = EncapsulateFunction(CsrMatmatTiled);
   dict["cusparse_gtsv2_f32"] = EncapsulateFunction(gtsv2_f32);
   dict["cusparse_gtsv2_f64"] = EncapsulateFunction(gtsv2_f64);
+  dict["cusparse_gtsv2_batched_f32"] = EncapsulateFunction(gtsv2_batched_f32);
+  dict["cusparse_gtsv2_batched_f64"] = EncapsulateFunction(gtsv2_batched_f64);
   // TODO(tomhennigan): Add support for gtsv2 complex 32/64.
   return dict;
 }
 
 PYBIND11_MODULE(_cusparse, m) {
   m.attr("cusparse_supported") = py::bool_(JAX_CUSPARSE_11300);
+  m.attr("cusparselt_supported") = py::bool_(JAX_CUSPARSELT);
   m.def("registrations", &Registrations);
 #if JAX_CUSPARSE_11300
   m.def("build_csr_todense_descriptor", &BuildCsrToDenseDescriptor);
@@ -567,12 +1145,35 @@ PYBIND11_MODULE(_cusparse, m) {
   m.def("build_csr_matmat_descriptor", &BuildCsrMatmatDescriptor);
   m.def("build_coo_todense_descriptor", &BuildCooToDenseDescriptor);
   m.def("build_coo_fromdense_descriptor", &BuildCooFromDenseDescriptor);
+  m.def("build_coo_fromdense_packed_descriptor",
+        &BuildCooFromDensePackedDescriptor);
   m.def("build_coo_matvec_descriptor", &BuildCooMatvecDescriptor);
   m.def("build_coo_matmat_descriptor", &BuildCooMatmatDescriptor);
+  m.def("benchmark_spmv", &BenchmarkSpmv);
+  m.def("spmm_csr_algorithms", &SpmmCsrAlgorithms);
+  m.def("time_csrmm", &TimeCsrmm);
+#endif
+#if JAX_CUSPARSE_11400
+  m.def("build_bsr_matmat_descriptor", &BuildBsrMatmatDescriptor);
+#endif
+#if JAX_CUSPARSELT
+  m.def("build_spmm24_descriptor", &BuildSpmm24Descriptor);
 #endif
+  m.def("build_csr2coo_descriptor", &BuildCsr2CooDescriptor);
+  m.def("build_csr2csc_descriptor", &BuildCsr2CscDescriptor);
+  m.def("build_densemv_sparse_descriptor", &BuildDenseMvSparseDescriptor);
+  m.def("build_csr_matvec_light_descriptor", &BuildCsrMatvecLightDescriptor);
+  m.def("build_csr_fromdense_fast_descriptor",
+        &BuildCsrFromDenseFastDescriptor);
+  m.def("build_csr_matvec_grouped_descriptor",
+        &BuildCsrMatvecGroupedDescriptor);
+  m.def("build_csr_matmat_tiled_descriptor", &BuildCsrMatmatTiledDescriptor);
   m.def("gtsv2_f32_buffer_size", &Gtsv2BufferSizeF32);
   m.def("gtsv2_f64_buffer_size", &Gtsv2BufferSizeF64);
   m.def("build_gtsv2_descriptor", &BuildGtsv2Descriptor);
+  m.def("gtsv2_batched_f32_buffer_size", &Gtsv2BatchedBufferSizeF32);
+  m.def("gtsv2_batched_f64_buffer_size", &Gtsv2BatchedBufferSizeF64);
+  m.def("build_gtsv2_batched_descriptor", &BuildGtsv2BatchedDescriptor);
 }
 
 }  // namespace
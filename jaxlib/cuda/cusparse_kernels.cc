@@ -17,18 +17,26 @@ limitations under the License.
 
 #include <algorithm>
 #include <cstdint>
+#include <list>
+#include <memory>
 #include <stdexcept>
+#include <string>
+#include <tuple>
 #include <utility>
 #include <vector>
 
+#include "absl/base/thread_annotations.h"
+#include "absl/container/flat_hash_map.h"
 #include "absl/status/status.h"
 #include "absl/status/statusor.h"
+#include "absl/strings/str_format.h"
 #include "absl/synchronization/mutex.h"
 #include "third_party/gpus/cuda/include/cuComplex.h"
 #include "third_party/gpus/cuda/include/cuda.h"
 #include "third_party/gpus/cuda/include/cuda_runtime_api.h"
 #include "third_party/gpus/cuda/include/cusparse.h"
 #include "jaxlib/cuda/cuda_gpu_kernel_helpers.h"
+#include "jaxlib/cuda/cuda_sparse_kernels.h"
 #include "jaxlib/handle_pool.h"
 #include "jaxlib/kernel_helpers.h"
 #include "tensorflow/compiler/xla/service/custom_call_status.h"
@@ -52,14 +60,17 @@ template <>
   SparseHandlePool* pool = Instance();
   absl::MutexLock lock(&pool->mu_);
   cusparseHandle_t handle;
-  if (pool->handles_[stream].empty()) {
+  std::vector<cusparseHandle_t>& handles = pool->handles_[stream];
+  if (handles.empty()) {
     JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreate(&handle)));
+    if (stream) {
+      JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseSetStream(handle, stream)));
+    }
   } else {
-    handle = pool->handles_[stream].back();
-    pool->handles_[stream].pop_back();
-  }
-  if (stream) {
-    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseSetStream(handle, stream)));
+    // Handles are returned to the pool of the stream they were borrowed for,
+    // so they are already bound to `stream`.
+    handle = handles.back();
+    handles.pop_back();
   }
   return Handle(pool, handle, stream);
 }
@@ -142,17 +153,201 @@ CudaConst CudaOne(cudaDataType type) {
   return c;
 }
 
+// Scratch space of a sparse operation. If it is the workspace shared by the
+// operations on a stream, it holds the lock of that workspace until it is
+// destroyed, after the operation has enqueued its work, so that no other
+// operation can replace the buffer in the meantime.
+class ScratchSpace {
+ public:
+  explicit ScratchSpace(void* ptr, absl::Mutex* mu = nullptr)
+      : ptr_(ptr), mu_(mu) {}
+  ScratchSpace(ScratchSpace&& other)
+      : ptr_(other.ptr_), mu_(std::exchange(other.mu_, nullptr)) {}
+  ScratchSpace& operator=(ScratchSpace&&) = delete;
+  ~ScratchSpace() {
+    if (mu_) {
+      mu_->Unlock();
+    }
+  }
+
+  void* get() const { return ptr_; }
+
+ private:
+  void* ptr_;
+  absl::Mutex* mu_;
+};
+
+// Returns scratch space of at least `size` bytes shared by all sparse
+// operations on `stream`. Operations on a stream execute in order, so they can
+// reuse one allocation; it only ever grows. The buffer is replaced with
+// stream-ordered frees and allocations, which wait for the work already
+// enqueued on `stream` without blocking the host.
+static absl::StatusOr<ScratchSpace> SharedWorkspace(cudaStream_t stream,
+                                                    size_t size) {
+  struct Shared {
+    absl::Mutex mu;
+    void* ptr = nullptr;
+    size_t size = 0;
+  };
+  static absl::Mutex mu(absl::kConstInit);
+  static auto* workspaces =
+      new absl::flat_hash_map<cudaStream_t, std::unique_ptr<Shared>>();
+  Shared* workspace;
+  {
+    absl::MutexLock lock(&mu);
+    std::unique_ptr<Shared>& entry = (*workspaces)[stream];
+    if (!entry) {
+      entry = std::make_unique<Shared>();
+    }
+    workspace = entry.get();
+  }
+  workspace->mu.Lock();
+  auto grow = [&]() {
+    if (workspace->size >= size) {
+      return absl::OkStatus();
+    }
+    if (workspace->ptr) {
+      JAX_RETURN_IF_ERROR(
+          JAX_AS_STATUS(cudaFreeAsync(workspace->ptr, stream)));
+      workspace->ptr = nullptr;
+      workspace->size = 0;
+    }
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(cudaMallocAsync(&workspace->ptr, size, stream)));
+    workspace->size = size;
+    return absl::OkStatus();
+  };
+  absl::Status s = grow();
+  if (!s.ok()) {
+    workspace->mu.Unlock();
+    return s;
+  }
+  return ScratchSpace(workspace->ptr, &workspace->mu);
+}
+
+// Returns the scratch space of an operation whose XLA-allocated workspace, if
+// any, is buffers[index]. Operations that need no scratch space have no
+// workspace buffer, and get a null pointer.
+static absl::StatusOr<ScratchSpace> Workspace(cudaStream_t stream,
+                                              const WorkspaceDescriptor& d,
+                                              void** buffers, int index) {
+  const size_t size = d.size;
+  if (d.external) {
+    return SharedWorkspace(stream, size);
+  }
+  if (size == 0) {
+    return ScratchSpace(nullptr);
+  }
+  return ScratchSpace(buffers[index]);
+}
+
 #if JAX_CUSPARSE_11300
+// cuSPARSE descriptors of a sparse matrix/vector product. Destroys those it
+// holds, so that descriptors created before a failed creation are released.
+struct SpmvDescriptors {
+  SpmvDescriptors() = default;
+  SpmvDescriptors(SpmvDescriptors&& other)
+      : mat_a(std::exchange(other.mat_a, nullptr)),
+        vec_x(std::exchange(other.vec_x, nullptr)),
+        vec_y(std::exchange(other.vec_y, nullptr)) {}
+  SpmvDescriptors& operator=(SpmvDescriptors&&) = delete;
+  ~SpmvDescriptors() {
+    if (mat_a) {
+      cusparseDestroySpMat(mat_a);
+    }
+    if (vec_x) {
+      cusparseDestroyDnVec(vec_x);
+    }
+    if (vec_y) {
+      cusparseDestroyDnVec(vec_y);
+    }
+  }
+
+  cusparseSpMatDescr_t mat_a = nullptr;
+  cusparseDnVecDescr_t vec_x = nullptr;
+  cusparseDnVecDescr_t vec_y = nullptr;
+};
+
+// Creating cuSPARSE descriptors costs host time comparable to a small SpMV, so
+// matrix/vector products keep theirs in a per-thread LRU cache keyed on the
+// opaque descriptor of the operation, and only update the data pointers of a
+// cached entry. Being per-thread, an entry is never used by two calls at once.
+class SpmvDescriptorCache {
+ public:
+  static constexpr int kCapacity = 256;
+
+  SpmvDescriptorCache() = default;
+  SpmvDescriptorCache(const SpmvDescriptorCache&) = delete;
+  SpmvDescriptorCache& operator=(const SpmvDescriptorCache&) = delete;
+
+  static SpmvDescriptorCache& ForThread() {
+    thread_local SpmvDescriptorCache cache;
+    return cache;
+  }
+
+  // Returns the descriptors cached for `key`, or nullptr.
+  SpmvDescriptors* Find(const std::string& key) {
+    auto it = index_.find(key);
+    if (it == index_.end()) {
+      return nullptr;
+    }
+    entries_.splice(entries_.begin(), entries_, it->second);
+    return &it->second->second;
+  }
+
+  // Takes ownership of `descriptors`, evicting the least recently used entry
+  // if the cache is full.
+  SpmvDescriptors* Insert(std::string key, SpmvDescriptors descriptors) {
+    if (entries_.size() >= kCapacity) {
+      index_.erase(entries_.back().first);
+      entries_.pop_back();
+    }
+    entries_.emplace_front(std::move(key), std::move(descriptors));
+    index_[entries_.front().first] = entries_.begin();
+    return &entries_.front().second;
+  }
+
+ private:
+  using Entry = std::pair<std::string, SpmvDescriptors>;
+  std::list<Entry> entries_;
+  absl::flat_hash_map<std::string, std::list<Entry>::iterator> index_;
+};
+
+// Returns the size in bytes of indices of `type`.
+static size_t IndexTypeSize(cusparseIndexType_t type) {
+  switch (type) {
+    case CUSPARSE_INDEX_16U:
+      return 2;
+    case CUSPARSE_INDEX_32I:
+      return 4;
+    case CUSPARSE_INDEX_64I:
+      return 8;
+  }
+  return 0;
+}
+
+// Returns the key of an SpMV on a matrix in `format` in SpmvDescriptorCache.
+// The CSR and COO opaque descriptors have the same layout, so the format is
+// part of the key.
+static std::string SpmvCacheKey(const char* format, const char* opaque,
+                                size_t opaque_len) {
+  std::string key(format);
+  key.append(opaque, opaque_len);
+  return key;
+}
+
 // CsrToDense: Convert CSR matrix to dense matrix
 
 static absl::Status CsrToDense_(cudaStream_t stream, void** buffers,
                                 const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
+  auto s = UnpackDescriptor<SparseConvertDescriptor>(opaque, opaque_len);
   JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
+  const SparseMatDescriptor& d = (**s).A;
   auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
+  auto buf = Workspace(stream, (**s).workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(buf.status());
 
   cusparseSpMatDescr_t mat_a = 0;
   cusparseDnMatDescr_t mat_b = 0;
@@ -168,7 +363,7 @@ static absl::Status CsrToDense_(cudaStream_t stream, void** buffers,
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
       cusparseSparseToDense(handle.get(), mat_a, mat_b,
-                            CUSPARSE_SPARSETODENSE_ALG_DEFAULT, buffers[4])));
+                            CUSPARSE_SPARSETODENSE_ALG_DEFAULT, buf->get())));
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
@@ -188,12 +383,14 @@ void CsrToDense(cudaStream_t stream, void** buffers, const char* opaque,
 
 static absl::Status CsrFromDense_(cudaStream_t stream, void** buffers,
                                   const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
+  auto s = UnpackDescriptor<SparseConvertDescriptor>(opaque, opaque_len);
   JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
+  const SparseMatDescriptor& d = (**s).A;
   auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
+  auto buf = Workspace(stream, (**s).workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(buf.status());
 
   cusparseDnMatDescr_t mat_a = 0;
   cusparseSpMatDescr_t mat_b = 0;
@@ -208,10 +405,10 @@ static absl::Status CsrFromDense_(cudaStream_t stream, void** buffers,
                         CUSPARSE_INDEX_BASE_ZERO, d.value_type)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDenseToSparse_analysis(
       handle.get(), mat_a, mat_b, CUSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
+      buf->get())));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDenseToSparse_convert(
       handle.get(), mat_a, mat_b, CUSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
+      buf->get())));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_b)));
   return absl::OkStatus();
@@ -242,7 +439,16 @@ static absl::Status CsrMatvec_(cudaStream_t stream, void** buffers,
   void* csr_row_offsets = buffers[2];
   void* xbuf = buffers[3];
   void* ybuf = buffers[4];
-  void* buf = buffers[5];
+#ifndef NDEBUG
+  // Debug builds verify on the device that indptr[rows] == nnz.
+  LaunchCsrCheckInvariantsKernel(stream, csr_row_offsets,
+                                 IndexTypeSize(d.A.index_type), d.A.rows,
+                                 d.A.nnz);
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaGetLastError()));
+#endif  // NDEBUG
+  auto ws = Workspace(stream, d.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
 
   // TODO(jakevdp): alpha and beta should be user-specifiable, but constants
   // are sufficient for basic matvec operations.
@@ -251,26 +457,32 @@ static absl::Status CsrMatvec_(cudaStream_t stream, void** buffers,
   CudaConst alpha = CudaOne(d.y.type);
   CudaConst beta = CudaZero(d.y.type);
 
-  cusparseSpMatDescr_t mat_a = 0;
-  cusparseDnVecDescr_t vec_x = 0;
-  cusparseDnVecDescr_t vec_y = 0;
-
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      cusparseCreateCsr(&mat_a, d.A.rows, d.A.cols, d.A.nnz, csr_row_offsets,
-                        csr_col_ind, csr_values, d.A.index_type, d.A.index_type,
-                        CUSPARSE_INDEX_BASE_ZERO, d.A.value_type)));
-  JAX_RETURN_IF_ERROR(
-      JAX_AS_STATUS(cusparseCreateDnVec(&vec_x, d.x.size, xbuf, d.x.type)));
-  JAX_RETURN_IF_ERROR(
-      JAX_AS_STATUS(cusparseCreateDnVec(&vec_y, d.y.size, ybuf, d.y.type)));
-
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      cusparseSpMV(handle.get(), d.op, &alpha, mat_a, vec_x, &beta, vec_y,
-                   d.y.type, CUSPARSE_MV_ALG_DEFAULT, buf)));
+  SpmvDescriptorCache& cache = SpmvDescriptorCache::ForThread();
+  std::string key = SpmvCacheKey("csr", opaque, opaque_len);
+  SpmvDescriptors* desc = cache.Find(key);
+  if (desc == nullptr) {
+    SpmvDescriptors created;
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateCsr(
+        &created.mat_a, d.A.rows, d.A.cols, d.A.nnz, csr_row_offsets,
+        csr_col_ind, csr_values, d.A.index_type, d.A.index_type,
+        CUSPARSE_INDEX_BASE_ZERO, d.A.value_type)));
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+        cusparseCreateDnVec(&created.vec_x, d.x.size, xbuf, d.x.type)));
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+        cusparseCreateDnVec(&created.vec_y, d.y.size, ybuf, d.y.type)));
+    desc = cache.Insert(std::move(key), std::move(created));
+  } else {
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCsrSetPointers(
+        desc->mat_a, csr_row_offsets, csr_col_ind, csr_values)));
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(cusparseDnVecSetValues(desc->vec_x, xbuf)));
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(cusparseDnVecSetValues(desc->vec_y, ybuf)));
+  }
 
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_x)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_y)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseSpMV(
+      handle.get(), d.op, &alpha, desc->mat_a, desc->vec_x, &beta,
+      desc->vec_y, d.y.type, CUSPARSE_MV_ALG_DEFAULT, buf)));
   return absl::OkStatus();
 }
 
@@ -299,7 +511,9 @@ static absl::Status CsrMatmat_(cudaStream_t stream, void** buffers,
   void* csr_row_offsets = buffers[2];
   void* Bbuf = buffers[3];
   void* Cbuf = buffers[4];
-  void* buf = buffers[5];
+  auto ws = Workspace(stream, d.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
 
   // TODO(jakevdp): alpha and beta should be user-specifiable, but constants
   // are sufficient for basic matvec operations.
@@ -324,7 +538,7 @@ static absl::Status CsrMatmat_(cudaStream_t stream, void** buffers,
       /*ld=*/d.C.cols, Cbuf, d.C.type, CUSPARSE_ORDER_ROW)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseSpMM(
       handle.get(), d.op_A, /*opB=*/CUSPARSE_OPERATION_NON_TRANSPOSE, &alpha,
-      mat_a, mat_b, &beta, mat_c, d.C.type, CUSPARSE_SPMM_ALG_DEFAULT, buf)));
+      mat_a, mat_b, &beta, mat_c, d.C.type, d.alg, buf)));
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
@@ -345,12 +559,14 @@ void CsrMatmat(cudaStream_t stream, void** buffers, const char* opaque,
 
 static absl::Status CooToDense_(cudaStream_t stream, void** buffers,
                                 const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
+  auto s = UnpackDescriptor<SparseConvertDescriptor>(opaque, opaque_len);
   JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
+  const SparseMatDescriptor& d = (**s).A;
   auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
+  auto buf = Workspace(stream, (**s).workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(buf.status());
 
   cusparseSpMatDescr_t mat_a = 0;
   cusparseDnMatDescr_t mat_b = 0;
@@ -366,7 +582,7 @@ static absl::Status CooToDense_(cudaStream_t stream, void** buffers,
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
       cusparseSparseToDense(handle.get(), mat_a, mat_b,
-                            CUSPARSE_SPARSETODENSE_ALG_DEFAULT, buffers[4])));
+                            CUSPARSE_SPARSETODENSE_ALG_DEFAULT, buf->get())));
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
@@ -384,11 +600,12 @@ void CooToDense(cudaStream_t stream, void** buffers, const char* opaque,
 
 // CooFromDense: Convert dense matrix to COO matrix
 
-static absl::Status CooFromDense_(cudaStream_t stream, void** buffers,
-                                  const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
-  JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
+// Converts the dense matrix `mat` to the COO matrix with the given values and
+// row and column indices.
+static absl::Status CooFromDenseImpl(cudaStream_t stream,
+                                     const SparseMatDescriptor& d, void* mat,
+                                     void* values, void* row_ind,
+                                     void* col_ind, void* workspace) {
   auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
@@ -397,24 +614,34 @@ static absl::Status CooFromDense_(cudaStream_t stream, void** buffers,
   cusparseSpMatDescr_t mat_b = 0;
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateDnMat(
       &mat_a, d.rows, d.cols,
-      /*ld=*/d.cols, buffers[0], d.value_type, CUSPARSE_ORDER_ROW)));
+      /*ld=*/d.cols, mat, d.value_type, CUSPARSE_ORDER_ROW)));
   JAX_RETURN_IF_ERROR(
       JAX_AS_STATUS(cusparseCreateCoo(&mat_b, d.rows, d.cols, d.nnz,
-                                      /*cooRowInd=*/buffers[2],
-                                      /*cooColInd=*/buffers[3],
-                                      /*cooValues=*/buffers[1], d.index_type,
+                                      /*cooRowInd=*/row_ind,
+                                      /*cooColInd=*/col_ind,
+                                      /*cooValues=*/values, d.index_type,
                                       CUSPARSE_INDEX_BASE_ZERO, d.value_type)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDenseToSparse_analysis(
       handle.get(), mat_a, mat_b, CUSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
+      workspace)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDenseToSparse_convert(
       handle.get(), mat_a, mat_b, CUSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
+      workspace)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_b)));
   return absl::OkStatus();
 }
 
+static absl::Status CooFromDense_(cudaStream_t stream, void** buffers,
+                                  const char* opaque, size_t opaque_len) {
+  auto s = UnpackDescriptor<SparseConvertDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  auto buf = Workspace(stream, (**s).workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(buf.status());
+  return CooFromDenseImpl(stream, (**s).A, buffers[0], buffers[1], buffers[2],
+                          buffers[3], buf->get());
+}
+
 void CooFromDense(cudaStream_t stream, void** buffers, const char* opaque,
                   size_t opaque_len, XlaCustomCallStatus* status) {
   auto s = CooFromDense_(stream, buffers, opaque, opaque_len);
@@ -424,6 +651,33 @@ void CooFromDense(cudaStream_t stream, void** buffers, const char* opaque,
   }
 }
 
+// CooFromDensePacked: Convert dense matrix to COO matrix in a single buffer
+
+static absl::Status CooFromDensePacked_(cudaStream_t stream, void** buffers,
+                                        const char* opaque,
+                                        size_t opaque_len) {
+  auto s = UnpackDescriptor<CooFromDensePackedDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  const CooFromDensePackedDescriptor& d = **s;
+  auto buf = Workspace(stream, d.workspace, buffers, 2);
+  JAX_RETURN_IF_ERROR(buf.status());
+  char* packed = static_cast<char*>(buffers[1]);
+  return CooFromDenseImpl(stream, d.A, buffers[0], packed,
+                          packed + static_cast<size_t>(d.row_offset),
+                          packed + static_cast<size_t>(d.col_offset),
+                          buf->get());
+}
+
+void CooFromDensePacked(cudaStream_t stream, void** buffers,
+                        const char* opaque, size_t opaque_len,
+                        XlaCustomCallStatus* status) {
+  auto s = CooFromDensePacked_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+
 // CooMatvec: Product of COO matrix and dense vector.
 
 static absl::Status CooMatvec_(cudaStream_t stream, void** buffers,
@@ -440,7 +694,9 @@ static absl::Status CooMatvec_(cudaStream_t stream, void** buffers,
   void* coo_col_ind = buffers[2];
   void* xbuf = buffers[3];
   void* ybuf = buffers[4];
-  void* buf = buffers[5];
+  auto ws = Workspace(stream, d.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
 
   // TODO(jakevdp): alpha and beta should be user-specifiable, but constants
   // are sufficient for basic matvec operations.
@@ -449,25 +705,32 @@ static absl::Status CooMatvec_(cudaStream_t stream, void** buffers,
   CudaConst alpha = CudaOne(d.y.type);
   CudaConst beta = CudaZero(d.y.type);
 
-  cusparseSpMatDescr_t mat_a = 0;
-  cusparseDnVecDescr_t vec_x = 0;
-  cusparseDnVecDescr_t vec_y = 0;
-
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateCoo(
-      &mat_a, d.A.rows, d.A.cols, d.A.nnz, coo_row_ind, coo_col_ind, coo_values,
-      d.A.index_type, CUSPARSE_INDEX_BASE_ZERO, d.A.value_type)));
-  JAX_RETURN_IF_ERROR(
-      JAX_AS_STATUS(cusparseCreateDnVec(&vec_x, d.x.size, xbuf, d.x.type)));
-  JAX_RETURN_IF_ERROR(
-      JAX_AS_STATUS(cusparseCreateDnVec(&vec_y, d.y.size, ybuf, d.y.type)));
-
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      cusparseSpMV(handle.get(), d.op, &alpha, mat_a, vec_x, &beta, vec_y,
-                   d.y.type, CUSPARSE_MV_ALG_DEFAULT, buf)));
+  SpmvDescriptorCache& cache = SpmvDescriptorCache::ForThread();
+  std::string key = SpmvCacheKey("coo", opaque, opaque_len);
+  SpmvDescriptors* desc = cache.Find(key);
+  if (desc == nullptr) {
+    SpmvDescriptors created;
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateCoo(
+        &created.mat_a, d.A.rows, d.A.cols, d.A.nnz, coo_row_ind, coo_col_ind,
+        coo_values, d.A.index_type, CUSPARSE_INDEX_BASE_ZERO,
+        d.A.value_type)));
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+        cusparseCreateDnVec(&created.vec_x, d.x.size, xbuf, d.x.type)));
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+        cusparseCreateDnVec(&created.vec_y, d.y.size, ybuf, d.y.type)));
+    desc = cache.Insert(std::move(key), std::move(created));
+  } else {
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCooSetPointers(
+        desc->mat_a, coo_row_ind, coo_col_ind, coo_values)));
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(cusparseDnVecSetValues(desc->vec_x, xbuf)));
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(cusparseDnVecSetValues(desc->vec_y, ybuf)));
+  }
 
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_x)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnVec(vec_y)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseSpMV(
+      handle.get(), d.op, &alpha, desc->mat_a, desc->vec_x, &beta,
+      desc->vec_y, d.y.type, CUSPARSE_MV_ALG_DEFAULT, buf)));
   return absl::OkStatus();
 }
 
@@ -496,7 +759,9 @@ static absl::Status CooMatmat_(cudaStream_t stream, void** buffers,
   void* coo_col_ind = buffers[2];
   void* Bbuf = buffers[3];
   void* Cbuf = buffers[4];
-  void* buf = buffers[5];
+  auto ws = Workspace(stream, d.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
 
   // TODO(jakevdp): alpha and beta should be user-specifiable, but constants
   // are sufficient for basic matvec operations.
@@ -538,10 +803,361 @@ void CooMatmat(cudaStream_t stream, void** buffers, const char* opaque,
 }
 #endif  // if JAX_CUSPARSE_11300
 
+#if JAX_CUSPARSE_11400
+// BsrMatmat: Product of a blocked-ELL sparse matrix and a dense matrix.
+
+static absl::Status BsrMatmat_(cudaStream_t stream, void** buffers,
+                               const char* opaque, size_t opaque_len) {
+  auto s = UnpackDescriptor<BsrMatmatDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  const BsrMatmatDescriptor& d = **s;
+  auto h = SparseHandlePool::Borrow(stream);
+  JAX_RETURN_IF_ERROR(h.status());
+  auto& handle = *h;
+
+  void* ell_values = buffers[0];
+  void* ell_col_ind = buffers[1];
+  void* Bbuf = buffers[2];
+  void* Cbuf = buffers[3];
+  auto ws = Workspace(stream, d.workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
+
+  // Note that, contrary to cusparse docs, alpha and beta must be host pointers
+  // or else the operation will segfault.
+  CudaConst alpha = CudaOne(d.C.type);
+  CudaConst beta = CudaZero(d.C.type);
+
+  cusparseSpMatDescr_t mat_a = 0;
+  cusparseDnMatDescr_t mat_b = 0;
+  cusparseDnMatDescr_t mat_c = 0;
+
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateBlockedEll(
+      &mat_a, d.A.rows, d.A.cols, d.A.block_size, d.A.ell_cols, ell_col_ind,
+      ell_values, d.A.index_type, CUSPARSE_INDEX_BASE_ZERO, d.A.value_type)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateDnMat(
+      &mat_b, d.B.rows, d.B.cols,
+      /*ld=*/d.B.cols, Bbuf, d.B.type, CUSPARSE_ORDER_ROW)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCreateDnMat(
+      &mat_c, d.C.rows, d.C.cols,
+      /*ld=*/d.C.cols, Cbuf, d.C.type, CUSPARSE_ORDER_ROW)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseSpMM(
+      handle.get(), CUSPARSE_OPERATION_NON_TRANSPOSE,
+      CUSPARSE_OPERATION_NON_TRANSPOSE, &alpha, mat_a, mat_b, &beta, mat_c,
+      d.C.type, CUSPARSE_SPMM_BLOCKED_ELL_ALG1, buf)));
+
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroySpMat(mat_a)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_b)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseDestroyDnMat(mat_c)));
+  return absl::OkStatus();
+}
+
+void BsrMatmat(cudaStream_t stream, void** buffers, const char* opaque,
+               size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = BsrMatmat_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+#endif  // if JAX_CUSPARSE_11400
+
+#if JAX_CUSPARSELT
+// Spmm24: Product of a 2:4 structured-sparse matrix and a dense matrix.
+
+// Returns the cuSPARSELt handle of the current device. A handle is bound to
+// the device that was current when it was initialized, so there is one per
+// device.
+static absl::StatusOr<const cusparseLtHandle_t*> CusparseLtHandle() {
+  int device;
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaGetDevice(&device)));
+  static absl::Mutex mu(absl::kConstInit);
+  static auto* handles =
+      new absl::flat_hash_map<int, std::unique_ptr<cusparseLtHandle_t>>();
+  absl::MutexLock lock(&mu);
+  std::unique_ptr<cusparseLtHandle_t>& handle = (*handles)[device];
+  if (!handle) {
+    auto new_handle = std::make_unique<cusparseLtHandle_t>();
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseLtInit(new_handle.get())));
+    handle = std::move(new_handle);
+  }
+  return handle.get();
+}
+
+// A cuSPARSELt matmul plan, together with the descriptors it refers to.
+struct Spmm24Plan {
+  cusparseLtMatDescriptor_t mat_a, mat_b, mat_c;
+  cusparseLtMatmulDescriptor_t matmul;
+  cusparseLtMatmulAlgSelection_t alg_sel;
+  cusparseLtMatmulPlan_t plan;
+  size_t workspace_size, compressed_size;
+};
+
+// Picks the fastest kernel for the plan `p` of `d` by timing the candidates
+// with cusparseLtMatmulSearch on zero operands of its shape, on the default
+// stream, and updates the workspace size of the plan for the chosen kernel.
+// Runs before the plan is shared, so that executions of the plan need no lock.
+static absl::Status SearchSpmm24Plan(const cusparseLtHandle_t* handle,
+                                     const Spmm24Descriptor& d,
+                                     Spmm24Plan* p) {
+  size_t item_size;
+  switch (d.type) {
+    case CUDA_R_8I:
+      item_size = 1;
+      break;
+    case CUDA_R_16F:
+    case CUDA_R_16BF:
+      item_size = 2;
+      break;
+    case CUDA_R_32F:
+      item_size = 4;
+      break;
+    default:
+      return absl::InvalidArgumentError(
+          absl::StrFormat("Unsupported data type: %d", d.type));
+  }
+  struct DeviceFree {
+    void operator()(void* ptr) const { cudaFree(ptr); }
+  };
+  using DevicePtr = std::unique_ptr<void, DeviceFree>;
+  auto zeros = [](size_t size) -> absl::StatusOr<DevicePtr> {
+    void* ptr = nullptr;
+    if (size > 0) {
+      JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaMalloc(&ptr, size)));
+    }
+    DevicePtr buffer(ptr);
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaMemset(ptr, 0, size)));
+    return buffer;
+  };
+  auto dense = zeros(static_cast<size_t>(d.m) * d.k * item_size);
+  JAX_RETURN_IF_ERROR(dense.status());
+  auto compressed = zeros(p->compressed_size);
+  JAX_RETURN_IF_ERROR(compressed.status());
+  auto b = zeros(static_cast<size_t>(d.k) * d.n * item_size);
+  JAX_RETURN_IF_ERROR(b.status());
+  auto c = zeros(static_cast<size_t>(d.m) * d.n * item_size);
+  JAX_RETURN_IF_ERROR(c.status());
+  auto workspace = zeros(p->workspace_size);
+  JAX_RETURN_IF_ERROR(workspace.status());
+
+  cudaStream_t stream = 0;
+  float alpha = 1.0f;
+  float beta = 0.0f;
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseLtSpMMACompress(
+      handle, &p->plan, dense->get(), compressed->get(), stream)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseLtMatmulSearch(
+      handle, &p->plan, &alpha, compressed->get(), b->get(), &beta, c->get(),
+      c->get(), workspace->get(), &stream, /*numStreams=*/1)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaStreamSynchronize(stream)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cusparseLtMatmulGetWorkspace(handle, &p->plan, &p->workspace_size)));
+  return absl::OkStatus();
+}
+
+// Returns the plan for `d` on the current device, creating it on first use.
+// Plans are keyed by the contents of the descriptor rather than by an ID stored
+// in it, so that descriptors stay valid across processes (e.g. in a persistent
+// compilation cache). Plans of tuned descriptors are tuned with
+// SearchSpmm24Plan when they are created, which happens when the descriptor is
+// built unless the descriptor comes from another process. The plan is built
+// and tuned without holding the lock of the cache, so that executions of other
+// plans do not wait for a search.
+static absl::StatusOr<Spmm24Plan*> GetSpmm24Plan(const Spmm24Descriptor& d) {
+  using Key = std::tuple<int, int, int, int, int, int, int, int>;
+  static absl::Mutex mu(absl::kConstInit);
+  static auto* plans =
+      new absl::flat_hash_map<Key, std::unique_ptr<Spmm24Plan>>();
+  int device;
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cudaGetDevice(&device)));
+  auto h = CusparseLtHandle();
+  JAX_RETURN_IF_ERROR(h.status());
+  const cusparseLtHandle_t* handle = *h;
+
+  Key key(device, d.type, d.compute_type, d.m, d.n, d.k, d.transpose, d.tuned);
+  {
+    absl::MutexLock lock(&mu);
+    auto it = plans->find(key);
+    if (it != plans->end()) {
+      return it->second.get();
+    }
+  }
+
+  // All matrices are row-major. A is m x k, or k x m if transposed; B is
+  // k x n and C is m x n.
+  constexpr unsigned kAlignment = 16;
+  auto p = std::make_unique<Spmm24Plan>();
+  int a_rows = d.transpose ? d.k : d.m;
+  int a_cols = d.transpose ? d.m : d.k;
+  cusparseOperation_t op_a = d.transpose ? CUSPARSE_OPERATION_TRANSPOSE
+                                         : CUSPARSE_OPERATION_NON_TRANSPOSE;
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseLtStructuredDescriptorInit(
+      handle, &p->mat_a, a_rows, a_cols, /*ld=*/a_cols, kAlignment, d.type,
+      CUSPARSE_ORDER_ROW, CUSPARSELT_SPARSITY_50_PERCENT)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cusparseLtDenseDescriptorInit(handle, &p->mat_b, d.k, d.n, /*ld=*/d.n,
+                                    kAlignment, d.type, CUSPARSE_ORDER_ROW)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cusparseLtDenseDescriptorInit(handle, &p->mat_c, d.m, d.n, /*ld=*/d.n,
+                                    kAlignment, d.type, CUSPARSE_ORDER_ROW)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseLtMatmulDescriptorInit(
+      handle, &p->matmul, op_a, CUSPARSE_OPERATION_NON_TRANSPOSE, &p->mat_a,
+      &p->mat_b, &p->mat_c, &p->mat_c, d.compute_type)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseLtMatmulAlgSelectionInit(
+      handle, &p->alg_sel, &p->matmul, CUSPARSELT_MATMUL_ALG_DEFAULT)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cusparseLtMatmulPlanInit(handle, &p->plan, &p->matmul, &p->alg_sel)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cusparseLtMatmulGetWorkspace(handle, &p->plan, &p->workspace_size)));
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cusparseLtSpMMACompressedSize(handle, &p->plan, &p->compressed_size)));
+  if (d.tuned) {
+    JAX_RETURN_IF_ERROR(SearchSpmm24Plan(handle, d, p.get()));
+  }
+
+  absl::MutexLock lock(&mu);
+  auto [it, inserted] = plans->try_emplace(std::move(key), std::move(p));
+  if (!inserted) {
+    // Another thread created the same plan in the meantime.
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(cusparseLtMatmulPlanDestroy(&p->plan)));
+  }
+  return it->second.get();
+}
+
+absl::StatusOr<std::pair<size_t, size_t>> Spmm24BufferSizes(
+    const Spmm24Descriptor& d) {
+  auto p = GetSpmm24Plan(d);
+  JAX_RETURN_IF_ERROR(p.status());
+  return std::make_pair((*p)->workspace_size, (*p)->compressed_size);
+}
+
+static absl::Status Spmm24_(cudaStream_t stream, void** buffers,
+                            const char* opaque, size_t opaque_len) {
+  auto s = UnpackDescriptor<Spmm24Descriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  const Spmm24Descriptor& d = **s;
+  auto h = CusparseLtHandle();
+  JAX_RETURN_IF_ERROR(h.status());
+  const cusparseLtHandle_t* handle = *h;
+  auto p = GetSpmm24Plan(d);
+  JAX_RETURN_IF_ERROR(p.status());
+  const Spmm24Plan& plan = **p;
+
+  const void* compressed = buffers[0];
+  const void* Bbuf = buffers[1];
+  void* Cbuf = buffers[2];
+  // Plans that need no workspace have no workspace buffer.
+  void* workspace = plan.workspace_size > 0 ? buffers[3] : nullptr;
+
+  // cuSPARSELt takes single-precision scaling factors for all compute types.
+  float alpha = 1.0f;
+  float beta = 0.0f;
+
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseLtMatmul(
+      handle, &plan.plan, &alpha, compressed, Bbuf, &beta, Cbuf, Cbuf,
+      workspace, &stream, /*numStreams=*/1)));
+  return absl::OkStatus();
+}
+
+void Spmm24(cudaStream_t stream, void** buffers, const char* opaque,
+            size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = Spmm24_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+
+static absl::Status Spmm24Compress_(cudaStream_t stream, void** buffers,
+                                    const char* opaque, size_t opaque_len) {
+  auto s = UnpackDescriptor<Spmm24Descriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  auto h = CusparseLtHandle();
+  JAX_RETURN_IF_ERROR(h.status());
+  auto p = GetSpmm24Plan(**s);
+  JAX_RETURN_IF_ERROR(p.status());
+
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseLtSpMMACompress(
+      *h, &(*p)->plan, /*dense=*/buffers[0], /*compressed=*/buffers[1],
+      stream)));
+  return absl::OkStatus();
+}
+
+void Spmm24Compress(cudaStream_t stream, void** buffers, const char* opaque,
+                    size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = Spmm24Compress_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+#endif  // if JAX_CUSPARSELT
+
+// Csr2Coo: Expand CSR row offsets into COO row indices.
+
+static absl::Status Csr2Coo_(cudaStream_t stream, void** buffers,
+                             const char* opaque, size_t opaque_len) {
+  auto s = UnpackDescriptor<Csr2CooDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  const Csr2CooDescriptor& d = **s;
+  auto h = SparseHandlePool::Borrow(stream);
+  JAX_RETURN_IF_ERROR(h.status());
+  auto& handle = *h;
+
+  const int* csr_row_offsets = static_cast<const int*>(buffers[0]);
+  int* coo_row_ind = static_cast<int*>(buffers[1]);
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+      cusparseXcsr2coo(handle.get(), csr_row_offsets, d.nnz, d.rows,
+                       coo_row_ind, CUSPARSE_INDEX_BASE_ZERO)));
+  return absl::OkStatus();
+}
+
+void Csr2Coo(cudaStream_t stream, void** buffers, const char* opaque,
+             size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = Csr2Coo_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+
+// Csr2Csc: Convert a CSR matrix to CSC format.
+
+static absl::Status Csr2Csc_(cudaStream_t stream, void** buffers,
+                             const char* opaque, size_t opaque_len) {
+  auto s = UnpackDescriptor<Csr2CscDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  const Csr2CscDescriptor& d = **s;
+  auto h = SparseHandlePool::Borrow(stream);
+  JAX_RETURN_IF_ERROR(h.status());
+  auto& handle = *h;
+  auto ws = Workspace(stream, d.workspace, buffers, 6);
+  JAX_RETURN_IF_ERROR(ws.status());
+
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(cusparseCsr2cscEx2(
+      handle.get(), d.rows, d.cols, d.nnz, /*csrVal=*/buffers[0],
+      /*csrRowPtr=*/static_cast<const int*>(buffers[2]),
+      /*csrColInd=*/static_cast<const int*>(buffers[1]),
+      /*cscVal=*/buffers[3], /*cscColPtr=*/static_cast<int*>(buffers[5]),
+      /*cscRowInd=*/static_cast<int*>(buffers[4]), d.value_type,
+      CUSPARSE_ACTION_NUMERIC, CUSPARSE_INDEX_BASE_ZERO,
+      CUSPARSE_CSR2CSC_ALG1, ws->get())));
+  return absl::OkStatus();
+}
+
+void Csr2Csc(cudaStream_t stream, void** buffers, const char* opaque,
+             size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = Csr2Csc_(stream, buffers, opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+
 template <typename T, typename F>
 static absl::Status gtsv2(F computeGtsv2, cudaStream_t stream, void** buffers,
                           const char* opaque, std::size_t opaque_len) {
-  auto h = SparseHandlePool::Borrow();
+  auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
 
@@ -557,7 +1173,9 @@ static absl::Status gtsv2(F computeGtsv2, cudaStream_t stream, void** buffers,
   const T* du = (const T*)(buffers[2]);
   const T* B = (T*)(buffers[3]);
   T* X = (T*)(buffers[4]);
-  void* buffer = buffers[5];
+  auto ws = Workspace(stream, descriptor.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buffer = ws->get();
 
   // The solution X is written in place to B. We need to therefore copy the
   // contents of B into the output buffer X and pass that into the kernel as B.
@@ -594,4 +1212,58 @@ void gtsv2_f64(cudaStream_t stream, void** buffers, const char* opaque,
   }
 }
 
+template <typename T, typename F>
+static absl::Status gtsv2_batched(F computeGtsv2StridedBatch,
+                                  cudaStream_t stream, void** buffers,
+                                  const char* opaque, std::size_t opaque_len) {
+  auto s = UnpackDescriptor<Gtsv2BatchedDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  const Gtsv2BatchedDescriptor& descriptor = **s;
+  auto h = SparseHandlePool::Borrow(stream);
+  JAX_RETURN_IF_ERROR(h.status());
+  auto& handle = *h;
+
+  const T* dl = (const T*)(buffers[0]);
+  const T* d = (const T*)(buffers[1]);
+  const T* du = (const T*)(buffers[2]);
+  const T* B = (T*)(buffers[3]);
+  T* X = (T*)(buffers[4]);
+  auto ws = Workspace(stream, descriptor.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buffer = ws->get();
+
+  // As in gtsv2, the solution is written in place to the right-hand sides.
+  if (X != B) {
+    size_t B_bytes = static_cast<size_t>(descriptor.batch_count) *
+                     descriptor.batch_stride * sizeof(T);
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+        cudaMemcpyAsync(X, B, B_bytes, cudaMemcpyDeviceToDevice, stream)));
+  }
+
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(computeGtsv2StridedBatch(
+      handle.get(), descriptor.m, dl, d, du, /*x=*/X, descriptor.batch_count,
+      descriptor.batch_stride, buffer)));
+  return absl::OkStatus();
+}
+
+void gtsv2_batched_f32(cudaStream_t stream, void** buffers, const char* opaque,
+                       std::size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = gtsv2_batched<float>(cusparseSgtsv2StridedBatch, stream, buffers,
+                                opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+
+void gtsv2_batched_f64(cudaStream_t stream, void** buffers, const char* opaque,
+                       std::size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = gtsv2_batched<double>(cusparseDgtsv2StridedBatch, stream, buffers,
+                                 opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+
 }  // namespace jax
@@ -28,10 +28,24 @@ limitations under the License.
 #include "third_party/gpus/cuda/include/cuda_runtime_api.h"
 #include "third_party/gpus/cuda/include/cusparse.h"
 #include "jaxlib/handle_pool.h"
+#include "jaxlib/kernel_helpers.h"
 #include "tensorflow/compiler/xla/service/custom_call_status.h"
 
 // Some functionality defined here is only available in CUSPARSE 11.3 or newer.
 #define JAX_CUSPARSE_11300 (CUSPARSE_VERSION >= 11300)
+// Blocked-ELL sparse matrix products require CUSPARSE 11.4 or newer.
+#define JAX_CUSPARSE_11400 (CUSPARSE_VERSION >= 11400)
+
+// 2:4 structured sparsity requires cuSPARSELt (0.3 or newer), which is not a
+// default dependency. Builds that link against it should define
+// JAX_CUSPARSELT=1.
+#ifndef JAX_CUSPARSELT
+#define JAX_CUSPARSELT 0
+#endif
+
+#if JAX_CUSPARSELT
+#include "third_party/gpus/cuda/include/cusparseLt.h"
+#endif
 
 namespace jax {
 
@@ -73,7 +87,22 @@ struct DenseVecDescriptor {
   int size;
 };
 
+// Scratch space of an operation. Unless `external` is set, XLA allocates it as
+// the last result of the custom call; otherwise a buffer of `size` bytes shared
+// by all sparse operations on the stream is used.
+struct WorkspaceDescriptor {
+  DescriptorSize size;
+  std::int32_t external;
+};
+
 #if JAX_CUSPARSE_11300
+// Descriptor of conversions between sparse and dense matrices.
+
+struct SparseConvertDescriptor {
+  SparseMatDescriptor A;
+  WorkspaceDescriptor workspace;
+};
+
 // CsrToDense: Convert CSR matrix to dense matrix
 
 void CsrToDense(cudaStream_t stream, void** buffers, const char* opaque,
@@ -90,6 +119,7 @@ struct CsrMatvecDescriptor {
   SparseMatDescriptor A;
   DenseVecDescriptor x, y;
   cusparseOperation_t op;
+  WorkspaceDescriptor workspace;
 };
 
 void CsrMatvec(cudaStream_t stream, void** buffers, const char* opaque,
@@ -101,6 +131,8 @@ struct CsrMatmatDescriptor {
   SparseMatDescriptor A;
   DenseMatDescriptor B, C;
   cusparseOperation_t op_A;
+  cusparseSpMMAlg_t alg;
+  WorkspaceDescriptor workspace;
 };
 
 void CsrMatmat(cudaStream_t stream, void** buffers, const char* opaque,
@@ -116,12 +148,27 @@ void CooToDense(cudaStream_t stream, void** buffers, const char* opaque,
 void CooFromDense(cudaStream_t stream, void** buffers, const char* opaque,
                   size_t opaque_len, XlaCustomCallStatus* status);
 
+// CooFromDensePacked: Convert dense matrix to COO matrix, whose values, row
+// indices and column indices are written to a single buffer at byte offsets 0,
+// `row_offset` and `col_offset`.
+
+struct CooFromDensePackedDescriptor {
+  SparseMatDescriptor A;
+  DescriptorSize row_offset, col_offset;
+  WorkspaceDescriptor workspace;
+};
+
+void CooFromDensePacked(cudaStream_t stream, void** buffers,
+                        const char* opaque, size_t opaque_len,
+                        XlaCustomCallStatus* status);
+
 // CooMatvec: Product of COO matrix and dense vector.
 
 struct CooMatvecDescriptor {
   SparseMatDescriptor A;
   DenseVecDescriptor x, y;
   cusparseOperation_t op;
+  WorkspaceDescriptor workspace;
 };
 
 void CooMatvec(cudaStream_t stream, void** buffers, const char* opaque,
@@ -133,14 +180,84 @@ struct CooMatmatDescriptor {
   SparseMatDescriptor A;
   DenseMatDescriptor B, C;
   cusparseOperation_t op_A;
+  WorkspaceDescriptor workspace;
 };
 
 void CooMatmat(cudaStream_t stream, void** buffers, const char* opaque,
                size_t opaque_len, XlaCustomCallStatus* status);
 #endif  // if JAX_CUSPARSE_11300
 
+#if JAX_CUSPARSE_11400
+// BsrMatmat: Product of a block-sparse matrix in blocked-ELL format and a dense
+// matrix. Runs on Tensor Cores for half-precision inputs.
+
+struct BlockedEllMatDescriptor {
+  cudaDataType value_type;
+  cusparseIndexType_t index_type;
+  int rows, cols, ell_cols, block_size;
+};
+
+struct BsrMatmatDescriptor {
+  BlockedEllMatDescriptor A;
+  DenseMatDescriptor B, C;
+  WorkspaceDescriptor workspace;
+};
+
+void BsrMatmat(cudaStream_t stream, void** buffers, const char* opaque,
+               size_t opaque_len, XlaCustomCallStatus* status);
+#endif  // if JAX_CUSPARSE_11400
+
+#if JAX_CUSPARSELT
+// Spmm24: Product of a 2:4 structured-sparse matrix, compressed by cuSPARSELt,
+// and a dense matrix. Runs on the sparse Tensor Cores of Ampere and newer.
+
+struct Spmm24Descriptor {
+  cudaDataType type;
+  cusparseComputeType compute_type;
+  int m, n, k;
+  int transpose;
+  // Whether the plan picks its kernel with cusparseLtMatmulSearch.
+  int tuned;
+};
+
+// Returns the workspace and compressed-matrix sizes in bytes for the
+// cuSPARSELt plan described by `d`. Plans are created once per descriptor and
+// device, tuned on creation if `d.tuned`, and cached for the lifetime of the
+// process.
+absl::StatusOr<std::pair<size_t, size_t>> Spmm24BufferSizes(
+    const Spmm24Descriptor& d);
+
+void Spmm24(cudaStream_t stream, void** buffers, const char* opaque,
+            size_t opaque_len, XlaCustomCallStatus* status);
+
+void Spmm24Compress(cudaStream_t stream, void** buffers, const char* opaque,
+                    size_t opaque_len, XlaCustomCallStatus* status);
+#endif  // if JAX_CUSPARSELT
+
+// Csr2Coo: Expand CSR row offsets into COO row indices.
+
+struct Csr2CooDescriptor {
+  int rows, nnz;
+};
+
+void Csr2Coo(cudaStream_t stream, void** buffers, const char* opaque,
+             size_t opaque_len, XlaCustomCallStatus* status);
+
+// Csr2Csc: Convert a CSR matrix with 32-bit indices to CSC format, i.e. to the
+// CSR form of its transpose.
+
+struct Csr2CscDescriptor {
+  cudaDataType value_type;
+  int rows, cols, nnz;
+  WorkspaceDescriptor workspace;
+};
+
+void Csr2Csc(cudaStream_t stream, void** buffers, const char* opaque,
+             size_t opaque_len, XlaCustomCallStatus* status);
+
 struct Gtsv2Descriptor {
   int m, n, ldb;
+  WorkspaceDescriptor workspace;
 };
 
 void gtsv2_f32(cudaStream_t stream, void** buffers, const char* opaque,
@@ -149,6 +266,20 @@ void gtsv2_f32(cudaStream_t stream, void** buffers, const char* opaque,
 void gtsv2_f64(cudaStream_t stream, void** buffers, const char* opaque,
                std::size_t opaque_len, XlaCustomCallStatus* status);
 
+// gtsv2_batched: Solves a batch of tridiagonal systems with one right-hand side
+// each. The operands of system i start at element i * batch_stride.
+
+struct Gtsv2BatchedDescriptor {
+  int m, batch_count, batch_stride;
+  WorkspaceDescriptor workspace;
+};
+
+void gtsv2_batched_f32(cudaStream_t stream, void** buffers, const char* opaque,
+                       std::size_t opaque_len, XlaCustomCallStatus* status);
+
+void gtsv2_batched_f64(cudaStream_t stream, void** buffers, const char* opaque,
+                       std::size_t opaque_len, XlaCustomCallStatus* status);
+
 }  // namespace jax
 
 #endif  // JAXLIB_CUSPARSE_KERNELS_H_
@@ -15,9 +15,12 @@
 cusparse wrappers for performing sparse matrix computations in JAX
 """
 
-from functools import partial
+import contextlib
+from functools import lru_cache, partial
 
+import jax
 import jaxlib.mlir.ir as ir
+import jaxlib.mlir.dialects.mhlo as mhlo
 
 import numpy as np
 
@@ -46,26 +49,200 @@ cuda_is_supported : bool = _cusparse and _cusparse.cusparse_supported
 rocm_is_supported : bool = _hipsparse and _hipsparse.hipsparse_supported
 
 
+# Whether lowerings may benchmark candidate kernels to pick the fastest one.
+_autotune = False
+
+@contextlib.contextmanager
+def autotuning(enabled=True):
+  """Enables kernel autotuning for sparse operations lowered in this context.
+
+  Autotuning happens at lowering time: the first time a problem with a given
+  shape and dtype is lowered, the candidate kernels are benchmarked on the
+  current device and the winner is cached for all subsequent lowerings.
+
+  The sparsity structure of the operands is not known at lowering time, so
+  the benchmarks run on synthetic matrices with skewed row lengths; the choice
+  depends only on the shape and dtypes of the problem.
+  """
+  global _autotune
+  prev, _autotune = _autotune, enabled
+  try:
+    yield
+  finally:
+    _autotune = prev
+
+
+# Whether sparse operations use a scratch workspace shared by all operations on
+# a stream instead of one allocated by XLA for each operation.
+_shared_workspace = False
+
+@contextlib.contextmanager
+def shared_workspace(enabled=True):
+  """Makes sparse operations lowered in this context share scratch space.
+
+  Each cuSPARSE operation needs a scratch workspace. By default XLA allocates
+  a separate one for every operation; with a shared workspace, operations on
+  the same stream reuse one persistent device allocation that grows to the
+  largest size requested. The shared workspace comes from the stream-ordered
+  allocator of the device, outside of XLA's memory pool, so growing it never
+  blocks the host; it is never freed.
+  """
+  global _shared_workspace
+  prev, _shared_workspace = _shared_workspace, enabled
+  try:
+    yield
+  finally:
+    _shared_workspace = prev
+
+
+# Whether transposed CSR products run on the CSC form of the matrix.
+_transpose_csr_via_csc = False
+
+@contextlib.contextmanager
+def transpose_via_csc(enabled=True):
+  """Makes transposed CSR products lowered in this context use the CSC form.
+
+  cuSPARSE computes transposed CSR products with atomics, which is slow on
+  matrices with irregular rows. In this context, transposed matrix/vector and
+  matrix/matrix products with 32-bit indices instead convert the matrix to CSC
+  form and run the non-transposed product on it. The conversion is redone on
+  every call, so this only pays off on matrices whose transposed products are
+  slow, or for products with many columns.
+  """
+  global _transpose_csr_via_csc
+  prev, _transpose_csr_via_csc = _transpose_csr_via_csc, enabled
+  try:
+    yield
+  finally:
+    _transpose_csr_via_csc = prev
+
+
+@lru_cache(maxsize=1024)
+def _build_descriptor(builder, *args):
+  """Memoizes ``builder(*args)`` for the descriptor builders of this module.
+
+  Descriptor construction queries the cuSPARSE buffer sizes, which is wasted
+  work when the same problem is lowered many times. All arguments are dtypes,
+  ints and bools, so they are hashable.
+  """
+  return builder(*args)
+
+
+def _workspace_custom_call(call_target_name, out_types, operands, *,
+                           buffer_size, external_workspace, backend_config,
+                           operand_layouts, result_layouts):
+  """Emits a custom call whose last result is its scratch workspace.
+
+  The workspace result is omitted if the operation uses the shared workspace
+  or needs no scratch space at all. Returns the list of results other than the
+  workspace.
+  """
+  has_workspace = not external_workspace and buffer_size > 0
+  if has_workspace:
+    out_types = [*out_types,
+                 ir.RankedTensorType.get([buffer_size],
+                                         ir.IntegerType.get_signless(8))]
+    result_layouts = [*result_layouts, [0]]
+  out = custom_call(call_target_name, out_types, operands,
+                    backend_config=backend_config,
+                    operand_layouts=operand_layouts,
+                    result_layouts=result_layouts)
+  out = [out] if len(out_types) == 1 else out
+  return out[:-1] if has_workspace else out
+
+
+def _mhlo_zeros(shape, dtype, element_type):
+  """Returns a tensor of zeros of the given shape.
+
+  Products and conversions of matrices without nonzeros use this in place of a
+  custom call, which would launch kernels that have nothing to do.
+  """
+  scalar_dtype, scalar_type = np.dtype(dtype), element_type
+  if scalar_dtype == np.dtype(xla_client.bfloat16):
+    # DenseElementsAttr does not take bfloat16 arrays.
+    scalar_dtype, scalar_type = np.dtype(np.float32), ir.F32Type.get()
+  value = ir.DenseElementsAttr.get(np.array(0, dtype=scalar_dtype),
+                                   type=scalar_type)
+  if xla_client._version >= 64:
+    args = (value,)
+  else:
+    args = (ir.RankedTensorType.get([], scalar_type), value)
+  if jax._src.lib.mlir_api_version < 21:
+    zero = mhlo.ConstOp(*args).result
+  else:
+    zero = mhlo.ConstantOp(*args).result
+  if scalar_type != element_type:
+    zero = mhlo.ConvertOp(ir.RankedTensorType.get([], element_type),
+                          zero).result
+  sizes = ir.DenseElementsAttr.get(np.asarray(shape, np.int64))
+  if jax._src.lib.mlir_api_version < 9:
+    return mhlo.BroadcastOp(ir.RankedTensorType.get(shape, element_type),
+                            zero, sizes).result
+  return mhlo.BroadcastOp(zero, sizes).result
+
+def _zero_product(data, shape, *, compute_dtype, compute_type, data_dtype):
+  """Returns the result of a product with a sparse matrix without nonzeros."""
+  if compute_dtype is None:
+    compute_dtype = data_dtype
+    compute_type = ir.RankedTensorType(data.type).element_type
+  return _mhlo_zeros(shape, compute_dtype, compute_type)
+
+
+def _convert_to_bf16(v):
+  """Rounds the elements of `v` to bfloat16, to nearest even."""
+  return mhlo.ConvertOp(
+      ir.RankedTensorType.get(ir.RankedTensorType(v.type).shape,
+                              ir.BF16Type.get()), v).result
+
+def _match_bf16_data(data_dtype, x, x_dtype):
+  """Rounds `x` to bfloat16 if the sparse matrix is stored in bfloat16.
+
+  cuSPARSE only multiplies bfloat16 matrices by bfloat16 dense operands. The
+  dense operand is much smaller than the matrix values, so converting it for
+  each product is cheap. Returns the possibly converted `x` and its dtype.
+  """
+  bf16 = np.dtype(xla_client.bfloat16)
+  if np.dtype(data_dtype) != bf16 or np.dtype(x_dtype) == bf16:
+    return x, x_dtype
+  return _convert_to_bf16(x), bf16
+
+
+def _f32_to_bf16_csr_mhlo(data):
+  """Converts the values of an f32 CSR matrix to bfloat16 storage.
+
+  Products of the result, lowered with ``data_dtype=bfloat16`` and
+  ``compute_dtype=float32``, stream half as many bytes of matrix values and
+  still accumulate and return f32. Convert once and reuse the result across
+  products with the same matrix. Requires a GPU of compute capability 8.0 or
+  newer.
+  """
+  return _convert_to_bf16(data)
+
+cuda_f32_to_bf16_csr = _f32_to_bf16_csr_mhlo
+
+
 def _validate_csr_mhlo(data, indices, indptr, shape):
   data_type = ir.RankedTensorType(data.type)
   indices_type = ir.RankedTensorType(indices.type)
-  indptr_type = ir.RankedTensorType(indptr.type)
 
   nnz, = data_type.shape
-  assert indices_type.shape == [nnz]
-  assert indptr_type.element_type == indices_type.element_type
-  assert indptr_type.shape == [shape[0] + 1]
+  if __debug__:
+    indptr_type = ir.RankedTensorType(indptr.type)
+    assert indices_type.shape == [nnz]
+    assert indptr_type.element_type == indices_type.element_type
+    assert indptr_type.shape == [shape[0] + 1]
   return data_type.element_type, indices_type.element_type, nnz
 
 def _validate_coo_mhlo(data, row, col, shape):
   data_type = ir.RankedTensorType(data.type)
   row_type = ir.RankedTensorType(row.type)
-  col_type = ir.RankedTensorType(col.type)
 
   nnz, = data_type.shape
-  assert row_type.shape == [nnz]
-  assert col_type.element_type == row_type.element_type
-  assert col_type.shape == [nnz]
+  if __debug__:
+    col_type = ir.RankedTensorType(col.type)
+    assert row_type.shape == [nnz]
+    assert col_type.element_type == row_type.element_type
+    assert col_type.shape == [nnz]
   return data_type.element_type, row_type.element_type, nnz
 
 
@@ -74,92 +251,284 @@ def _csr_todense_mhlo(platform, gpu_sparse, data, indices, indptr, *, shape,
   """CSR to dense matrix."""
   data_type, index_type, nnz = _validate_csr_mhlo(data, indices, indptr, shape)
   rows, cols = shape
+  if nnz == 0 or 0 in shape:
+    return _mhlo_zeros(shape, data_dtype, data_type)
 
-  buffer_size, opaque = gpu_sparse.build_csr_todense_descriptor(
-      data_dtype, index_dtype, rows, cols, nnz)
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_csr_todense_descriptor,
+      data_dtype, index_dtype, rows, cols, nnz, _shared_workspace)
 
-  out = custom_call(
+  out = _workspace_custom_call(
       f"{platform}sparse_csr_todense",
-      [
-          ir.RankedTensorType.get(shape, data_type),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
-      ],
+      [ir.RankedTensorType.get(shape, data_type)],
       [data, indices, indptr],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
       backend_config=opaque,
       operand_layouts=[[0]] * 3,
-      result_layouts=[[1, 0], [0]])
+      result_layouts=[[1, 0]])
   return out[0]
 
 cuda_csr_todense = partial(_csr_todense_mhlo, "cu", _cusparse)
 rocm_csr_todense = partial(_csr_todense_mhlo, "hip", _hipsparse)
 
 
+def _csr_fromdense_fast_supported(gpu_sparse, *, data_dtype, index_dtype):
+  """Returns whether `gpu_sparse` has a fused kernel for this conversion."""
+  return (hasattr(gpu_sparse, "build_csr_fromdense_fast_descriptor") and
+          np.dtype(data_dtype) in (np.float32, np.float64) and
+          np.dtype(index_dtype) in (np.int32, np.int64))
+
 def _csr_fromdense_mhlo(platform, gpu_sparse, mat, *, nnz, index_dtype,
-                        data_dtype, index_type):
-  """CSR from dense matrix."""
+                        data_dtype, index_type, use_fast=False):
+  """CSR from dense matrix.
+
+  With ``use_fast=True``, float32 and float64 matrices are converted by fused
+  kernels that count, scan and compact the nonzeros in place of cuSPARSE's
+  dense-to-sparse routines, where the platform provides them.
+  """
   mat_type = ir.RankedTensorType(mat.type)
   rows, cols = mat_type.shape
 
-  buffer_size, opaque = gpu_sparse.build_csr_fromdense_descriptor(
-      data_dtype, index_dtype, rows, cols, nnz)
+  if use_fast and _csr_fromdense_fast_supported(
+      gpu_sparse, data_dtype=data_dtype, index_dtype=index_dtype):
+    target = f"{platform}sparse_csr_fromdense_fast"
+    buffer_size, opaque = _build_descriptor(
+        gpu_sparse.build_csr_fromdense_fast_descriptor,
+        np.dtype(data_dtype), np.dtype(index_dtype), rows, cols, nnz)
+    # The scan's scratch space is sized for the kernel, not for cuSPARSE, so
+    # it is always allocated by XLA.
+    external_workspace = False
+  else:
+    target = f"{platform}sparse_csr_fromdense"
+    buffer_size, opaque = _build_descriptor(
+        gpu_sparse.build_csr_fromdense_descriptor,
+        data_dtype, index_dtype, rows, cols, nnz, _shared_workspace)
+    external_workspace = _shared_workspace
 
-  out = custom_call(
-      f"{platform}sparse_csr_fromdense",
+  out = _workspace_custom_call(
+      target,
       [
           ir.RankedTensorType.get([nnz], mat_type.element_type),
           ir.RankedTensorType.get([nnz], index_type),
           ir.RankedTensorType.get([rows + 1], index_type),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
       ],
       [mat],
+      buffer_size=buffer_size,
+      external_workspace=external_workspace,
       backend_config=opaque,
       operand_layouts=[[1, 0]],
-      result_layouts=[[0]] * 4)
+      result_layouts=[[0]] * 3)
   return out[:3]
 
 cuda_csr_fromdense = partial(_csr_fromdense_mhlo, "cu", _cusparse)
 rocm_csr_fromdense = partial(_csr_fromdense_mhlo, "hip", _hipsparse)
 
+def _csr_fromdense_source(platform, data, indices, indptr):
+  """Returns the dense matrix that `data`, `indices` and `indptr` came from.
+
+  If the three are the results of a ``_csr_fromdense_mhlo`` custom call that
+  used cuSPARSE, returns the matrix that call converted; otherwise returns
+  None.
+  """
+  if not ir.OpResult.isinstance(data):
+    return None
+  op = ir.OpResult(data).owner.operation
+  if (op.name != "mhlo.custom_call" or
+      ir.StringAttr(op.attributes["call_target_name"]).value !=
+      f"{platform}sparse_csr_fromdense"):
+    return None
+  if list(op.results)[:3] != [data, indices, indptr]:
+    return None
+  return op.operands[0]
+
 
 def _csr_matvec_mhlo(platform, gpu_sparse, data, indices, indptr, x, *, shape,
                      transpose=False, compute_dtype=None, compute_type=None,
-                     data_dtype, index_dtype, x_dtype):
-  """CSR matrix/vector multiply."""
+                     data_dtype, index_dtype, x_dtype, use_csc=None):
+  """CSR matrix/vector multiply.
+
+  With ``use_csc=True``, transposed products with 32-bit indices convert the
+  matrix to CSC form and run the non-transposed product on it, which avoids
+  cuSPARSE's atomics. ``use_csc`` defaults to whether the product is lowered
+  within ``transpose_via_csc()``.
+  """
+  nnz, = ir.RankedTensorType(data.type).shape
+  if nnz == 0 or 0 in shape:
+    return _zero_product(data, [shape[1] if transpose else shape[0]],
+                         compute_dtype=compute_dtype,
+                         compute_type=compute_type, data_dtype=data_dtype)
+  out = _densemv_of_fromdense(
+      platform, gpu_sparse, data, indices, indptr, x, shape=shape,
+      transpose=transpose, compute_dtype=compute_dtype, data_dtype=data_dtype,
+      x_dtype=x_dtype)
+  if out is not None:
+    return out
+  if use_csc is None:
+    use_csc = _transpose_csr_via_csc
+  if use_csc and transpose and _transpose_via_csc(gpu_sparse, index_dtype):
+    data, indices, indptr = _csr2csc_mhlo(platform, gpu_sparse, data, indices,
+                                          indptr, shape=shape,
+                                          data_dtype=data_dtype)
+    shape = shape[::-1]
+    transpose = False
   data_type, index_type, nnz = _validate_csr_mhlo(data, indices, indptr, shape)
   rows, cols = shape
 
   if compute_dtype is None:
     compute_dtype = data_dtype
     compute_type = data_type
+  x, x_dtype = _match_bf16_data(data_dtype, x, x_dtype)
 
-  buffer_size, opaque = gpu_sparse.build_csr_matvec_descriptor(
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_csr_matvec_descriptor,
       data_dtype, x_dtype, compute_dtype, index_dtype,
-      rows, cols, nnz, transpose)
+      rows, cols, nnz, transpose, _shared_workspace)
   out_size = cols if transpose else rows
 
-  out = custom_call(
+  out = _workspace_custom_call(
       f"{platform}sparse_csr_matvec",
-      [
-          ir.RankedTensorType.get([out_size], compute_type),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
-      ],
+      [ir.RankedTensorType.get([out_size], compute_type)],
       [data, indices, indptr, x],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
       backend_config=opaque,
       operand_layouts=[[0]] * 4,
-      result_layouts=[[0]] * 2)
+      result_layouts=[[0]])
   return out[0]
 
 cuda_csr_matvec = partial(_csr_matvec_mhlo, "cu", _cusparse)
 rocm_csr_matvec = partial(_csr_matvec_mhlo, "hip", _hipsparse)
 
 
+def _csr_matvec_light_supported(gpu_sparse, *, transpose, compute_dtype,
+                                data_dtype, index_dtype, x_dtype):
+  """Returns whether `_csr_matvec_light_mhlo` handles this product."""
+  return (hasattr(gpu_sparse, "build_csr_matvec_light_descriptor") and
+          not transpose and np.dtype(index_dtype) == np.int32 and
+          np.dtype(data_dtype) in (np.float32, np.float64) and
+          np.dtype(x_dtype) == np.dtype(data_dtype) and
+          (compute_dtype is None or
+           np.dtype(compute_dtype) == np.dtype(data_dtype)))
+
+def _csr_matvec_light_mhlo(platform, gpu_sparse, data, indices, indptr, x, *,
+                           shape, transpose=False, compute_dtype=None,
+                           compute_type=None, data_dtype, index_dtype,
+                           x_dtype):
+  """CSR matrix/vector multiply with the LightSpMV kernel.
+
+  Takes the same arguments as ``_csr_matvec_mhlo``, but only supports
+  non-transposed float32 and float64 products with int32 indices; see
+  ``_csr_matvec_light_supported``.
+  """
+  del compute_dtype, compute_type
+  assert not transpose
+  data_type, _, nnz = _validate_csr_mhlo(data, indices, indptr, shape)
+  rows, cols = shape
+  opaque = _build_descriptor(
+      gpu_sparse.build_csr_matvec_light_descriptor,
+      np.dtype(data_dtype), np.dtype(x_dtype), np.dtype(index_dtype),
+      rows, cols, nnz)
+  # The second result holds the row counter through which the kernel's warps
+  # claim rows.
+  out = custom_call(
+      f"{platform}sparse_csr_matvec_light",
+      [ir.RankedTensorType.get([rows], data_type),
+       ir.RankedTensorType.get([1], ir.IntegerType.get_signless(32))],
+      [data, indices, indptr, x],
+      backend_config=opaque,
+      operand_layouts=[[0]] * 4,
+      result_layouts=[[0]] * 2)
+  return out[0]
+
+cuda_csr_matvec_light = partial(_csr_matvec_light_mhlo, "cu", _cusparse)
+
+
+def _csr_matvec_grouped_mhlo(platform, gpu_sparse, groups, *, shapes,
+                             data_dtype, index_dtype, x_dtype):
+  """Independent CSR matrix/vector multiplies in a single kernel launch.
+
+  ``groups`` is a sequence of ``(data, indices, indptr, x)`` operands and
+  ``shapes`` the matching sequence of matrix shapes. All groups share the same
+  dtypes; only float32 and float64 data with int32 indices are supported.
+  Returns the list of products, one per group.
+  """
+  assert len(groups) == len(shapes)
+  operands, out_types, group_shapes = [], [], []
+  for (data, indices, indptr, x), shape in zip(groups, shapes):
+    data_type, _, nnz = _validate_csr_mhlo(data, indices, indptr, shape)
+    rows, cols = shape
+    operands.extend([data, indices, indptr, x])
+    out_types.append(ir.RankedTensorType.get([rows], data_type))
+    group_shapes.append((rows, cols, nnz))
+
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_csr_matvec_grouped_descriptor,
+      np.dtype(data_dtype), np.dtype(x_dtype), np.dtype(index_dtype),
+      tuple(group_shapes))
+  # The workspace holds the per-group task table read by the kernel.
+  return _workspace_custom_call(
+      f"{platform}sparse_csr_matvec_grouped",
+      out_types,
+      operands,
+      buffer_size=buffer_size,
+      external_workspace=False,
+      backend_config=opaque,
+      operand_layouts=[[0]] * len(operands),
+      result_layouts=[[0]] * len(out_types))
+
+cuda_csr_matvec_grouped = partial(_csr_matvec_grouped_mhlo, "cu", _cusparse)
+
+
+# CUSPARSE_SPMM_ALG_DEFAULT and HIPSPARSE_SPMM_ALG_DEFAULT.
+_SPMM_ALG_DEFAULT = 0
+
+# Maps (rows, cols, Ccols, nnz bucket, data_dtype, B_dtype, compute_dtype,
+# index_dtype, transpose) to the fastest cuSPARSE algorithm measured for a CSR
+# matrix/matrix product. The bucket of a product is the bit length of its
+# number of stored elements, so that matrices of one shape whose numbers of
+# stored elements are close share a measurement. The cache holds an entry for
+# each distinct product tuned under autotuning(), and is never evicted.
+_alg_cache = {}
+
+_SPMM_TUNE_ITERATIONS = 10
+
+def _tune_alg(shape_key, algs, time_fn):
+  """Returns the fastest of `algs` for `shape_key`, timing each with `time_fn`.
+
+  Only the first call for a given key runs the benchmarks; later calls return
+  the cached winner.
+  """
+  alg = _alg_cache.get(shape_key)
+  if alg is None:
+    times = {alg: time_fn(alg) for alg in algs}
+    alg = _alg_cache[shape_key] = min(times, key=times.get)
+  return alg
+
 def _csr_matmat_mhlo(platform, gpu_sparse, data, indices, indptr, B, *, shape,
                      transpose=False, compute_dtype=None, compute_type=None,
-                     index_dtype, data_dtype, B_dtype):
-  """CSR from dense matrix."""
+                     index_dtype, data_dtype, B_dtype, use_csc=None):
+  """CSR matrix/matrix product.
+
+  With ``use_csc=True``, transposed products with 32-bit indices convert the
+  matrix to CSC form and run the non-transposed product on it, which avoids
+  cuSPARSE's atomics. ``use_csc`` defaults to whether the product is lowered
+  within ``transpose_via_csc()``.
+  """
+  nnz, = ir.RankedTensorType(data.type).shape
+  _, Ccols = ir.RankedTensorType(B.type).shape
+  if nnz == 0 or 0 in shape or Ccols == 0:
+    return _zero_product(data, [shape[1] if transpose else shape[0], Ccols],
+                         compute_dtype=compute_dtype,
+                         compute_type=compute_type, data_dtype=data_dtype)
+  if use_csc is None:
+    use_csc = _transpose_csr_via_csc
+  if use_csc and transpose and _transpose_via_csc(gpu_sparse, index_dtype):
+    data, indices, indptr = _csr2csc_mhlo(platform, gpu_sparse, data, indices,
+                                          indptr, shape=shape,
+                                          data_dtype=data_dtype)
+    shape = shape[::-1]
+    transpose = False
   data_type, index_type, nnz = _validate_csr_mhlo(data, indices, indptr, shape)
   rows, cols = shape
   B_shape = ir.RankedTensorType(B.type).shape
@@ -168,77 +537,337 @@ def _csr_matmat_mhlo(platform, gpu_sparse, data, indices, indptr, B, *, shape,
   if compute_dtype is None:
     compute_dtype = data_dtype
     compute_type = data_type
+  B, B_dtype = _match_bf16_data(data_dtype, B, B_dtype)
 
-  buffer_size, opaque = gpu_sparse.build_csr_matmat_descriptor(
+  alg = _SPMM_ALG_DEFAULT
+  if hasattr(gpu_sparse, "time_csrmm") and nnz > 0 and rows > 0 and Ccols > 0:
+    key = (rows, cols, Ccols, nnz.bit_length(), np.dtype(data_dtype),
+           np.dtype(B_dtype), np.dtype(compute_dtype), np.dtype(index_dtype),
+           transpose)
+    if _autotune:
+      alg = _tune_alg(
+          key, gpu_sparse.spmm_csr_algorithms(),
+          lambda alg: gpu_sparse.time_csrmm(
+              alg, data_dtype, B_dtype, compute_dtype, index_dtype, rows, cols,
+              Ccols, nnz, transpose, _SPMM_TUNE_ITERATIONS))
+    else:
+      alg = _alg_cache.get(key, _SPMM_ALG_DEFAULT)
+
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_csr_matmat_descriptor,
       data_dtype, B_dtype, compute_dtype, index_dtype,
-      rows, cols, Ccols, nnz, transpose)
+      rows, cols, Ccols, nnz, transpose, alg, _shared_workspace)
   out_size = cols if transpose else rows
 
-  out = custom_call(
+  out = _workspace_custom_call(
       f"{platform}sparse_csr_matmat",
-      [
-          ir.RankedTensorType.get([out_size, Ccols], compute_type),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
-      ],
+      [ir.RankedTensorType.get([out_size, Ccols], compute_type)],
       [data, indices, indptr, B],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
       backend_config=opaque,
       operand_layouts=[[0], [0], [0], [1, 0]],
-      result_layouts=[[1, 0], [0]])
+      result_layouts=[[1, 0]])
   return out[0]
 
 cuda_csr_matmat = partial(_csr_matmat_mhlo, "cu", _cusparse)
 rocm_csr_matmat = partial(_csr_matmat_mhlo, "hip", _hipsparse)
 
 
+def _csr_matmat_tiled_supported(gpu_sparse, *, transpose, compute_dtype,
+                                index_dtype, data_dtype, B_dtype):
+  """Returns whether `_csr_matmat_tiled_mhlo` handles this product."""
+  out_dtype = data_dtype if compute_dtype is None else compute_dtype
+  return (hasattr(gpu_sparse, "build_csr_matmat_tiled_descriptor") and
+          not transpose and np.dtype(index_dtype) == np.int32 and
+          np.dtype(data_dtype) == np.float16 and
+          np.dtype(B_dtype) == np.float16 and
+          np.dtype(out_dtype) in (np.float16, np.float32))
+
+def _csr_matmat_tiled_mhlo(platform, gpu_sparse, data, indices, indptr, B, *,
+                           shape, transpose=False, compute_dtype=None,
+                           compute_type=None, index_dtype, data_dtype,
+                           B_dtype):
+  """CSR matrix/matrix multiply on Tensor Cores.
+
+  Takes the same arguments as ``_csr_matmat_mhlo``, but only supports
+  non-transposed products of float16 operands with int32 indices, accumulated
+  in float32; see ``_csr_matmat_tiled_supported``. The kernel is fastest if the
+  column indices of each row are sorted.
+  """
+  assert not transpose
+  nnz, = ir.RankedTensorType(data.type).shape
+  _, Ccols = ir.RankedTensorType(B.type).shape
+  if nnz == 0 or 0 in shape or Ccols == 0:
+    return _zero_product(data, [shape[0], Ccols], compute_dtype=compute_dtype,
+                         compute_type=compute_type, data_dtype=data_dtype)
+  data_type, _, nnz = _validate_csr_mhlo(data, indices, indptr, shape)
+  rows, cols = shape
+  if compute_dtype is None:
+    compute_dtype = data_dtype
+    compute_type = data_type
+
+  opaque = _build_descriptor(
+      gpu_sparse.build_csr_matmat_tiled_descriptor,
+      np.dtype(data_dtype), np.dtype(B_dtype), np.dtype(compute_dtype),
+      np.dtype(index_dtype), rows, cols, Ccols, nnz)
+  return custom_call(
+      f"{platform}sparse_csr_matmat_tiled",
+      [ir.RankedTensorType.get([rows, Ccols], compute_type)],
+      [data, indices, indptr, B],
+      backend_config=opaque,
+      operand_layouts=[[0], [0], [0], [1, 0]],
+      result_layouts=[[1, 0]])
+
+cuda_csr_matmat_tiled = partial(_csr_matmat_tiled_mhlo, "cu", _cusparse)
+cuda_csr_matmat_tiled_supported = partial(_csr_matmat_tiled_supported,
+                                          _cusparse)
+
+def _spmm_auto_mhlo(platform, gpu_sparse, data, indices, indptr, B, *, shape,
+                    transpose=False, compute_dtype=None, compute_type=None,
+                    index_dtype, data_dtype, B_dtype):
+  """CSR matrix/matrix multiply, dispatched to the best kernel for the problem.
+
+  Products that ``_csr_matmat_tiled_mhlo`` supports, i.e. float16 products,
+  run on Tensor Cores; all others use cuSPARSE.
+  """
+  kwargs = dict(shape=shape, transpose=transpose, compute_dtype=compute_dtype,
+                compute_type=compute_type, index_dtype=index_dtype,
+                data_dtype=data_dtype, B_dtype=B_dtype)
+  if _csr_matmat_tiled_supported(
+      gpu_sparse, transpose=transpose, compute_dtype=compute_dtype,
+      index_dtype=index_dtype, data_dtype=data_dtype, B_dtype=B_dtype):
+    return _csr_matmat_tiled_mhlo(platform, gpu_sparse, data, indices, indptr,
+                                  B, **kwargs)
+  return _csr_matmat_mhlo(platform, gpu_sparse, data, indices, indptr, B,
+                          **kwargs)
+
+cuda_spmm_auto = partial(_spmm_auto_mhlo, "cu", _cusparse)
+
+
+def _bsr_matmat_mhlo(platform, gpu_sparse, ell_values, ell_col_ind, B, *,
+                     shape, block_size, compute_dtype=None, compute_type=None,
+                     index_dtype, data_dtype, B_dtype):
+  """Block-sparse matrix/dense matrix multiply.
+
+  The sparse matrix is stored in blocked-ELL format: ``ell_col_ind`` has shape
+  ``(rows // block_size, ell_cols // block_size)`` and holds the block column
+  of each stored block, or -1 for padding, and ``ell_values`` has shape
+  ``(rows, ell_cols)`` and holds the stored blocks. Half-precision inputs run
+  on Tensor Cores.
+  """
+  ell_values_type = ir.RankedTensorType(ell_values.type)
+  rows, cols = shape
+  _, ell_cols = ell_values_type.shape
+  _, Ccols = ir.RankedTensorType(B.type).shape
+  assert ell_values_type.shape[0] == rows
+  assert ir.RankedTensorType(ell_col_ind.type).shape == [
+      rows // block_size, ell_cols // block_size]
+
+  if compute_dtype is None:
+    compute_dtype = data_dtype
+    compute_type = ell_values_type.element_type
+
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_bsr_matmat_descriptor,
+      data_dtype, B_dtype, compute_dtype, index_dtype,
+      rows, cols, Ccols, ell_cols, block_size, _shared_workspace)
+
+  out = _workspace_custom_call(
+      f"{platform}sparse_bsr_matmat",
+      [ir.RankedTensorType.get([rows, Ccols], compute_type)],
+      [ell_values, ell_col_ind, B],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
+      backend_config=opaque,
+      operand_layouts=[[1, 0]] * 3,
+      result_layouts=[[1, 0]])
+  return out[0]
+
+cuda_bsr_matmat = partial(_bsr_matmat_mhlo, "cu", _cusparse)
+
+
+def _spmm24_element_type(dtype):
+  """Returns the MLIR element type of cuSPARSELt operands of `dtype`."""
+  dtype = np.dtype(dtype)
+  if dtype == np.dtype(xla_client.bfloat16):
+    return ir.BF16Type.get()
+  if dtype == np.float16:
+    return ir.F16Type.get()
+  if dtype == np.float32:
+    return ir.F32Type.get()
+  if dtype == np.int8:
+    return ir.IntegerType.get_signless(8)
+  raise NotImplementedError(f"Unsupported dtype {dtype}")
+
+def _spmm24_compress_mhlo(platform, gpu_sparse, mat, *, n, data_dtype,
+                          compute_dtype=None, transpose=False):
+  """Compresses a 2:4 structured-sparse matrix for use by ``_spmm24_mhlo``.
+
+  ``mat`` must already be pruned so that every group of four consecutive
+  elements along the reduction dimension has at least two zeros. The result is
+  an opaque byte array holding the nonzero values together with their 2-bit
+  metadata. ``n`` is the number of columns of the dense operand the matrix will
+  be multiplied with.
+  """
+  a_rows, a_cols = ir.RankedTensorType(mat.type).shape
+  m, k = (a_cols, a_rows) if transpose else (a_rows, a_cols)
+  if compute_dtype is None:
+    compute_dtype = data_dtype
+  # Compression does not depend on the kernel of the plan, so its plan is
+  # never tuned.
+  _, compressed_size, opaque = _build_descriptor(
+      gpu_sparse.build_spmm24_descriptor,
+      data_dtype, compute_dtype, m, n, k, transpose, False)
+  return custom_call(
+      f"{platform}sparse_spmm24_compress",
+      [ir.RankedTensorType.get([compressed_size],
+                               ir.IntegerType.get_signless(8))],
+      [mat],
+      backend_config=opaque,
+      operand_layouts=[[1, 0]],
+      result_layouts=[[0]])
+
+cuda_spmm24_compress = partial(_spmm24_compress_mhlo, "cu", _cusparse)
+
+
+def _spmm24_mhlo(platform, gpu_sparse, compressed, B, *, shape, data_dtype,
+                 compute_dtype=None, transpose=False):
+  """2:4 structured-sparse matrix/dense matrix multiply.
+
+  ``compressed`` is the output of ``_spmm24_compress_mhlo`` for a sparse
+  matrix of the given ``shape``; the result is ``op(A) @ B``, with the dtype of
+  ``B``, which must have the dtype of the compressed matrix. float32 products
+  are computed in TF32 precision. Within ``autotuning()``, the fastest kernel
+  for each problem size is chosen by benchmarking when it is first lowered and
+  reused afterwards.
+  """
+  a_rows, a_cols = shape
+  m, k = (a_cols, a_rows) if transpose else (a_rows, a_cols)
+  B_type = ir.RankedTensorType(B.type)
+  B_rows, n = B_type.shape
+  assert B_rows == k
+  assert B_type.element_type == _spmm24_element_type(data_dtype), (
+      B_type.element_type, data_dtype)
+  if compute_dtype is None:
+    compute_dtype = data_dtype
+  workspace_size, _, opaque = _build_descriptor(
+      gpu_sparse.build_spmm24_descriptor,
+      data_dtype, compute_dtype, m, n, k, transpose, _autotune)
+  out = _workspace_custom_call(
+      f"{platform}sparse_spmm24",
+      [ir.RankedTensorType.get([m, n], B_type.element_type)],
+      [compressed, B],
+      buffer_size=workspace_size,
+      external_workspace=False,
+      backend_config=opaque,
+      operand_layouts=[[0], [1, 0]],
+      result_layouts=[[1, 0]])
+  return out[0]
+
+cuda_spmm24 = partial(_spmm24_mhlo, "cu", _cusparse)
+
+
 def _coo_todense_mhlo(platform, gpu_sparse, data, row, col, *, shape,
                       data_dtype, index_dtype):
   """COO to dense matrix."""
   data_type, _, nnz = _validate_coo_mhlo(data, row, col, shape)
   rows, cols = shape
+  if nnz == 0 or 0 in shape:
+    return _mhlo_zeros(shape, data_dtype, data_type)
 
-  buffer_size, opaque = gpu_sparse.build_coo_todense_descriptor(
-      data_dtype, index_dtype, rows, cols, nnz)
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_coo_todense_descriptor,
+      data_dtype, index_dtype, rows, cols, nnz, _shared_workspace)
 
-  out = custom_call(
+  out = _workspace_custom_call(
       f"{platform}sparse_coo_todense",
-      [
-          ir.RankedTensorType.get(shape, data_type),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
-      ],
+      [ir.RankedTensorType.get(shape, data_type)],
       [data, row, col],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
       backend_config=opaque,
       operand_layouts=[[0]] * 3,
-      result_layouts=[[1, 0], [0]])
+      result_layouts=[[1, 0]])
   return out[0]
 
 cuda_coo_todense = partial(_coo_todense_mhlo, "cu", _cusparse)
 rocm_coo_todense = partial(_coo_todense_mhlo, "hip", _hipsparse)
 
 
+def _unpack_coo(packed, *, nnz, sections):
+  """Slices the arrays of a COO matrix out of the byte buffer `packed`.
+
+  `sections` lists the byte offset, item size and element type of each array,
+  each of which has `nnz` elements.
+  """
+  i8 = ir.IntegerType.get_signless(8)
+  out = []
+  for offset, itemsize, element_type in sections:
+    v = mhlo.SliceOp(
+        packed,
+        ir.DenseIntElementsAttr.get(np.array([offset], np.int64)),
+        ir.DenseIntElementsAttr.get(np.array([offset + nnz * itemsize],
+                                             np.int64)),
+        ir.DenseIntElementsAttr.get(np.ones([1], np.int64))).result
+    if itemsize > 1:
+      v = mhlo.ReshapeOp(ir.RankedTensorType.get([nnz, itemsize], i8),
+                         v).result
+    out.append(mhlo.BitcastConvertOp(
+        ir.RankedTensorType.get([nnz], element_type), v).result)
+  return out
+
 def _coo_fromdense_mhlo(platform, gpu_sparse, mat, *, nnz, data_dtype,
-                        index_dtype, index_type):
-  """COO from dense matrix."""
+                        index_dtype, index_type, packed=False):
+  """COO from dense matrix.
+
+  With ``packed=True``, the conversion writes the values and row and column
+  indices into a single buffer that is then sliced into the three arrays, so
+  XLA allocates one result instead of three, where the platform supports it.
+  """
   mat_type = ir.RankedTensorType(mat.type)
   rows, cols = mat_type.shape
 
-  buffer_size, opaque = gpu_sparse.build_coo_fromdense_descriptor(
-      data_dtype, index_dtype, rows, cols, nnz)
+  # XLA cannot bitcast bytes to complex numbers.
+  if (packed and hasattr(gpu_sparse, "build_coo_fromdense_packed_descriptor")
+      and not np.issubdtype(data_dtype, np.complexfloating)):
+    buffer_size, row_offset, col_offset, opaque = _build_descriptor(
+        gpu_sparse.build_coo_fromdense_packed_descriptor,
+        data_dtype, index_dtype, rows, cols, nnz, _shared_workspace)
+    index_size = np.dtype(index_dtype).itemsize
+    out, = _workspace_custom_call(
+        f"{platform}sparse_coo_fromdense_packed",
+        [ir.RankedTensorType.get([col_offset + nnz * index_size],
+                                 ir.IntegerType.get_signless(8))],
+        [mat],
+        buffer_size=buffer_size,
+        external_workspace=_shared_workspace,
+        backend_config=opaque,
+        operand_layouts=[[1, 0]],
+        result_layouts=[[0]])
+    return _unpack_coo(out, nnz=nnz, sections=[
+        (0, np.dtype(data_dtype).itemsize, mat_type.element_type),
+        (row_offset, index_size, index_type),
+        (col_offset, index_size, index_type),
+    ])
 
-  out = custom_call(
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_coo_fromdense_descriptor,
+      data_dtype, index_dtype, rows, cols, nnz, _shared_workspace)
+
+  out = _workspace_custom_call(
       f"{platform}sparse_coo_fromdense",
       [
           ir.RankedTensorType.get([nnz], mat_type.element_type),
           ir.RankedTensorType.get([nnz], index_type),
           ir.RankedTensorType.get([nnz], index_type),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
       ],
       [mat],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
       backend_config=opaque,
       operand_layouts=[[1, 0]],
-      result_layouts=[[0]] * 4)
+      result_layouts=[[0]] * 3)
   return out[:3]
 
 cuda_coo_fromdense = partial(_coo_fromdense_mhlo, "cu", _cusparse)
@@ -251,27 +880,30 @@ def _coo_matvec_mhlo(platform, gpu_sparse, data, row, col, x, *, shape,
   """COO matrix/vector multiply."""
   data_type, index_type, nnz = _validate_coo_mhlo(data, row, col, shape)
   rows, cols = shape
+  if nnz == 0 or 0 in shape:
+    return _zero_product(data, [cols if transpose else rows],
+                         compute_dtype=compute_dtype,
+                         compute_type=compute_type, data_dtype=data_dtype)
 
   if compute_dtype is None:
     compute_dtype = data_dtype
     compute_type = data_type
 
-  buffer_size, opaque = gpu_sparse.build_coo_matvec_descriptor(
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_coo_matvec_descriptor,
       data_dtype, x_dtype, compute_dtype, index_dtype,
-      rows, cols, nnz, transpose)
+      rows, cols, nnz, transpose, _shared_workspace)
   out_size = cols if transpose else rows
 
-  out = custom_call(
+  out = _workspace_custom_call(
       f"{platform}sparse_coo_matvec",
-      [
-          ir.RankedTensorType.get([out_size], compute_type),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
-      ],
+      [ir.RankedTensorType.get([out_size], compute_type)],
       [data, row, col, x],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
       backend_config=opaque,
       operand_layouts=[[0]] * 4,
-      result_layouts=[[0]] * 2)
+      result_layouts=[[0]])
   return out[0]
 
 cuda_coo_matvec = partial(_coo_matvec_mhlo, "cu", _cusparse)
@@ -286,53 +918,272 @@ def _coo_matmat_mhlo(platform, gpu_sparse, data, row, col, B, *, shape,
   rows, cols = shape
   B_shape = ir.RankedTensorType(B.type).shape
   _, Ccols = B_shape
+  if nnz == 0 or 0 in shape or Ccols == 0:
+    return _zero_product(data, [cols if transpose else rows, Ccols],
+                         compute_dtype=compute_dtype,
+                         compute_type=compute_type, data_dtype=data_dtype)
 
   if compute_dtype is None:
     compute_dtype = data_dtype
     compute_type = data_type
 
-  buffer_size, opaque = gpu_sparse.build_coo_matmat_descriptor(
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_coo_matmat_descriptor,
       data_dtype, x_dtype, compute_dtype, index_dtype,
-      rows, cols, Ccols, nnz, transpose)
+      rows, cols, Ccols, nnz, transpose, _shared_workspace)
   out_size = cols if transpose else rows
 
-  out = custom_call(
+  out = _workspace_custom_call(
       f"{platform}sparse_coo_matmat",
-      [
-          ir.RankedTensorType.get([out_size, Ccols], compute_type),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
-      ],
+      [ir.RankedTensorType.get([out_size, Ccols], compute_type)],
       [data, row, col, B],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
       backend_config=opaque,
       operand_layouts=[[0], [0], [0], [1, 0]],
-      result_layouts=[[1, 0], [0]])
+      result_layouts=[[1, 0]])
   return out[0]
 
 cuda_coo_matmat = partial(_coo_matmat_mhlo, "cu", _cusparse)
 rocm_coo_matmat = partial(_coo_matmat_mhlo, "hip", _hipsparse)
 
 
+def _csr2coo_mhlo(platform, gpu_sparse, indptr, *, nnz):
+  """Expands CSR row offsets into COO row indices."""
+  indptr_type = ir.RankedTensorType(indptr.type)
+  rows = indptr_type.shape[0] - 1
+  return custom_call(
+      f"{platform}sparse_csr2coo",
+      [ir.RankedTensorType.get([nnz], indptr_type.element_type)],
+      [indptr],
+      backend_config=_build_descriptor(
+          gpu_sparse.build_csr2coo_descriptor, rows, nnz),
+      operand_layouts=[[0]],
+      result_layouts=[[0]])
+
+
+def _csr2csc_mhlo(platform, gpu_sparse, data, indices, indptr, *, shape,
+                  data_dtype):
+  """Converts a CSR matrix to CSC, i.e. to the CSR form of its transpose.
+
+  Returns the data, indices and indptr of the transposed matrix.
+  """
+  data_type, index_type, nnz = _validate_csr_mhlo(data, indices, indptr, shape)
+  rows, cols = shape
+  buffer_size, opaque = _build_descriptor(
+      gpu_sparse.build_csr2csc_descriptor,
+      np.dtype(data_dtype), rows, cols, nnz, _shared_workspace)
+  out = _workspace_custom_call(
+      f"{platform}sparse_csr2csc",
+      [
+          ir.RankedTensorType.get([nnz], data_type),
+          ir.RankedTensorType.get([nnz], index_type),
+          ir.RankedTensorType.get([cols + 1], index_type),
+      ],
+      [data, indices, indptr],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
+      backend_config=opaque,
+      operand_layouts=[[0]] * 3,
+      result_layouts=[[0]] * 3)
+  return out[:3]
+
+def _transpose_via_csc(gpu_sparse, index_dtype):
+  """Returns whether transposed CSR products can run on the CSC form.
+
+  cuSPARSE computes transposed CSR products with atomics, which is slow on
+  irregular matrices; a non-transposed product on the explicitly transposed
+  matrix avoids them. cusparseCsr2cscEx2 only supports 32-bit indices.
+  """
+  return (hasattr(gpu_sparse, "build_csr2csc_descriptor") and
+          np.dtype(index_dtype) == np.int32)
+
+
+# Maps (rows, cols, nnz, data_dtype, x_dtype, compute_dtype, index_dtype,
+# transpose) to the name of the fastest sparse format measured for a
+# matrix/vector product.
+_spmv_tune_cache = {}
+
+_SPMV_TUNE_ITERATIONS = 10
+
+def _tune_spmv_format(gpu_sparse, *, shape, nnz, transpose, compute_dtype,
+                      data_dtype, index_dtype, x_dtype):
+  """Returns the fastest format for a matrix/vector product of this shape."""
+  rows, cols = shape
+  formats = ["csr"]
+  # cusparseXcsr2coo only supports 32-bit indices.
+  if np.dtype(index_dtype) == np.int32:
+    formats.append("coo")
+  if _csr_matvec_light_supported(
+      gpu_sparse, transpose=transpose, compute_dtype=compute_dtype,
+      data_dtype=data_dtype, index_dtype=index_dtype, x_dtype=x_dtype):
+    formats.append("light")
+  times = {
+      fmt: gpu_sparse.benchmark_spmv(
+          fmt, data_dtype, x_dtype, compute_dtype, index_dtype, rows, cols,
+          nnz, transpose, _SPMV_TUNE_ITERATIONS)
+      for fmt in formats
+  }
+  return min(times, key=times.get)
+
+def _spmv_auto_mhlo(platform, gpu_sparse, data, indices, indptr, x, *, shape,
+                    transpose=False, compute_dtype=None, compute_type=None,
+                    data_dtype, index_dtype, x_dtype):
+  """CSR matrix/vector multiply, dispatched to the fastest measured format.
+
+  Outside of an ``autotuning()`` context this is ``_csr_matvec_mhlo``. Within
+  one, the cuSPARSE CSR and COO kernels and, where it applies, the LightSpMV
+  CSR kernel are benchmarked the first time a problem is seen, and the winner
+  is cached and used for that problem.
+  """
+  out = _densemv_of_fromdense(
+      platform, gpu_sparse, data, indices, indptr, x, shape=shape,
+      transpose=transpose, compute_dtype=compute_dtype, data_dtype=data_dtype,
+      x_dtype=x_dtype)
+  if out is not None:
+    return out
+  nnz, = ir.RankedTensorType(data.type).shape
+  rows, cols = shape
+  x, x_dtype = _match_bf16_data(data_dtype, x, x_dtype)
+  resolved_compute_dtype = (data_dtype if compute_dtype is None
+                            else compute_dtype)
+  key = (rows, cols, nnz, np.dtype(data_dtype), np.dtype(x_dtype),
+         np.dtype(resolved_compute_dtype), np.dtype(index_dtype), transpose)
+  fmt = _spmv_tune_cache.get(key) if _autotune else None
+  if fmt is None and _autotune and nnz > 0 and rows > 0:
+    fmt = _spmv_tune_cache[key] = _tune_spmv_format(
+        gpu_sparse, shape=shape, nnz=nnz, transpose=transpose,
+        compute_dtype=resolved_compute_dtype, data_dtype=data_dtype,
+        index_dtype=index_dtype, x_dtype=x_dtype)
+
+  kwargs = dict(shape=shape, transpose=transpose, compute_dtype=compute_dtype,
+                compute_type=compute_type, data_dtype=data_dtype,
+                index_dtype=index_dtype, x_dtype=x_dtype)
+  if fmt == "coo":
+    row = _csr2coo_mhlo(platform, gpu_sparse, indptr, nnz=nnz)
+    return _coo_matvec_mhlo(platform, gpu_sparse, data, row, indices, x,
+                            **kwargs)
+  if fmt == "light" and _csr_matvec_light_supported(
+      gpu_sparse, transpose=transpose, compute_dtype=resolved_compute_dtype,
+      data_dtype=data_dtype, index_dtype=index_dtype, x_dtype=x_dtype):
+    return _csr_matvec_light_mhlo(platform, gpu_sparse, data, indices, indptr,
+                                  x, **kwargs)
+  return _csr_matvec_mhlo(platform, gpu_sparse, data, indices, indptr, x,
+                          **kwargs)
+
+cuda_spmv_auto = partial(_spmv_auto_mhlo, "cu", _cusparse)
+
+
+def _densemv_sparse_mhlo(platform, gpu_sparse, mat, x, *, shape,
+                         transpose=False, eps=0.0, data_dtype, x_dtype):
+  """Dense matrix/vector multiply that skips entries with ``|a| <= eps``.
+
+  Computes the same product as ``*_csr_fromdense`` followed by
+  ``*_csr_matvec``, in a single pass over the dense matrix and without
+  materializing the CSR intermediate.
+  """
+  rows, cols = shape
+  out_size = cols if transpose else rows
+  return custom_call(
+      f"{platform}sparse_densemv_sparse",
+      [ir.RankedTensorType.get(
+          [out_size], ir.RankedTensorType(mat.type).element_type)],
+      [mat, x],
+      backend_config=_build_descriptor(
+          gpu_sparse.build_densemv_sparse_descriptor, np.dtype(data_dtype),
+          np.dtype(x_dtype), rows, cols, transpose, float(eps)),
+      operand_layouts=[[1, 0], [0]],
+      result_layouts=[[0]])
+
+cuda_densemv_sparse = partial(_densemv_sparse_mhlo, "cu", _cusparse)
+
+def _densemv_sparse_supported(gpu_sparse, *, compute_dtype, data_dtype,
+                              x_dtype):
+  """Returns whether `_densemv_sparse_mhlo` handles this product."""
+  return (hasattr(gpu_sparse, "build_densemv_sparse_descriptor") and
+          np.dtype(data_dtype) in (np.float32, np.float64) and
+          np.dtype(x_dtype) == np.dtype(data_dtype) and
+          (compute_dtype is None or
+           np.dtype(compute_dtype) == np.dtype(data_dtype)))
+
+def _densemv_of_fromdense(platform, gpu_sparse, data, indices, indptr, x, *,
+                          shape, transpose, compute_dtype, data_dtype,
+                          x_dtype):
+  """Multiplies the dense source of a CSR matrix converted in this module.
+
+  A CSR matrix that ``_csr_fromdense_mhlo`` converted with cuSPARSE holds all
+  nonzeros of its source, so its products can read the source directly, and
+  XLA then drops the conversion if nothing else uses its results. Returns the
+  product, or None if the matrix has no such source or the product is not
+  supported.
+  """
+  mat = _csr_fromdense_source(platform, data, indices, indptr)
+  if mat is None or not _densemv_sparse_supported(
+      gpu_sparse, compute_dtype=compute_dtype, data_dtype=data_dtype,
+      x_dtype=x_dtype):
+    return None
+  return _densemv_sparse_mhlo(platform, gpu_sparse, mat, x, shape=shape,
+                              transpose=transpose, data_dtype=data_dtype,
+                              x_dtype=x_dtype)
+
+
 def _gtsv2_mhlo(platform, gpu_sparse, dl, d, du, B, *, m, n, ldb, t):
   """Calls `cusparse<t>gtsv2(dl, d, du, B, m, n, ldb)`."""
   f32 = (t == np.float32)
   if f32:
-    buffer_size = gpu_sparse.gtsv2_f32_buffer_size(m, n, ldb)
+    buffer_size = _build_descriptor(
+        gpu_sparse.gtsv2_f32_buffer_size, m, n, ldb)
   else:
-    buffer_size = gpu_sparse.gtsv2_f64_buffer_size(m, n, ldb)
-  out = custom_call(
+    buffer_size = _build_descriptor(
+        gpu_sparse.gtsv2_f64_buffer_size, m, n, ldb)
+  out = _workspace_custom_call(
       f"{platform}sparse_gtsv2_" + ("f32" if f32 else "f64"),
-      [
-          ir.RankedTensorType.get(
-              [ldb, n], ir.F32Type.get() if f32 else ir.F64Type.get()),
-          ir.RankedTensorType.get([buffer_size],
-                                  ir.IntegerType.get_signless(8)),
-      ],
+      [ir.RankedTensorType.get(
+          [ldb, n], ir.F32Type.get() if f32 else ir.F64Type.get())],
       [dl, d, du, B],
-      backend_config=gpu_sparse.build_gtsv2_descriptor(m, n, ldb),
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
+      backend_config=_build_descriptor(
+          gpu_sparse.build_gtsv2_descriptor, m, n, ldb, buffer_size,
+          _shared_workspace),
       operand_layouts=[[0]] * 3 + [[1, 0]],
-      result_layouts=[[1, 0], [0]])
+      result_layouts=[[1, 0]])
   return out[0]
 
 cuda_gtsv2 = partial(_gtsv2_mhlo, "cu", _cusparse)
 rocm_gtsv2 = partial(_gtsv2_mhlo, "hip", _hipsparse)
+
+
+def _gtsv2_batched_mhlo(platform, gpu_sparse, dl, d, du, B, *, m, batch_count,
+                        batch_stride, t):
+  """Calls `cusparse<t>gtsv2StridedBatch(m, dl, d, du, B, ...)`.
+
+  Solves `batch_count` independent tridiagonal systems of size `m` with a single
+  kernel launch. All operands have shape `[batch_count, batch_stride]`; row `i`
+  holds system `i` in its first `m` elements.
+  """
+  assert batch_stride >= m
+  f32 = (t == np.float32)
+  if f32:
+    buffer_size = _build_descriptor(
+        gpu_sparse.gtsv2_batched_f32_buffer_size, m, batch_count, batch_stride)
+  else:
+    buffer_size = _build_descriptor(
+        gpu_sparse.gtsv2_batched_f64_buffer_size, m, batch_count, batch_stride)
+  out = _workspace_custom_call(
+      f"{platform}sparse_gtsv2_batched_" + ("f32" if f32 else "f64"),
+      [ir.RankedTensorType.get(
+          [batch_count, batch_stride],
+          ir.F32Type.get() if f32 else ir.F64Type.get())],
+      [dl, d, du, B],
+      buffer_size=buffer_size,
+      external_workspace=_shared_workspace,
+      backend_config=_build_descriptor(
+          gpu_sparse.build_gtsv2_batched_descriptor, m, batch_count,
+          batch_stride, buffer_size, _shared_workspace),
+      operand_layouts=[[1, 0]] * 4,
+      result_layouts=[[1, 0]])
+  return out[0]
+
+cuda_gtsv2_batched = partial(_gtsv2_batched_mhlo, "cu", _cusparse)
+rocm_gtsv2_batched = partial(_gtsv2_batched_mhlo, "hip", _hipsparse)
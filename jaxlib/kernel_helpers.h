@@ -17,6 +17,7 @@ limitations under the License.
 #define JAXLIB_KERNEL_HELPERS_H_
 
 #include <cstddef>
+#include <cstdint>
 #include <stdexcept>
 #include <string>
 
@@ -29,6 +30,28 @@ namespace jax {
 // the functionality that doesn't require pybind11 for building CUDA libraries,
 // since older versions nvcc don't seem to be able to compile pybind11.
 
+// A size in bytes, stored as two 32-bit halves. Descriptors are packed byte
+// for byte, so any padding between their fields would leave unspecified bytes
+// in the packed string; a size_t field after 4-byte fields introduces such
+// padding. Descriptors should instead hold sizes as DescriptorSize, which is
+// 4-byte aligned, and otherwise only 4-byte fields.
+class DescriptorSize {
+ public:
+  DescriptorSize(std::size_t size = 0)  // NOLINT(runtime/explicit)
+      : lo_(static_cast<std::uint32_t>(size)),
+        hi_(static_cast<std::uint32_t>(static_cast<std::uint64_t>(size) >>
+                                       32)) {}
+
+  operator std::size_t() const {  // NOLINT(runtime/explicit)
+    return static_cast<std::size_t>(static_cast<std::uint64_t>(hi_) << 32 |
+                                    lo_);
+  }
+
+ private:
+  std::uint32_t lo_;
+  std::uint32_t hi_;
+};
+
 // Packs a descriptor object into a byte string.
 template <typename T>
 std::string PackDescriptorAsString(const T& descriptor) {
@@ -101,7 +101,7 @@ DenseVecDescriptor BuildDenseVecDescriptor(const py::dtype& data_dtype,
 // Returns the descriptor for a Sparse matrix.
 std::pair<size_t, py::bytes> BuildCsrToDenseDescriptor(
     const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz) {
+    int cols, int nnz, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -130,46 +130,9 @@ std::pair<size_t, py::bytes> BuildCsrToDenseDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_b)));
 
-  return {buffer_size, PackDescriptor(d)};
-}
-
-absl::Status CsrToDense_(hipStream_t stream, void** buffers,
-                         const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
-  JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
-  auto h = SparseHandlePool::Borrow(stream);
-  JAX_RETURN_IF_ERROR(h.status());
-  auto& handle = *h;
-
-  hipsparseSpMatDescr_t mat_a = 0;
-  hipsparseDnMatDescr_t mat_b = 0;
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      hipsparseCreateCsr(&mat_a, d.rows, d.cols, d.nnz,
-                        /*csrRowOffsets=*/buffers[2],
-                        /*csrColInd=*/buffers[1],
-                        /*csrValues=*/buffers[0], d.index_type, d.index_type,
-                        HIPSPARSE_INDEX_BASE_ZERO, d.value_type)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseCreateDnMat(
-      &mat_b, d.rows, d.cols,
-      /*ld=*/d.cols, buffers[3], d.value_type, HIPSPARSE_ORDER_ROW)));
-
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      hipsparseSparseToDense(handle.get(), mat_a, mat_b,
-                            HIPSPARSE_SPARSETODENSE_ALG_DEFAULT, buffers[4])));
-
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_a)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_b)));
-  return absl::OkStatus();
-}
-
-void CsrToDense(hipStream_t stream, void** buffers, const char* opaque,
-                size_t opaque_len, XlaCustomCallStatus* status) {
-  auto s = CsrToDense_(stream, buffers, opaque, opaque_len);
-  if (!s.ok()) {
-    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
-                                  s.message().length());
-  }
+  return {buffer_size,
+          PackDescriptor(SparseConvertDescriptor{
+              d, {buffer_size, external_workspace}})};
 }
 
 // CsrFromDense: Convert dense matrix to CSR matrix
@@ -177,7 +140,7 @@ void CsrToDense(hipStream_t stream, void** buffers, const char* opaque,
 // Returns the descriptor for a CsrFromDense operation.
 std::pair<size_t, py::bytes> BuildCsrFromDenseDescriptor(
     const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz) {
+    int cols, int nnz, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -204,47 +167,9 @@ std::pair<size_t, py::bytes> BuildCsrFromDenseDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_b)));
 
-  return {buffer_size, PackDescriptor(d)};
-}
-
-absl::Status CsrFromDense_(hipStream_t stream, void** buffers,
-                           const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
-  JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
-  auto h = SparseHandlePool::Borrow(stream);
-  JAX_RETURN_IF_ERROR(h.status());
-  auto& handle = *h;
-
-  hipsparseDnMatDescr_t mat_a = 0;
-  hipsparseSpMatDescr_t mat_b = 0;
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseCreateDnMat(
-      &mat_a, d.rows, d.cols,
-      /*ld=*/d.cols, buffers[0], d.value_type, HIPSPARSE_ORDER_ROW)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
-      hipsparseCreateCsr(&mat_b, d.rows, d.cols, d.nnz,
-                        /*csrRowOffsets=*/buffers[3],
-                        /*csrColInd=*/buffers[2],
-                        /*csrValues=*/buffers[1], d.index_type, d.index_type,
-                        HIPSPARSE_INDEX_BASE_ZERO, d.value_type)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDenseToSparse_analysis(
-      handle.get(), mat_a, mat_b, HIPSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDenseToSparse_convert(
-      handle.get(), mat_a, mat_b, HIPSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_a)));
-  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_b)));
-  return absl::OkStatus();
-}
-
-void CsrFromDense(hipStream_t stream, void** buffers, const char* opaque,
-                  size_t opaque_len, XlaCustomCallStatus* status) {
-  auto s = CsrFromDense_(stream, buffers, opaque, opaque_len);
-  if (!s.ok()) {
-    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
-                                  s.message().length());
-  }
+  return {buffer_size,
+          PackDescriptor(SparseConvertDescriptor{
+              d, {buffer_size, external_workspace}})};
 }
 
 // CsrMatvec: Product of CSR matrix and dense vector.
@@ -253,7 +178,7 @@ void CsrFromDense(hipStream_t stream, void** buffers, const char* opaque,
 std::pair<size_t, py::bytes> BuildCsrMatvecDescriptor(
     const py::dtype& data_dtype, const py::dtype& x_dtype,
     const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz, bool transpose) {
+    int cols, int nnz, bool transpose, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -291,16 +216,20 @@ std::pair<size_t, py::bytes> BuildCsrMatvecDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnVec(vec_x)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnVec(vec_y)));
 
-  return {buffer_size, PackDescriptor(CsrMatvecDescriptor{A, x, y, op})};
+  return {buffer_size,
+          PackDescriptor(CsrMatvecDescriptor{
+              A, x, y, op, {buffer_size, external_workspace}})};
 }
 
 // CsrMatmat: Product of CSR matrix and dense matrix.
 
-// Returns the descriptor for a CsrMatmat operation.
+// Returns the descriptor for a CsrMatmat operation. `alg` is the
+// hipsparseSpMMAlg_t with which hipsparseSpMM computes the product.
 std::pair<size_t, py::bytes> BuildCsrMatmatDescriptor(
     const py::dtype& data_dtype, const py::dtype& b_dtype,
     const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int BCcols, int nnz, bool transpose) {
+    int cols, int BCcols, int nnz, bool transpose, int alg,
+    bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -334,13 +263,17 @@ std::pair<size_t, py::bytes> BuildCsrMatmatDescriptor(
   HipConst beta = HipZero(C.type);
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseSpMM_bufferSize(
       handle.get(), op_A, HIPSPARSE_OPERATION_NON_TRANSPOSE, &alpha, mat_a,
-      mat_b, &beta, mat_c, C.type, HIPSPARSE_SPMM_ALG_DEFAULT, &buffer_size)));
+      mat_b, &beta, mat_c, C.type, static_cast<hipsparseSpMMAlg_t>(alg),
+      &buffer_size)));
 
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_b)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_c)));
 
-  return {buffer_size, PackDescriptor(CsrMatmatDescriptor{A, B, C, op_A})};
+  return {buffer_size,
+          PackDescriptor(CsrMatmatDescriptor{
+              A, B, C, op_A, static_cast<hipsparseSpMMAlg_t>(alg),
+              {buffer_size, external_workspace}})};
 }
 
 // CooToDense: Convert COO matrix to dense matrix
@@ -348,7 +281,7 @@ std::pair<size_t, py::bytes> BuildCsrMatmatDescriptor(
 // Returns the descriptor for a CooToDense operation.
 std::pair<size_t, py::bytes> BuildCooToDenseDescriptor(
     const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz) {
+    int cols, int nnz, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -376,7 +309,9 @@ std::pair<size_t, py::bytes> BuildCooToDenseDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_b)));
 
-  return {buffer_size, PackDescriptor(d)};
+  return {buffer_size,
+          PackDescriptor(SparseConvertDescriptor{
+              d, {buffer_size, external_workspace}})};
 }
 
 // CooFromDense: Convert dense matrix to COO matrix
@@ -384,7 +319,7 @@ std::pair<size_t, py::bytes> BuildCooToDenseDescriptor(
 // Returns the descriptor for a CooFromDense operation.
 std::pair<size_t, py::bytes> BuildCooFromDenseDescriptor(
     const py::dtype& data_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz) {
+    int cols, int nnz, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -411,7 +346,9 @@ std::pair<size_t, py::bytes> BuildCooFromDenseDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_a)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_b)));
 
-  return {buffer_size, PackDescriptor(d)};
+  return {buffer_size,
+          PackDescriptor(SparseConvertDescriptor{
+              d, {buffer_size, external_workspace}})};
 }
 
 // CooMatvec: Product of COO matrix and dense vector.
@@ -420,7 +357,7 @@ std::pair<size_t, py::bytes> BuildCooFromDenseDescriptor(
 std::pair<size_t, py::bytes> BuildCooMatvecDescriptor(
     const py::dtype& data_dtype, const py::dtype& x_dtype,
     const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int nnz, bool transpose) {
+    int cols, int nnz, bool transpose, bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -458,7 +395,9 @@ std::pair<size_t, py::bytes> BuildCooMatvecDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnVec(vec_x)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnVec(vec_y)));
 
-  return {buffer_size, PackDescriptor(CooMatvecDescriptor{A, x, y, op})};
+  return {buffer_size,
+          PackDescriptor(CooMatvecDescriptor{
+              A, x, y, op, {buffer_size, external_workspace}})};
 }
 
 // CooMatmat: Product of COO matrix and dense matrix.
@@ -467,7 +406,8 @@ std::pair<size_t, py::bytes> BuildCooMatvecDescriptor(
 std::pair<size_t, py::bytes> BuildCooMatmatDescriptor(
     const py::dtype& data_dtype, const py::dtype& b_dtype,
     const py::dtype& compute_dtype, const py::dtype& index_dtype, int rows,
-    int cols, int BCcols, int nnz, bool transpose) {
+    int cols, int BCcols, int nnz, bool transpose,
+    bool external_workspace) {
   auto h = SparseHandlePool::Borrow();
   JAX_THROW_IF_ERROR(h.status());
   auto& handle = *h;
@@ -507,12 +447,16 @@ std::pair<size_t, py::bytes> BuildCooMatmatDescriptor(
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_b)));
   JAX_THROW_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_c)));
 
-  return {buffer_size, PackDescriptor(CooMatmatDescriptor{A, B, C, op_A})};
+  return {buffer_size,
+          PackDescriptor(CooMatmatDescriptor{
+              A, B, C, op_A, {buffer_size, external_workspace}})};
 }
 
 
-py::bytes BuildGtsv2Descriptor(int m, int n, int ldb) {
-  return PackDescriptor(Gtsv2Descriptor{m, n, ldb});
+py::bytes BuildGtsv2Descriptor(int m, int n, int ldb, size_t buffer_size,
+                               bool external_workspace) {
+  return PackDescriptor(
+      Gtsv2Descriptor{m, n, ldb, {buffer_size, external_workspace}});
 }
 
 template <typename F>
@@ -535,6 +479,35 @@ size_t Gtsv2BufferSizeF64(int m, int n, int ldb) {
   return Gtsv2BufferSize(hipsparseDgtsv2_bufferSizeExt, m, n, ldb);
 }
 
+py::bytes BuildGtsv2BatchedDescriptor(int m, int batch_count, int batch_stride,
+                                      size_t buffer_size,
+                                      bool external_workspace) {
+  return PackDescriptor(Gtsv2BatchedDescriptor{
+      m, batch_count, batch_stride, {buffer_size, external_workspace}});
+}
+
+template <typename F>
+size_t Gtsv2BatchedBufferSize(F f, int m, int batch_count, int batch_stride) {
+  auto h = SparseHandlePool::Borrow();
+  JAX_THROW_IF_ERROR(h.status());
+  auto& handle = *h;
+  size_t size;
+  JAX_THROW_IF_ERROR(JAX_AS_STATUS(
+      f(handle.get(), m, /*dl=*/nullptr, /*d=*/nullptr, /*du=*/nullptr,
+        /*x=*/nullptr, batch_count, batch_stride, &size)));
+  return size;
+}
+
+size_t Gtsv2BatchedBufferSizeF32(int m, int batch_count, int batch_stride) {
+  return Gtsv2BatchedBufferSize(hipsparseSgtsv2StridedBatch_bufferSizeExt, m,
+                                batch_count, batch_stride);
+}
+
+size_t Gtsv2BatchedBufferSizeF64(int m, int batch_count, int batch_stride) {
+  return Gtsv2BatchedBufferSize(hipsparseDgtsv2StridedBatch_bufferSizeExt, m,
+                                batch_count, batch_stride);
+}
+
 py::dict Registrations() {
   py::dict dict;
   dict["hipsparse_csr_todense"] = EncapsulateFunction(CsrToDense);
@@ -547,6 +520,8 @@ py::dict Registrations() {
   dict["hipsparse_coo_matmat"] = EncapsulateFunction(CooMatmat);
   dict["hipsparse_gtsv2_f32"] = EncapsulateFunction(gtsv2_f32);
   dict["hipsparse_gtsv2_f64"] = EncapsulateFunction(gtsv2_f64);
+  dict["hipsparse_gtsv2_batched_f32"] = EncapsulateFunction(gtsv2_batched_f32);
+  dict["hipsparse_gtsv2_batched_f64"] = EncapsulateFunction(gtsv2_batched_f64);
   // TODO(tomhennigan): Add support for gtsv2 complex 32/64.
   return dict;
 }
@@ -565,6 +540,9 @@ PYBIND11_MODULE(_hipsparse, m) {
   m.def("gtsv2_f32_buffer_size", &Gtsv2BufferSizeF32);
   m.def("gtsv2_f64_buffer_size", &Gtsv2BufferSizeF64);
   m.def("build_gtsv2_descriptor", &BuildGtsv2Descriptor);
+  m.def("gtsv2_batched_f32_buffer_size", &Gtsv2BatchedBufferSizeF32);
+  m.def("gtsv2_batched_f64_buffer_size", &Gtsv2BatchedBufferSizeF64);
+  m.def("build_gtsv2_batched_descriptor", &BuildGtsv2BatchedDescriptor);
 }
 
 }  // namespace
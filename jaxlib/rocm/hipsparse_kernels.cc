@@ -17,10 +17,12 @@ limitations under the License.
 
 #include <algorithm>
 #include <cstdint>
+#include <memory>
 #include <stdexcept>
 #include <utility>
 #include <vector>
 
+#include "absl/container/flat_hash_map.h"
 #include "absl/status/status.h"
 #include "absl/status/statusor.h"
 #include "absl/synchronization/mutex.h"
@@ -39,14 +41,17 @@ SparseHandlePool::Borrow(hipStream_t stream) {
   SparseHandlePool* pool = Instance();
   absl::MutexLock lock(&pool->mu_);
   hipsparseHandle_t handle;
-  if (pool->handles_[stream].empty()) {
+  std::vector<hipsparseHandle_t>& handles = pool->handles_[stream];
+  if (handles.empty()) {
     JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseCreate(&handle)));
+    if (stream) {
+      JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseSetStream(handle, stream)));
+    }
   } else {
-    handle = pool->handles_[stream].back();
-    pool->handles_[stream].pop_back();
-  }
-  if (stream) {
-    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseSetStream(handle, stream)));
+    // Handles are returned to the pool of the stream they were borrowed for,
+    // so they are already bound to `stream`.
+    handle = handles.back();
+    handles.pop_back();
   }
   return Handle(pool, handle, stream);
 }
@@ -79,14 +84,104 @@ HipConst HipOne(hipDataType type) {
   return c;
 }
 
+// Scratch space of a sparse operation. If it is the workspace shared by the
+// operations on a stream, it holds the lock of that workspace until it is
+// destroyed, after the operation has enqueued its work, so that no other
+// operation can replace the buffer in the meantime.
+class ScratchSpace {
+ public:
+  explicit ScratchSpace(void* ptr, absl::Mutex* mu = nullptr)
+      : ptr_(ptr), mu_(mu) {}
+  ScratchSpace(ScratchSpace&& other)
+      : ptr_(other.ptr_), mu_(std::exchange(other.mu_, nullptr)) {}
+  ScratchSpace& operator=(ScratchSpace&&) = delete;
+  ~ScratchSpace() {
+    if (mu_) {
+      mu_->Unlock();
+    }
+  }
+
+  void* get() const { return ptr_; }
+
+ private:
+  void* ptr_;
+  absl::Mutex* mu_;
+};
+
+// Returns scratch space of at least `size` bytes shared by all sparse
+// operations on `stream`. Operations on a stream execute in order, so they can
+// reuse one allocation; it only ever grows. The buffer is replaced with
+// stream-ordered frees and allocations, which wait for the work already
+// enqueued on `stream` without blocking the host.
+static absl::StatusOr<ScratchSpace> SharedWorkspace(hipStream_t stream,
+                                                    size_t size) {
+  struct Shared {
+    absl::Mutex mu;
+    void* ptr = nullptr;
+    size_t size = 0;
+  };
+  static absl::Mutex mu(absl::kConstInit);
+  static auto* workspaces =
+      new absl::flat_hash_map<hipStream_t, std::unique_ptr<Shared>>();
+  Shared* workspace;
+  {
+    absl::MutexLock lock(&mu);
+    std::unique_ptr<Shared>& entry = (*workspaces)[stream];
+    if (!entry) {
+      entry = std::make_unique<Shared>();
+    }
+    workspace = entry.get();
+  }
+  workspace->mu.Lock();
+  auto grow = [&]() {
+    if (workspace->size >= size) {
+      return absl::OkStatus();
+    }
+    if (workspace->ptr) {
+      JAX_RETURN_IF_ERROR(
+          JAX_AS_STATUS(hipFreeAsync(workspace->ptr, stream)));
+      workspace->ptr = nullptr;
+      workspace->size = 0;
+    }
+    JAX_RETURN_IF_ERROR(
+        JAX_AS_STATUS(hipMallocAsync(&workspace->ptr, size, stream)));
+    workspace->size = size;
+    return absl::OkStatus();
+  };
+  absl::Status s = grow();
+  if (!s.ok()) {
+    workspace->mu.Unlock();
+    return s;
+  }
+  return ScratchSpace(workspace->ptr, &workspace->mu);
+}
+
+// Returns the scratch space of an operation whose XLA-allocated workspace, if
+// any, is buffers[index]. Operations that need no scratch space have no
+// workspace buffer, and get a null pointer.
+static absl::StatusOr<ScratchSpace> Workspace(hipStream_t stream,
+                                              const WorkspaceDescriptor& d,
+                                              void** buffers, int index) {
+  const size_t size = d.size;
+  if (d.external) {
+    return SharedWorkspace(stream, size);
+  }
+  if (size == 0) {
+    return ScratchSpace(nullptr);
+  }
+  return ScratchSpace(buffers[index]);
+}
+
 static absl::Status CsrToDense_(hipStream_t stream, void** buffers,
                                 const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
+  auto s = UnpackDescriptor<SparseConvertDescriptor>(opaque, opaque_len);
   JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
+  const SparseMatDescriptor& d = (**s).A;
   auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
+  auto buf = Workspace(stream, (**s).workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(buf.status());
 
   hipsparseSpMatDescr_t mat_a = 0;
   hipsparseDnMatDescr_t mat_b = 0;
@@ -102,7 +197,7 @@ static absl::Status CsrToDense_(hipStream_t stream, void** buffers,
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
       hipsparseSparseToDense(handle.get(), mat_a, mat_b,
-                             HIPSPARSE_SPARSETODENSE_ALG_DEFAULT, buffers[4])));
+                             HIPSPARSE_SPARSETODENSE_ALG_DEFAULT, buf->get())));
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_b)));
@@ -122,12 +217,14 @@ void CsrToDense(hipStream_t stream, void** buffers, const char* opaque,
 
 static absl::Status CsrFromDense_(hipStream_t stream, void** buffers,
                                   const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
+  auto s = UnpackDescriptor<SparseConvertDescriptor>(opaque, opaque_len);
   JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
+  const SparseMatDescriptor& d = (**s).A;
   auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
+  auto buf = Workspace(stream, (**s).workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(buf.status());
 
   hipsparseDnMatDescr_t mat_a = 0;
   hipsparseSpMatDescr_t mat_b = 0;
@@ -142,10 +239,10 @@ static absl::Status CsrFromDense_(hipStream_t stream, void** buffers,
                          HIPSPARSE_INDEX_BASE_ZERO, d.value_type)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDenseToSparse_analysis(
       handle.get(), mat_a, mat_b, HIPSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
+      buf->get())));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDenseToSparse_convert(
       handle.get(), mat_a, mat_b, HIPSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
+      buf->get())));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_b)));
   return absl::OkStatus();
@@ -176,7 +273,9 @@ static absl::Status CsrMatvec_(hipStream_t stream, void** buffers,
   void* csr_row_offsets = buffers[2];
   void* xbuf = buffers[3];
   void* ybuf = buffers[4];
-  void* buf = buffers[5];
+  auto ws = Workspace(stream, d.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
 
   // TODO(rocm): check the following statement for rocm
   // TODO(jakevdp): alpha and beta should be user-specifiable, but constants
@@ -234,7 +333,9 @@ static absl::Status CsrMatmat_(hipStream_t stream, void** buffers,
   void* csr_row_offsets = buffers[2];
   void* Bbuf = buffers[3];
   void* Cbuf = buffers[4];
-  void* buf = buffers[5];
+  auto ws = Workspace(stream, d.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
 
   // TODO(jakevdp): alpha and beta should be user-specifiable, but constants
   // are sufficient for basic matvec operations.
@@ -259,7 +360,7 @@ static absl::Status CsrMatmat_(hipStream_t stream, void** buffers,
       /*ld=*/d.C.cols, Cbuf, d.C.type, HIPSPARSE_ORDER_ROW)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseSpMM(
       handle.get(), d.op_A, /*opB=*/HIPSPARSE_OPERATION_NON_TRANSPOSE, &alpha,
-      mat_a, mat_b, &beta, mat_c, d.C.type, HIPSPARSE_SPMM_ALG_DEFAULT, buf)));
+      mat_a, mat_b, &beta, mat_c, d.C.type, d.alg, buf)));
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_b)));
@@ -280,12 +381,14 @@ void CsrMatmat(hipStream_t stream, void** buffers, const char* opaque,
 
 static absl::Status CooToDense_(hipStream_t stream, void** buffers,
                                 const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
+  auto s = UnpackDescriptor<SparseConvertDescriptor>(opaque, opaque_len);
   JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
+  const SparseMatDescriptor& d = (**s).A;
   auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
+  auto buf = Workspace(stream, (**s).workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(buf.status());
 
   hipsparseSpMatDescr_t mat_a = 0;
   hipsparseDnMatDescr_t mat_b = 0;
@@ -301,7 +404,7 @@ static absl::Status CooToDense_(hipStream_t stream, void** buffers,
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
       hipsparseSparseToDense(handle.get(), mat_a, mat_b,
-                             HIPSPARSE_SPARSETODENSE_ALG_DEFAULT, buffers[4])));
+                             HIPSPARSE_SPARSETODENSE_ALG_DEFAULT, buf->get())));
 
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_b)));
@@ -321,12 +424,14 @@ void CooToDense(hipStream_t stream, void** buffers, const char* opaque,
 
 static absl::Status CooFromDense_(hipStream_t stream, void** buffers,
                                   const char* opaque, size_t opaque_len) {
-  auto s = UnpackDescriptor<SparseMatDescriptor>(opaque, opaque_len);
+  auto s = UnpackDescriptor<SparseConvertDescriptor>(opaque, opaque_len);
   JAX_RETURN_IF_ERROR(s.status());
-  const SparseMatDescriptor& d = **s;
+  const SparseMatDescriptor& d = (**s).A;
   auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
+  auto buf = Workspace(stream, (**s).workspace, buffers, 4);
+  JAX_RETURN_IF_ERROR(buf.status());
 
   hipsparseDnMatDescr_t mat_a = 0;
   hipsparseSpMatDescr_t mat_b = 0;
@@ -341,10 +446,10 @@ static absl::Status CooFromDense_(hipStream_t stream, void** buffers,
                          HIPSPARSE_INDEX_BASE_ZERO, d.value_type)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDenseToSparse_analysis(
       handle.get(), mat_a, mat_b, HIPSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
+      buf->get())));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDenseToSparse_convert(
       handle.get(), mat_a, mat_b, HIPSPARSE_DENSETOSPARSE_ALG_DEFAULT,
-      buffers[4])));
+      buf->get())));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroyDnMat(mat_a)));
   JAX_RETURN_IF_ERROR(JAX_AS_STATUS(hipsparseDestroySpMat(mat_b)));
   return absl::OkStatus();
@@ -375,7 +480,9 @@ static absl::Status CooMatvec_(hipStream_t stream, void** buffers,
   void* coo_col_ind = buffers[2];
   void* xbuf = buffers[3];
   void* ybuf = buffers[4];
-  void* buf = buffers[5];
+  auto ws = Workspace(stream, d.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
 
   // TODO(rocm): check the following statement for rocm
   // TODO(jakevdp): alpha and beta should be user-specifiable, but constants
@@ -432,7 +539,9 @@ static absl::Status CooMatmat_(hipStream_t stream, void** buffers,
   void* coo_col_ind = buffers[2];
   void* Bbuf = buffers[3];
   void* Cbuf = buffers[4];
-  void* buf = buffers[5];
+  auto ws = Workspace(stream, d.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buf = ws->get();
 
   // TODO(rocm): check the following statement for rocm
   // TODO(jakevdp): alpha and beta should be user-specifiable, but constants
@@ -477,7 +586,7 @@ void CooMatmat(hipStream_t stream, void** buffers, const char* opaque,
 template <typename T, typename F>
 static absl::Status gtsv2(F computeGtsv2, hipStream_t stream, void** buffers,
                           const char* opaque, std::size_t opaque_len) {
-  auto h = SparseHandlePool::Borrow();
+  auto h = SparseHandlePool::Borrow(stream);
   JAX_RETURN_IF_ERROR(h.status());
   auto& handle = *h;
 
@@ -493,7 +602,9 @@ static absl::Status gtsv2(F computeGtsv2, hipStream_t stream, void** buffers,
   const T* du = (const T*)(buffers[2]);
   const T* B = (T*)(buffers[3]);
   T* X = (T*)(buffers[4]);
-  void* buffer = buffers[5];
+  auto ws = Workspace(stream, descriptor.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buffer = ws->get();
 
   // The solution X is written in place to B. We need to therefore copy the
   // contents of B into the output buffer X and pass that into the kernel as B.
@@ -530,4 +641,58 @@ void gtsv2_f64(hipStream_t stream, void** buffers, const char* opaque,
   }
 }
 
+template <typename T, typename F>
+static absl::Status gtsv2_batched(F computeGtsv2StridedBatch,
+                                  hipStream_t stream, void** buffers,
+                                  const char* opaque, std::size_t opaque_len) {
+  auto s = UnpackDescriptor<Gtsv2BatchedDescriptor>(opaque, opaque_len);
+  JAX_RETURN_IF_ERROR(s.status());
+  const Gtsv2BatchedDescriptor& descriptor = **s;
+  auto h = SparseHandlePool::Borrow(stream);
+  JAX_RETURN_IF_ERROR(h.status());
+  auto& handle = *h;
+
+  const T* dl = (const T*)(buffers[0]);
+  const T* d = (const T*)(buffers[1]);
+  const T* du = (const T*)(buffers[2]);
+  const T* B = (T*)(buffers[3]);
+  T* X = (T*)(buffers[4]);
+  auto ws = Workspace(stream, descriptor.workspace, buffers, 5);
+  JAX_RETURN_IF_ERROR(ws.status());
+  void* buffer = ws->get();
+
+  // As in gtsv2, the solution is written in place to the right-hand sides.
+  if (X != B) {
+    size_t B_bytes = static_cast<size_t>(descriptor.batch_count) *
+                     descriptor.batch_stride * sizeof(T);
+    JAX_RETURN_IF_ERROR(JAX_AS_STATUS(
+        hipMemcpyAsync(X, B, B_bytes, hipMemcpyDeviceToDevice, stream)));
+  }
+
+  JAX_RETURN_IF_ERROR(JAX_AS_STATUS(computeGtsv2StridedBatch(
+      handle.get(), descriptor.m, dl, d, du, /*x=*/X, descriptor.batch_count,
+      descriptor.batch_stride, buffer)));
+  return absl::OkStatus();
+}
+
+void gtsv2_batched_f32(hipStream_t stream, void** buffers, const char* opaque,
+                       std::size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = gtsv2_batched<float>(hipsparseSgtsv2StridedBatch, stream, buffers,
+                                opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+
+void gtsv2_batched_f64(hipStream_t stream, void** buffers, const char* opaque,
+                       std::size_t opaque_len, XlaCustomCallStatus* status) {
+  auto s = gtsv2_batched<double>(hipsparseDgtsv2StridedBatch, stream, buffers,
+                                 opaque, opaque_len);
+  if (!s.ok()) {
+    XlaCustomCallStatusSetFailure(status, std::string(s.message()).c_str(),
+                                  s.message().length());
+  }
+}
+
 }  // namespace jax
@@ -24,6 +24,7 @@ limitations under the License.
 
 #include "absl/status/statusor.h"
 #include "jaxlib/handle_pool.h"
+#include "jaxlib/kernel_helpers.h"
 #include "rocm/include/hip/hip_runtime_api.h"
 #include "rocm/include/hipsparse.h"
 #include "tensorflow/compiler/xla/service/custom_call_status.h"
@@ -71,6 +72,21 @@ struct DenseVecDescriptor {
   int size;
 };
 
+// Scratch space of an operation. Unless `external` is set, XLA allocates it as
+// the last result of the custom call; otherwise a buffer of `size` bytes shared
+// by all sparse operations on the stream is used.
+struct WorkspaceDescriptor {
+  DescriptorSize size;
+  std::int32_t external;
+};
+
+// Descriptor of conversions between sparse and dense matrices.
+
+struct SparseConvertDescriptor {
+  SparseMatDescriptor A;
+  WorkspaceDescriptor workspace;
+};
+
 // CsrToDense: Convert CSR matrix to dense matrix
 
 void CsrToDense(hipStream_t stream, void** buffers, const char* opaque,
@@ -87,6 +103,7 @@ struct CsrMatvecDescriptor {
   SparseMatDescriptor A;
   DenseVecDescriptor x, y;
   hipsparseOperation_t op;
+  WorkspaceDescriptor workspace;
 };
 
 void CsrMatvec(hipStream_t stream, void** buffers, const char* opaque,
@@ -98,6 +115,8 @@ struct CsrMatmatDescriptor {
   SparseMatDescriptor A;
   DenseMatDescriptor B, C;
   hipsparseOperation_t op_A;
+  hipsparseSpMMAlg_t alg;
+  WorkspaceDescriptor workspace;
 };
 
 void CsrMatmat(hipStream_t stream, void** buffers, const char* opaque,
@@ -119,6 +138,7 @@ struct CooMatvecDescriptor {
   SparseMatDescriptor A;
   DenseVecDescriptor x, y;
   hipsparseOperation_t op;
+  WorkspaceDescriptor workspace;
 };
 
 void CooMatvec(hipStream_t stream, void** buffers, const char* opaque,
@@ -130,6 +150,7 @@ struct CooMatmatDescriptor {
   SparseMatDescriptor A;
   DenseMatDescriptor B, C;
   hipsparseOperation_t op_A;
+  WorkspaceDescriptor workspace;
 };
 
 void CooMatmat(hipStream_t stream, void** buffers, const char* opaque,
@@ -137,6 +158,7 @@ void CooMatmat(hipStream_t stream, void** buffers, const char* opaque,
 
 struct Gtsv2Descriptor {
   int m, n, ldb;
+  WorkspaceDescriptor workspace;
 };
 
 void gtsv2_f32(hipStream_t stream, void** buffers, const char* opaque,
@@ -145,6 +167,20 @@ void gtsv2_f32(hipStream_t stream, void** buffers, const char* opaque,
 void gtsv2_f64(hipStream_t stream, void** buffers, const char* opaque,
                std::size_t opaque_len, XlaCustomCallStatus* status);
 
+// gtsv2_batched: Solves a batch of tridiagonal systems with one right-hand side
+// each. The operands of system i start at element i * batch_stride.
+
+struct Gtsv2BatchedDescriptor {
+  int m, batch_count, batch_stride;
+  WorkspaceDescriptor workspace;
+};
+
+void gtsv2_batched_f32(hipStream_t stream, void** buffers, const char* opaque,
+                       std::size_t opaque_len, XlaCustomCallStatus* status);
+
+void gtsv2_batched_f64(hipStream_t stream, void** buffers, const char* opaque,
+                       std::size_t opaque_len, XlaCustomCallStatus* status);
+
 }  // namespace jax
 
 #endif  // JAXLIB_HIPSPARSE_KERNELS_H_
@@ -30,6 +30,8 @@ from jax import lax
 from jax import numpy as jnp
 from jax import scipy as jsp
 from jax._src import test_util as jtu
+from jax._src.lib import gpu_sparse
+from jax.interpreters import mlir
 
 from jax.config import config
 config.parse_flags_with_absl()
@@ -1685,6 +1687,41 @@ class LaxLinalgTest(jtu.JaxTestCase):
     A[[0, 1], [1, 2]] = du[:-1]
     np.testing.assert_allclose(A @ X, B, rtol=1e-6, atol=1e-6)
 
+  @parameterized.parameters(np.float32, np.float64)
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_tridiagonal_solve_batched(self, dtype):
+    dtype = jax.dtypes.canonicalize_dtype(dtype)
+    m, batch_count, batch_stride = 5, 3, 8
+    rng = np.random.RandomState(0)
+    dl = rng.randn(batch_count, batch_stride).astype(dtype)
+    d = (4 + rng.rand(batch_count, batch_stride)).astype(dtype)
+    du = rng.randn(batch_count, batch_stride).astype(dtype)
+    B = rng.randn(batch_count, batch_stride).astype(dtype)
+    dl[:, 0] = 0
+    du[:, m - 1] = 0
+
+    # Lowers tridiagonal_solve_p(m=m, n=batch_count, ldb=batch_stride) to the
+    # strided batched solver.
+    def rule(ctx, dl, d, du, b, *, m, n, ldb, t):
+      return [gpu_sparse.cuda_gtsv2_batched(dl, d, du, b, m=m, batch_count=n,
+                                            batch_stride=ldb, t=t)]
+    lowerings = mlir._platform_specific_lowerings["cuda"]
+    prev = lowerings[lax.linalg.tridiagonal_solve_p]
+    mlir.register_lowering(lax.linalg.tridiagonal_solve_p, rule,
+                           platform="cuda")
+    try:
+      solve = jit(partial(lax.linalg.tridiagonal_solve_p.bind, m=m,
+                          n=batch_count, ldb=batch_stride, t=dtype))
+      X = np.asarray(solve(dl, d, du, B))
+    finally:
+      lowerings[lax.linalg.tridiagonal_solve_p] = prev
+
+    for i in range(batch_count):
+      A = np.diag(d[i, :m]) + np.diag(dl[i, 1:m], -1) + np.diag(du[i, :m - 1], 1)
+      np.testing.assert_allclose(A @ X[i, :m], B[i, :m], rtol=1e-5, atol=1e-5)
+
   @parameterized.named_parameters(
         jtu.cases_from_list({
             "testcase_name":
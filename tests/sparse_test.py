@@ -17,6 +17,7 @@ from functools import partial
 import itertools
 import operator
 import random
+import re
 import unittest
 from typing import NamedTuple, Tuple
 import warnings
@@ -30,12 +31,15 @@ from jax import config
 from jax import dtypes
 from jax.experimental import sparse
 from jax.experimental.sparse import coo as sparse_coo
+from jax.experimental.sparse import csr as sparse_csr
 from jax.experimental.sparse import bcoo as sparse_bcoo
 from jax.experimental.sparse.bcoo import BCOOInfo
 from jax import lax
 from jax._src.lib import gpu_sparse
 from jax._src.lib import sparse_apis
 from jax._src.lib import xla_bridge
+from jax._src.lib.mlir import ir
+from jax._src.lib.mlir.dialects import mhlo
 from jax import jit
 from jax import tree_util
 from jax import vmap
@@ -144,12 +148,13 @@ class cuSparseTest(jtu.JaxTestCase):
     self.assertEmpty(caught_warnings)
 
   @parameterized.named_parameters(jtu.cases_from_list(
-      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}",
-       "shape": shape, "dtype": dtype}
-      for shape in [(5, 8), (8, 5), (5, 5), (8, 8)]
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_nse={nse}",
+       "shape": shape, "dtype": dtype, "nse": nse}
+      for shape in [(5, 8), (8, 5), (5, 5), (8, 8), (0, 5), (5, 0)]
+      for nse in [0.5, 0]
       for dtype in all_dtypes))
-  def test_csr_todense(self, shape, dtype):
-    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+  def test_csr_todense(self, shape, dtype, nse):
+    rng = rand_sparse(self.rng(), nse=nse, post=scipy.sparse.csr_matrix)
     M = rng(shape, dtype)
 
     args = (M.data, M.indices, M.indptr)
@@ -159,6 +164,30 @@ class cuSparseTest(jtu.JaxTestCase):
     with self.gpu_dense_conversion_warning_context(dtype):
       self.assertArraysEqual(M.toarray(), jit(todense)(*args))
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}",
+       "shape": shape, "dtype": dtype}
+      for shape in [(5, 8), (8, 5), (8, 8)]
+      for dtype in [np.float32, np.float64]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_todense_without_workspace(self, shape, dtype):
+    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+    M = rng(shape, dtype)
+    buffer_size, _ = gpu_sparse._cusparse.build_csr_todense_descriptor(
+        np.dtype(dtype), np.dtype(np.int32), *shape, M.nnz, False)
+    if buffer_size > 0:
+      self.skipTest("cuSPARSE needs scratch space for this conversion")
+
+    args = (M.data, M.indices.astype(np.int32), M.indptr.astype(np.int32))
+    todense = jit(partial(sparse.csr_todense, shape=shape))
+    module = str(todense.lower(*args).compiler_ir(dialect="mhlo"))
+    self.assertIn("cusparse_csr_todense", module)
+    # The custom call has no i8 workspace result.
+    self.assertNotIn("xi8>", module)
+    self.assertArraysEqual(M.toarray(), todense(*args))
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}",
        "shape": shape, "dtype": dtype}
@@ -267,12 +296,13 @@ class cuSparseTest(jtu.JaxTestCase):
     self.assertAllClose(out_dense, out_sparse, atol=tol, rtol=tol)
 
   @parameterized.named_parameters(jtu.cases_from_list(
-      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}",
-       "shape": shape, "dtype": dtype}
-      for shape in [(5, 8), (8, 5), (5, 5), (8, 8)]
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_nse={nse}",
+       "shape": shape, "dtype": dtype, "nse": nse}
+      for shape in [(5, 8), (8, 5), (5, 5), (8, 8), (0, 5), (5, 0)]
+      for nse in [0.5, 0]
       for dtype in all_dtypes))
-  def test_csr_fromdense(self, shape, dtype):
-    rng = rand_sparse(self.rng())
+  def test_csr_fromdense(self, shape, dtype, nse):
+    rng = rand_sparse(self.rng(), nse=nse)
     M = rng(shape, dtype)
     M_csr = scipy.sparse.csr_matrix(M)
 
@@ -292,17 +322,73 @@ class cuSparseTest(jtu.JaxTestCase):
     self.assertArraysEqual(indptr, M_csr.indptr.astype(index_dtype))
 
   @parameterized.named_parameters(jtu.cases_from_list(
-      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_T={transpose}",
-       "shape": shape, "dtype": dtype, "transpose": transpose}
-      for shape in [(5, 8), (8, 5), (5, 5), (8, 8)]
+      {"testcase_name": "_{}_{}_nse_offset={}".format(
+          jtu.format_shape_dtype_string(shape, dtype),
+          np.dtype(index_dtype).name, nse_offset),
+       "shape": shape, "dtype": dtype, "index_dtype": index_dtype,
+       "nse_offset": nse_offset}
+      for shape in [(5, 8), (8, 5), (40, 70), (0, 5)]
+      for dtype in [np.float32, np.float64]
+      for index_dtype in [np.int32, np.int64]
+      for nse_offset in [0, -3, 2]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_fromdense_fast(self, shape, dtype, index_dtype, nse_offset):
+    if not hasattr(gpu_sparse._cusparse, "build_csr_fromdense_fast_descriptor"):
+      self.skipTest("test requires the fused fromdense kernels")
+    if dtypes.canonicalize_dtype(index_dtype) != index_dtype:
+      self.skipTest("test requires x64")
+    if dtypes.canonicalize_dtype(dtype) != dtype:
+      self.skipTest("test requires x64")
+    rng = rand_sparse(self.rng())
+    M = rng(shape, dtype)
+    M_csr = scipy.sparse.csr_matrix(M)
+    nse = max(0, M_csr.nnz + nse_offset)
+    fromdense = partial(sparse.csr_fromdense, nse=nse, index_dtype=index_dtype)
+
+    # With nse below the number of nonzeros, the first nse are kept and the
+    # rows past them end at nse; with nse above it, the rest is zero padding.
+    pad = max(0, nse - M_csr.nnz)
+    expected_data = np.concatenate([M_csr.data[:nse], np.zeros(pad, dtype)])
+    expected_indices = np.concatenate(
+        [M_csr.indices[:nse], np.zeros(pad, M_csr.indices.dtype)])
+    expected_indptr = np.minimum(M_csr.indptr, nse)
+
+    rule = partial(sparse_csr._csr_fromdense_gpu_lowering,
+                   partial(gpu_sparse.cuda_csr_fromdense, use_fast=True))
+    with self.cuda_lowering(sparse_csr.csr_fromdense_p, rule):
+      # A new function, so that jit does not reuse an earlier lowering.
+      fast_fromdense = jit(lambda M: fromdense(M))
+      module = str(fast_fromdense.lower(M).compiler_ir(dialect="mhlo"))
+      self.assertIn("cusparse_csr_fromdense_fast", module)
+      data, indices, indptr = fast_fromdense(M)
+    self.assertArraysEqual(data, expected_data.astype(dtype))
+    self.assertArraysEqual(indices, expected_indices.astype(index_dtype))
+    self.assertArraysEqual(indptr, expected_indptr.astype(index_dtype))
+
+    # cuSPARSE writes every nonzero and leaves the padding unspecified, so it
+    # is only compared when the nonzeros fit, and only on them.
+    if nse >= M_csr.nnz:
+      nnz = M_csr.nnz
+      cusparse_data, cusparse_indices, cusparse_indptr = jit(fromdense)(M)
+      self.assertArraysEqual(data[:nnz], cusparse_data[:nnz])
+      self.assertArraysEqual(indices[:nnz], cusparse_indices[:nnz])
+      self.assertArraysEqual(indptr, cusparse_indptr)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_nse={nse}_T={transpose}",
+       "shape": shape, "dtype": dtype, "nse": nse, "transpose": transpose}
+      for shape in [(5, 8), (8, 5), (5, 5), (8, 8), (0, 5), (5, 0)]
+      for nse in [0.5, 0]
       for dtype in all_dtypes
       for transpose in [True, False]))
   @jtu.skip_on_devices("rocm")  # will be fixed in rocm-5.1
-  def test_csr_matvec(self, shape, dtype, transpose):
+  def test_csr_matvec(self, shape, dtype, nse, transpose):
     op = lambda M: M.T if transpose else M
 
     v_rng = jtu.rand_default(self.rng())
-    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+    rng = rand_sparse(self.rng(), nse=nse, post=scipy.sparse.csr_matrix)
     M = rng(shape, dtype)
     v = v_rng(op(M).shape[1], dtype)
 
@@ -314,33 +400,640 @@ class cuSparseTest(jtu.JaxTestCase):
       self.assertAllClose(op(M) @ v, jit(matvec)(*args), rtol=MATMUL_TOL)
 
   @parameterized.named_parameters(jtu.cases_from_list(
-      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_T={transpose}",
+      {"testcase_name": "_{}_T={}_eps={}".format(
+          jtu.format_shape_dtype_string(shape, dtype), transpose, eps),
+       "shape": shape, "dtype": dtype, "transpose": transpose, "eps": eps}
+      for shape in [(5, 8), (8, 5), (40, 300), (300, 40), (0, 5), (5, 0)]
+      for dtype in [np.float32, np.float64]
+      for transpose in [True, False]
+      for eps in [0.0, 0.5]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_densemv_sparse(self, shape, dtype, transpose, eps):
+    if not hasattr(gpu_sparse._cusparse, "build_densemv_sparse_descriptor"):
+      self.skipTest("test requires the dense matvec kernels")
+    if dtypes.canonicalize_dtype(dtype) != dtype:
+      self.skipTest("test requires x64")
+    op = lambda M: M.T if transpose else M
+    M = rand_sparse(self.rng())(shape, dtype)
+    v = jtu.rand_default(self.rng())(op(M).shape[1], dtype)
+    expected = op(np.where(np.abs(M) <= eps, 0, M)) @ v
+
+    densemv_p = jax.core.Primitive("densemv_sparse")
+    densemv_p.def_abstract_eval(
+        lambda M, v: jax.core.ShapedArray(
+            (shape[1] if transpose else shape[0],), M.dtype))
+
+    def densemv_lowering(ctx, M, v):
+      return [gpu_sparse.cuda_densemv_sparse(
+          M, v, shape=shape, transpose=transpose, eps=eps,
+          data_dtype=np.dtype(dtype), x_dtype=np.dtype(dtype))]
+    mlir.register_lowering(densemv_p, densemv_lowering, platform="cuda")
+
+    out = jit(densemv_p.bind)(M, v)
+    self.assertAllClose(expected, out, rtol=MATMUL_TOL)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_T={}".format(
+          jtu.format_shape_dtype_string(shape, dtype), transpose),
        "shape": shape, "dtype": dtype, "transpose": transpose}
-      for shape in [(5, 8), (8, 5), (5, 5), (8, 8)]
+      for shape in [(5, 8), (8, 5), (40, 300)]
+      for dtype in [np.float32, np.float64]
+      for transpose in [True, False]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_fromdense_matvec(self, shape, dtype, transpose):
+    if not hasattr(gpu_sparse._cusparse, "build_densemv_sparse_descriptor"):
+      self.skipTest("test requires the dense matvec kernels")
+    if dtypes.canonicalize_dtype(dtype) != dtype:
+      self.skipTest("test requires x64")
+    op = lambda M: M.T if transpose else M
+    M = rand_sparse(self.rng())(shape, dtype)
+    v = jtu.rand_default(self.rng())(op(M).shape[1], dtype)
+    nse = int((M != 0).sum())
+
+    @jit
+    def f(M, v):
+      data, indices, indptr = sparse.csr_fromdense(M, nse=nse)
+      return sparse.csr_matvec(data, indices, indptr, v, shape=shape,
+                               transpose=transpose)
+
+    # The product reads M directly; XLA drops the unused conversion.
+    module = str(f.lower(M, v).compiler_ir(dialect="mhlo"))
+    self.assertIn("cusparse_densemv_sparse", module)
+    self.assertNotIn("cusparse_csr_matvec", module)
+    self.assertAllClose(op(M) @ v, f(M, v), rtol=MATMUL_TOL)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}".format(
+          jtu.format_shape_dtype_string(shape, dtype)),
+       "shape": shape, "dtype": dtype}
+      for shape in [(5, 8), (40, 300)]
+      for dtype in [np.float32, np.complex64]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_shared_workspace(self, shape, dtype):
+    rng = rand_sparse(self.rng())
+    M = rng(shape, dtype)
+    v = jtu.rand_default(self.rng())(shape[1], dtype)
+    B = jtu.rand_default(self.rng())((shape[1], 3), dtype)
+    data, indices, indptr = sparse.csr_fromdense(M, nse=(M != 0).sum())
+
+    def todense(data, indices, indptr):
+      return sparse.csr_todense(data, indices, indptr, shape=shape)
+    def matvec(data, indices, indptr, v):
+      return sparse.csr_matvec(data, indices, indptr, v, shape=shape)
+    def matmat(data, indices, indptr, B):
+      return sparse.csr_matmat(data, indices, indptr, B, shape=shape)
+
+    cases = [(todense, (), M), (matvec, (v,), M @ v), (matmat, (B,), M @ B)]
+    with gpu_sparse.shared_workspace():
+      for f, args, expected in cases:
+        f = jit(f)
+        module = str(f.lower(data, indices, indptr, *args)
+                     .compiler_ir(dialect="mhlo"))
+        # The products use the stream's shared workspace, in place of an i8
+        # workspace result of their custom calls.
+        self.assertIsNone(re.search(r"tensor<\d+xi8>", module))
+        self.assertAllClose(expected, f(data, indices, indptr, *args),
+                            rtol=MATMUL_TOL)
+
+  @contextlib.contextmanager
+  def spmv_format(self, key, fmt):
+    """Makes cuda_spmv_auto dispatch the problem `key` to format `fmt`.
+
+    The tuned format is only used within ``gpu_sparse.autotuning()``.
+    """
+    cache = gpu_sparse._spmv_tune_cache
+    prev = cache.get(key)
+    cache[key] = fmt
+    try:
+      yield
+    finally:
+      if prev is None:
+        del cache[key]
+      else:
+        cache[key] = prev
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_{fmt}",
+       "shape": shape, "dtype": dtype, "fmt": fmt}
+      for shape in [(5, 8), (8, 5), (8, 8)]
+      for dtype in [np.float32, np.float64]
+      for fmt in ["csr", "coo", "light"]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_matvec_spmv_auto(self, shape, dtype, fmt):
+    v_rng = jtu.rand_default(self.rng())
+    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+    M = rng(shape, dtype)
+    v = v_rng(shape[1], dtype)
+
+    args = (M.data, M.indices.astype(np.int32), M.indptr.astype(np.int32), v)
+    matvec = jit(partial(sparse.csr_matvec, shape=shape))
+    key = (*shape, M.nnz, np.dtype(dtype), np.dtype(dtype), np.dtype(dtype),
+           np.dtype(np.int32), False)
+    with self.spmv_format(key, fmt):
+      # Outside of autotuning() products use the cuSPARSE CSR kernel.
+      module = str(matvec.lower(*args).compiler_ir(dialect="mhlo"))
+      if M.nnz > 0:
+        self.assertIn("cusparse_csr_matvec\"", module)
+      with gpu_sparse.autotuning():
+        tuned_matvec = jit(partial(sparse.csr_matvec, shape=shape))
+        self.assertAllClose(M.toarray() @ v, tuned_matvec(*args),
+                            rtol=MATMUL_TOL)
+    self.assertAllClose(M.toarray() @ v, matvec(*args), rtol=MATMUL_TOL)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_{}".format(
+          jtu.format_shape_dtype_string(shape, dtype), rows),
+       "shape": shape, "dtype": dtype, "rows": rows}
+      for shape in [(64, 300)]
+      for dtype in [np.float32, np.float64]
+      # Mean row lengths that pick vector sizes of 2, 8 and 32, and rows
+      # whose lengths differ by orders of magnitude.
+      for rows in ["short", "medium", "long", "skewed"]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_matvec_light(self, shape, dtype, rows):
+    if not hasattr(gpu_sparse._cusparse, "build_csr_matvec_light_descriptor"):
+      self.skipTest("test requires the LightSpMV kernel")
+    if dtypes.canonicalize_dtype(dtype) != dtype:
+      self.skipTest("test requires x64")
+    rng = self.rng()
+    row_lengths = {
+        "short": lambda i: rng.randint(0, 3),
+        "medium": lambda i: rng.randint(4, 9),
+        "long": lambda i: rng.randint(20, 60),
+        "skewed": lambda i: shape[1] if i % 16 == 0 else i % 3,
+    }[rows]
+    M = np.zeros(shape, dtype)
+    for i in range(shape[0]):
+      cols = rng.choice(shape[1], row_lengths(i), replace=False)
+      M[i, cols] = jtu.rand_default(rng)((len(cols),), dtype)
+    M = scipy.sparse.csr_matrix(M)
+    v = jtu.rand_default(rng)(shape[1], dtype)
+    args = (M.data, M.indices.astype(np.int32), M.indptr.astype(np.int32), v)
+
+    matvec_rule = partial(sparse_csr._csr_matvec_gpu_lowering,
+                          gpu_sparse.cuda_csr_matvec_light)
+    with self.cuda_lowering(sparse_csr.csr_matvec_p, matvec_rule):
+      matvec = jit(partial(sparse.csr_matvec, shape=shape))
+      self.assertAllClose(M.toarray() @ v, matvec(*args), rtol=MATMUL_TOL)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{np.dtype(dtype).name}", "dtype": dtype}
+      for dtype in [np.float32, np.float64]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_matvec_grouped(self, dtype):
+    if not hasattr(gpu_sparse._cusparse, "build_csr_matvec_grouped_descriptor"):
+      self.skipTest("test requires the grouped CSR matvec kernel")
+    if dtypes.canonicalize_dtype(dtype) != dtype:
+      self.skipTest("test requires x64")
+    # Includes a group without rows and one without nonzeros.
+    shapes = [(5, 8), (0, 4), (40, 33), (6, 6), (1, 70)]
+    nses = [0.5, 0, 0.3, 0, 0.8]
+    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+    v_rng = jtu.rand_default(self.rng())
+    mats = [rng(shape, dtype, nse=nse) for shape, nse in zip(shapes, nses)]
+    xs = [v_rng((shape[1],), dtype) for shape in shapes]
+    args = []
+    for M, x in zip(mats, xs):
+      args.extend([M.data, M.indices.astype(np.int32),
+                   M.indptr.astype(np.int32), x])
+
+    grouped_p = jax.core.Primitive("csr_matvec_grouped")
+    grouped_p.multiple_results = True
+    grouped_p.def_abstract_eval(
+        lambda *args: [jax.core.ShapedArray((rows,), dtype)
+                       for rows, _ in shapes])
+
+    def grouped_lowering(ctx, *args):
+      groups = [args[i:i + 4] for i in range(0, len(args), 4)]
+      return gpu_sparse.cuda_csr_matvec_grouped(
+          groups, shapes=shapes, data_dtype=np.dtype(dtype),
+          index_dtype=np.dtype(np.int32), x_dtype=np.dtype(dtype))
+    mlir.register_lowering(grouped_p, grouped_lowering, platform="cuda")
+
+    ys = jit(grouped_p.bind)(*args)
+    self.assertLen(ys, len(shapes))
+    for M, x, y in zip(mats, xs, ys):
+      self.assertEqual(y.shape, (M.shape[0],))
+      self.assertAllClose(M.toarray() @ x, y, rtol=MATMUL_TOL)
+
+  @contextlib.contextmanager
+  def cuda_lowering(self, prim, rule):
+    """Lowers `prim` with `rule` on CUDA within the context."""
+    lowerings = mlir._platform_specific_lowerings["cuda"]
+    prev = lowerings[prim]
+    mlir.register_lowering(prim, rule, platform="cuda")
+    try:
+      yield
+    finally:
+      lowerings[prim] = prev
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_{}_T={}".format(
+          jtu.format_shape_dtype_string(shape, np.float32),
+          np.dtype(index_dtype).name, transpose),
+       "shape": shape, "index_dtype": index_dtype, "transpose": transpose}
+      for shape in [(8, 5), (40, 300)]
+      for index_dtype in [np.int32, np.int64]
+      for transpose in [True, False]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_matvec_trailing_empty_rows(self, shape, index_dtype, transpose):
+    if dtypes.canonicalize_dtype(index_dtype) != index_dtype:
+      self.skipTest("test requires x64")
+    M = rand_sparse(self.rng())(shape, np.float32)
+    M[shape[0] // 2:] = 0
+    M = scipy.sparse.csr_matrix(M)
+    op = lambda M: M.T if transpose else M
+    v = jtu.rand_default(self.rng())(op(M).shape[1], np.float32)
+    indices = M.indices.astype(index_dtype)
+    indptr = M.indptr.astype(index_dtype)
+    self.assertEqual(indptr[-1], M.nnz)
+
+    # Debug builds check indptr[rows] == nnz on the device before the product.
+    matvec_rule = partial(sparse_csr._csr_matvec_gpu_lowering,
+                          gpu_sparse.cuda_csr_matvec)
+    with self.cuda_lowering(sparse_csr.csr_matvec_p, matvec_rule):
+      matvec = jit(partial(sparse.csr_matvec, shape=shape,
+                           transpose=transpose))
+      self.assertAllClose(op(M) @ v, matvec(M.data, indices, indptr, v),
+                          rtol=MATMUL_TOL)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_T={}".format(
+          jtu.format_shape_dtype_string(shape, dtype), transpose),
+       "shape": shape, "dtype": dtype, "transpose": transpose}
+      for shape in [(8, 5), (40, 300)]
+      for dtype in [np.float32, np.complex64]
+      for transpose in [True, False]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_matvec_repeated(self, shape, dtype, transpose):
+    # Both calls run the same executable, whose cached cuSPARSE descriptors
+    # must be rebound to each call's buffers.
+    op = lambda M: M.T if transpose else M
+    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+    v_rng = jtu.rand_default(self.rng())
+    M1 = rng(shape, dtype)
+    # A matrix with the same number of nonzeros but other rows and values.
+    M2 = M1[self.rng().permutation(shape[0])]
+    M2.data = v_rng(M2.data.shape, dtype)
+    matvec_rule = partial(sparse_csr._csr_matvec_gpu_lowering,
+                          gpu_sparse.cuda_csr_matvec)
+    with self.cuda_lowering(sparse_csr.csr_matvec_p, matvec_rule):
+      matvec = jit(partial(sparse.csr_matvec, shape=shape,
+                           transpose=transpose))
+      for M in [M1, M2, M1]:
+        v = v_rng(op(M).shape[1], dtype)
+        args = (M.data, M.indices.astype(np.int32), M.indptr.astype(np.int32),
+                v)
+        self.assertAllClose(op(M) @ v, matvec(*args), rtol=MATMUL_TOL)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}",
+       "shape": shape, "dtype": dtype}
+      for shape in [(5, 8), (8, 5), (8, 8)]
+      for dtype in [np.float32, np.float64, np.complex64]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_transpose_via_csc(self, shape, dtype):
+    if not hasattr(gpu_sparse._cusparse, "build_csr2csc_descriptor"):
+      self.skipTest("test requires cusparseCsr2cscEx2")
+    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+    M = rng(shape, dtype)
+    v = jtu.rand_default(self.rng())(shape[0], dtype)
+    B = jtu.rand_default(self.rng())((shape[0], 4), dtype)
+    indices, indptr = M.indices.astype(np.int32), M.indptr.astype(np.int32)
+
+    cases = [(sparse.csr_matvec, v, M.T @ v), (sparse.csr_matmat, B, M.T @ B)]
+    for enabled in [True, False]:
+      with gpu_sparse.transpose_via_csc(enabled):
+        for product, operand, expected in cases:
+          f = jit(partial(product, shape=shape, transpose=True))
+          module = str(f.lower(M.data, indices, indptr, operand)
+                       .compiler_ir(dialect="mhlo"))
+          self.assertEqual(enabled and M.nnz > 0,
+                           "cusparse_csr2csc" in module)
+          self.assertAllClose(expected, f(M.data, indices, indptr, operand),
+                              rtol=MATMUL_TOL)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, np.float32)}_T={transpose}",
+       "shape": shape, "transpose": transpose}
+      for shape in [(5, 8), (8, 5), (8, 8)]
+      for transpose in [True, False]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_bf16_storage(self, shape, transpose):
+    capability = getattr(jax.devices()[0], "compute_capability", None)
+    if capability is not None and float(capability) < 8.0:
+      self.skipTest("bfloat16 products require compute capability 8.0")
+    op = lambda M: M.T if transpose else M
+    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+    M = rng(shape, np.float32)
+    v = jtu.rand_default(self.rng())(op(M).shape[1], np.float32)
+    B = jtu.rand_default(self.rng())((op(M).shape[1], 4), np.float32)
+    indices, indptr = M.indices.astype(np.int32), M.indptr.astype(np.int32)
+    # The matrix and the dense operand are rounded to bfloat16.
+    bf16 = lambda x: np.asarray(x).astype(jnp.bfloat16).astype(np.float32)
+    M_bf16 = op(bf16(M.toarray()))
+    tol = {np.float32: 2e-2}
+    f32, bf16_dtype = np.dtype(np.float32), np.dtype(jnp.bfloat16)
+
+    def matvec_rule(ctx, data, indices, indptr, v, *, shape, transpose):
+      return [gpu_sparse.cuda_csr_matvec(
+          gpu_sparse.cuda_f32_to_bf16_csr(data), indices, indptr, v,
+          shape=shape, transpose=transpose, compute_dtype=f32,
+          compute_type=mlir.dtype_to_ir_type(f32), data_dtype=bf16_dtype,
+          index_dtype=np.dtype(np.int32), x_dtype=f32)]
+    with self.cuda_lowering(sparse_csr.csr_matvec_p, matvec_rule):
+      matvec = jit(partial(sparse.csr_matvec, shape=shape, transpose=transpose))
+      out = matvec(M.data, indices, indptr, v)
+    self.assertEqual(out.dtype, np.float32)
+    self.assertAllClose(M_bf16 @ bf16(v), out, atol=tol, rtol=tol)
+
+    def matmat_rule(ctx, data, indices, indptr, B, *, shape, transpose):
+      return [gpu_sparse.cuda_csr_matmat(
+          gpu_sparse.cuda_f32_to_bf16_csr(data), indices, indptr, B,
+          shape=shape, transpose=transpose, compute_dtype=f32,
+          compute_type=mlir.dtype_to_ir_type(f32), data_dtype=bf16_dtype,
+          index_dtype=np.dtype(np.int32), B_dtype=f32)]
+    with self.cuda_lowering(sparse_csr.csr_matmat_p, matmat_rule):
+      matmat = jit(partial(sparse.csr_matmat, shape=shape, transpose=transpose))
+      out = matmat(M.data, indices, indptr, B)
+    self.assertEqual(out.dtype, np.float32)
+    self.assertAllClose(M_bf16 @ bf16(B), out, atol=tol, rtol=tol)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_nse={nse}_T={transpose}",
+       "shape": shape, "dtype": dtype, "nse": nse, "transpose": transpose}
+      for shape in [(5, 8), (8, 5), (5, 5), (8, 8), (0, 5), (5, 0)]
+      for nse in [0.5, 0]
       for dtype in all_dtypes
       for transpose in [True, False]))
-  def test_csr_matmat(self, shape, dtype, transpose):
+  def test_csr_matmat(self, shape, dtype, nse, transpose):
     op = lambda M: M.T if transpose else M
 
     B_rng = jtu.rand_default(self.rng())
-    rng = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)
+    rng = rand_sparse(self.rng(), nse=nse, post=scipy.sparse.csr_matrix)
     M = rng(shape, dtype)
     B = B_rng((op(M).shape[1], 4), dtype)
 
     args = (M.data, M.indices, M.indptr, B)
     matmat = lambda *args: sparse.csr_matmat(*args, shape=shape, transpose=transpose)
 
+    # Non-transposed float16 products run on the tiled Tensor Core kernel.
+    tiled = (jtu.device_under_test() == "gpu" and jtu.is_device_cuda() and
+             gpu_sparse and gpu_sparse.cuda_is_supported and
+             gpu_sparse.cuda_csr_matmat_tiled_supported(
+                 transpose=transpose, compute_dtype=None,
+                 index_dtype=M.indices.dtype, data_dtype=dtype, B_dtype=dtype))
     self.assertAllClose(op(M) @ B, matmat(*args), rtol=MATMUL_TOL)
-    with self.gpu_matmul_warning_context(dtype):
+    with (self.assertNoWarnings() if tiled
+          else self.gpu_matmul_warning_context(dtype)):
       self.assertAllClose(op(M) @ B, jit(matmat)(*args), rtol=MATMUL_TOL)
 
   @parameterized.named_parameters(jtu.cases_from_list(
-      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}",
-       "shape": shape, "dtype": dtype}
-      for shape in [(5, 8), (8, 5), (5, 5), (8, 8)]
+      {"testcase_name": "_{}_T={}".format(
+          jtu.format_shape_dtype_string(shape, dtype), transpose),
+       "shape": shape, "dtype": dtype, "transpose": transpose}
+      for shape in [(5, 8), (40, 300)]
+      for dtype in [np.float32, np.float64]
+      for transpose in [True, False]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_matmat_autotuning(self, shape, dtype, transpose):
+    if not hasattr(gpu_sparse._cusparse, "time_csrmm"):
+      self.skipTest("test requires cuSPARSE algorithm timing")
+    if dtypes.canonicalize_dtype(dtype) != dtype:
+      self.skipTest("test requires x64")
+    op = lambda M: M.T if transpose else M
+    M = rand_sparse(self.rng(), post=scipy.sparse.csr_matrix)(shape, dtype)
+    B = jtu.rand_default(self.rng())((op(M).shape[1], 4), dtype)
+    args = (M.data, M.indices, M.indptr, B)
+    expected = jit(partial(sparse.csr_matmat, shape=shape,
+                           transpose=transpose))(*args)
+
+    cache = gpu_sparse._alg_cache
+    prev = dict(cache)
+    cache.clear()
+    try:
+      with gpu_sparse.autotuning():
+        matmat = jit(partial(sparse.csr_matmat, shape=shape,
+                             transpose=transpose))
+        out = matmat(*args)
+      self.assertLen(cache, 1)
+      alg, = cache.values()
+      self.assertIn(alg, gpu_sparse._cusparse.spmm_csr_algorithms())
+    finally:
+      cache.clear()
+      cache.update(prev)
+    self.assertAllClose(expected, out, rtol=MATMUL_TOL)
+    self.assertAllClose(op(M) @ B, out, rtol=MATMUL_TOL)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_n={}_{}_duplicates={}".format(
+          jtu.format_shape_dtype_string(shape, np.float16), n,
+          np.dtype(out_dtype).name, duplicates),
+       "shape": shape, "n": n, "out_dtype": out_dtype,
+       "duplicates": duplicates}
+      for shape in [(20, 100), (16, 64), (33, 200)]
+      for n in [8, 70]
+      for out_dtype in [np.float16, np.float32]
+      for duplicates in [False, True]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_csr_matmat_tiled(self, shape, n, out_dtype, duplicates):
+    if not hasattr(gpu_sparse._cusparse, "build_csr_matmat_tiled_descriptor"):
+      self.skipTest("test requires the tiled CSR matmat kernel")
+    rng = rand_sparse(self.rng(), nse=0.2, post=scipy.sparse.csr_matrix)
+    M = rng(shape, np.float16)
+    B = jtu.rand_default(self.rng())((shape[1], n), np.float16)
+    data, indices, indptr = M.data, M.indices, M.indptr
+    dense = M.toarray().astype(np.float32)
+    if duplicates:
+      # Follow the entries of each row with the same columns again, holding
+      # new values. The column indices of a row are then no longer sorted.
+      data2 = jtu.rand_default(self.rng())(M.data.shape, np.float16)
+      starts, ends = M.indptr[:-1], M.indptr[1:]
+      data = np.concatenate(
+          [np.concatenate([M.data[a:b], data2[a:b]])
+           for a, b in zip(starts, ends)])
+      indices = np.concatenate(
+          [np.tile(M.indices[a:b], 2) for a, b in zip(starts, ends)])
+      indptr = 2 * M.indptr
+      dense += scipy.sparse.csr_matrix(
+          (data2, M.indices, M.indptr), shape=shape).toarray().astype(np.float32)
+    indices, indptr = indices.astype(np.int32), indptr.astype(np.int32)
+    expected = dense @ B.astype(np.float32)
+    tol = {np.float16: 1e-2, np.float32: 1e-2}
+
+    matmat = jit(partial(sparse.csr_matmat, shape=shape))
+    if out_dtype == np.float16:
+      # The default CUDA lowering of float16 products uses the tiled kernel.
+      args = (data, indices, indptr, B)
+      module = str(matmat.lower(*args).compiler_ir(dialect="mhlo"))
+      self.assertIn("cusparse_csr_matmat_tiled", module)
+      with self.assertNoWarnings():
+        out = matmat(*args)
+    else:
+      f16, f32 = np.dtype(np.float16), np.dtype(np.float32)
+
+      def to_f16(x):
+        shape = ir.RankedTensorType(x.type).shape
+        return mhlo.ConvertOp(
+            ir.RankedTensorType.get(shape, mlir.dtype_to_ir_type(f16)),
+            x).result
+
+      # The operands are passed in f32 and rounded back to f16, which is exact.
+      def matmat_rule(ctx, data, indices, indptr, B, *, shape, transpose):
+        return [gpu_sparse.cuda_csr_matmat_tiled(
+            to_f16(data), indices, indptr, to_f16(B), shape=shape,
+            transpose=transpose, compute_dtype=f32,
+            compute_type=mlir.dtype_to_ir_type(f32),
+            index_dtype=np.dtype(np.int32), data_dtype=f16, B_dtype=f16)]
+      with self.cuda_lowering(sparse_csr.csr_matmat_p, matmat_rule):
+        out = matmat(data.astype(np.float32), indices, indptr,
+                     B.astype(np.float32))
+    self.assertEqual(out.dtype, out_dtype)
+    self.assertAllClose(expected.astype(out_dtype), out, atol=tol, rtol=tol)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_block_size={}_n={}".format(
+          jtu.format_shape_dtype_string(block_shape, dtype), block_size, n),
+       "block_shape": block_shape, "block_size": block_size, "n": n,
+       "dtype": dtype}
+      for block_shape in [(3, 5), (4, 2), (1, 1)]
+      for block_size in [8, 16]
+      for n in [16, 40]
+      for dtype in [np.float16, np.float32]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_bsr_matmat(self, block_shape, block_size, n, dtype):
+    if not hasattr(gpu_sparse._cusparse, "build_bsr_matmat_descriptor"):
+      self.skipTest("test requires cuSPARSE 11.4")
+    rng = self.rng()
+    block_rows, block_cols = block_shape
+    shape = (block_rows * block_size, block_cols * block_size)
+    # Pick the nonzero blocks of each block row; rows with fewer blocks than
+    # the widest are padded with -1.
+    row_blocks = [np.sort(rng.choice(block_cols, rng.randint(block_cols + 1),
+                                     replace=False))
+                  for _ in range(block_rows)]
+    ell_width = max(1, max(len(cols) for cols in row_blocks))
+    ell_col_ind = np.full((block_rows, ell_width), -1, np.int32)
+    ell_values = np.zeros((shape[0], ell_width * block_size), dtype)
+    blocks = jtu.rand_default(rng)(
+        (sum(len(cols) for cols in row_blocks), block_size, block_size), dtype)
+    k = 0
+    for i, cols in enumerate(row_blocks):
+      for j, col in enumerate(cols):
+        ell_col_ind[i, j] = col
+        ell_values[i * block_size:(i + 1) * block_size,
+                   j * block_size:(j + 1) * block_size] = blocks[k]
+        k += 1
+    M = scipy.sparse.bsr_matrix(
+        (blocks, np.concatenate(row_blocks).astype(np.int32),
+         np.cumsum([0] + [len(cols) for cols in row_blocks])),
+        shape=shape, blocksize=(block_size, block_size))
+    B = jtu.rand_default(rng)((shape[1], n), dtype)
+
+    bsr_matmat_p = jax.core.Primitive("bsr_matmat")
+    bsr_matmat_p.def_abstract_eval(
+        lambda ell_values, ell_col_ind, B: jax.core.ShapedArray(
+            (shape[0], n), dtype))
+
+    def bsr_matmat_lowering(ctx, ell_values, ell_col_ind, B):
+      return [gpu_sparse.cuda_bsr_matmat(
+          ell_values, ell_col_ind, B, shape=shape, block_size=block_size,
+          index_dtype=np.dtype(np.int32), data_dtype=np.dtype(dtype),
+          B_dtype=np.dtype(dtype))]
+    mlir.register_lowering(bsr_matmat_p, bsr_matmat_lowering,
+                           platform="cuda")
+
+    out = jit(bsr_matmat_p.bind)(ell_values, ell_col_ind, B)
+    expected = (M.astype(np.float32) @ B.astype(np.float32)).astype(dtype)
+    # float16 products may accumulate in float16.
+    tol = {np.float16: 5e-2, np.float32: 1e-5}
+    self.assertAllClose(expected, out, atol=tol, rtol=tol)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_n={}_T={}_tuned={}".format(
+          jtu.format_shape_dtype_string(shape, dtype), n, transpose, tuned),
+       "shape": shape, "n": n, "dtype": dtype, "transpose": transpose,
+       "tuned": tuned}
+      for shape in [(32, 64), (64, 128)]
+      for n in [32, 64]
+      for dtype in [np.float16, np.float32]
+      for transpose in [False, True]
+      for tuned in [False, True]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported and
+                        gpu_sparse._cusparse.cusparselt_supported),
+                   "test requires cusparseLt")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_spmm24(self, shape, n, dtype, transpose, tuned):
+    capability = getattr(jax.devices()[0], "compute_capability", None)
+    if capability is not None and float(capability) < 8.0:
+      self.skipTest("2:4 sparse products require compute capability 8.0")
+    rng = jtu.rand_default(self.rng())
+    # Keep the two largest of every four consecutive elements along the
+    # reduction dimension of op(A).
+    A_op = rng(shape[::-1] if transpose else shape, dtype)
+    m, k = A_op.shape
+    groups = A_op.reshape(m, k // 4, 4)
+    smallest = np.argsort(np.abs(groups), axis=-1)[..., :2]
+    np.put_along_axis(groups, smallest, 0, axis=-1)
+    A_op = groups.reshape(m, k)
+    A = A_op.T if transpose else A_op
+    B = rng((k, n), dtype)
+    data_dtype = np.dtype(dtype)
+
+    spmm24_p = jax.core.Primitive("spmm24")
+    spmm24_p.def_abstract_eval(
+        lambda A, B: jax.core.ShapedArray((m, n), B.dtype))
+
+    def spmm24_lowering(ctx, A, B):
+      compressed = gpu_sparse.cuda_spmm24_compress(
+          A, n=n, data_dtype=data_dtype, transpose=transpose)
+      return [gpu_sparse.cuda_spmm24(compressed, B, shape=shape,
+                                     data_dtype=data_dtype,
+                                     transpose=transpose)]
+    mlir.register_lowering(spmm24_p, spmm24_lowering, platform="cuda")
+
+    with gpu_sparse.autotuning(tuned):
+      out = jit(spmm24_p.bind)(A, B)
+    # float32 products are computed in TF32 precision.
+    tol = {np.float16: 2e-2, np.float32: 2e-2}
+    self.assertEqual(out.dtype, dtype)
+    self.assertAllClose(A_op.astype(np.float32) @ B.astype(np.float32),
+                        out.astype(np.float32), atol=tol, rtol=tol)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_nse={nse}",
+       "shape": shape, "dtype": dtype, "nse": nse}
+      for shape in [(5, 8), (8, 5), (5, 5), (8, 8), (0, 5), (5, 0)]
+      for nse in [0.5, 0]
       for dtype in all_dtypes))
-  def test_coo_todense(self, shape, dtype):
-    rng = rand_sparse(self.rng(), post=scipy.sparse.coo_matrix)
+  def test_coo_todense(self, shape, dtype, nse):
+    rng = rand_sparse(self.rng(), nse=nse, post=scipy.sparse.coo_matrix)
     M = rng(shape, dtype)
 
     args = (M.data, M.row, M.col)
@@ -351,12 +1044,13 @@ class cuSparseTest(jtu.JaxTestCase):
       self.assertArraysEqual(M.toarray(), jit(todense)(*args))
 
   @parameterized.named_parameters(jtu.cases_from_list(
-      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}",
-       "shape": shape, "dtype": dtype}
-      for shape in [(5, 8), (8, 5), (5, 5), (8, 8)]
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_nse={nse}",
+       "shape": shape, "dtype": dtype, "nse": nse}
+      for shape in [(5, 8), (8, 5), (5, 5), (8, 8), (0, 5), (5, 0)]
+      for nse in [0.5, 0]
       for dtype in all_dtypes))
-  def test_coo_fromdense(self, shape, dtype):
-    rng = rand_sparse(self.rng())
+  def test_coo_fromdense(self, shape, dtype, nse):
+    rng = rand_sparse(self.rng(), nse=nse)
     M = rng(shape, dtype)
     M_coo = scipy.sparse.coo_matrix(M)
 
@@ -376,16 +1070,48 @@ class cuSparseTest(jtu.JaxTestCase):
     self.assertArraysEqual(col, M_coo.col.astype(index_dtype))
 
   @parameterized.named_parameters(jtu.cases_from_list(
-      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_T={transpose}",
-       "shape": shape, "dtype": dtype, "transpose": transpose}
-      for shape in [(5, 8), (8, 5), (5, 5), (8, 8)]
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}",
+       "shape": shape, "dtype": dtype}
+      for shape in [(5, 8), (8, 5), (8, 8)]
+      for dtype in [np.float32, np.float64]))
+  @unittest.skipIf(not (gpu_sparse and gpu_sparse.cuda_is_supported),
+                   "test requires cusparse")
+  @unittest.skipIf(jtu.device_under_test() != "gpu", "test requires GPU")
+  def test_coo_fromdense_packed(self, shape, dtype):
+    rng = rand_sparse(self.rng())
+    M = rng(shape, dtype)
+    M_coo = scipy.sparse.coo_matrix(M)
+
+    results = []
+    for packed in [False, True]:
+      rule = partial(sparse_coo._coo_fromdense_gpu_lowering,
+                     partial(gpu_sparse.cuda_coo_fromdense, packed=packed))
+      with self.cuda_lowering(sparse_coo.coo_fromdense_p, rule):
+        # A new partial each time, so that jit lowers it again with `rule`.
+        fromdense = jit(partial(sparse_coo._coo_fromdense, nse=M_coo.nnz,
+                                index_dtype=jnp.int32))
+        results.append(fromdense(M))
+    (data, row, col), (packed_data, packed_row, packed_col) = results
+    self.assertArraysEqual(packed_data, data)
+    self.assertArraysEqual(packed_row, row)
+    self.assertArraysEqual(packed_col, col)
+    self.assertEqual(packed_row.dtype, np.int32)
+    self.assertArraysEqual(packed_data, M_coo.data.astype(dtype))
+    self.assertArraysEqual(packed_row, M_coo.row.astype(np.int32))
+    self.assertArraysEqual(packed_col, M_coo.col.astype(np.int32))
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_nse={nse}_T={transpose}",
+       "shape": shape, "dtype": dtype, "nse": nse, "transpose": transpose}
+      for shape in [(5, 8), (8, 5), (5, 5), (8, 8), (0, 5), (5, 0)]
+      for nse in [0.5, 0]
       for dtype in all_dtypes
       for transpose in [True, False]))
-  def test_coo_matvec(self, shape, dtype, transpose):
+  def test_coo_matvec(self, shape, dtype, nse, transpose):
     op = lambda M: M.T if transpose else M
 
     v_rng = jtu.rand_default(self.rng())
-    rng = rand_sparse(self.rng(), post=scipy.sparse.coo_matrix)
+    rng = rand_sparse(self.rng(), nse=nse, post=scipy.sparse.coo_matrix)
     M = rng(shape, dtype)
     v = v_rng(op(M).shape[1], dtype)
 
@@ -397,17 +1123,18 @@ class cuSparseTest(jtu.JaxTestCase):
       self.assertAllClose(op(M) @ v, jit(matvec)(*args), rtol=MATMUL_TOL)
 
   @parameterized.named_parameters(jtu.cases_from_list(
-      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_T={transpose}",
-       "shape": shape, "dtype": dtype, "transpose": transpose}
-      for shape in [(5, 8), (8, 5), (5, 5), (8, 8)]
+      {"testcase_name": f"_{jtu.format_shape_dtype_string(shape, dtype)}_nse={nse}_T={transpose}",
+       "shape": shape, "dtype": dtype, "nse": nse, "transpose": transpose}
+      for shape in [(5, 8), (8, 5), (5, 5), (8, 8), (0, 5), (5, 0)]
+      for nse in [0.5, 0]
       for dtype in all_dtypes
       for transpose in [True, False]))
   @jtu.skip_on_devices("rocm")  # will be fixed in rocm-5.1
-  def test_coo_matmat(self, shape, dtype, transpose):
+  def test_coo_matmat(self, shape, dtype, nse, transpose):
     op = lambda M: M.T if transpose else M
 
     B_rng = jtu.rand_default(self.rng())
-    rng = rand_sparse(self.rng(), post=scipy.sparse.coo_matrix)
+    rng = rand_sparse(self.rng(), nse=nse, post=scipy.sparse.coo_matrix)
     M = rng(shape, dtype)
     B = B_rng((op(M).shape[1], 4), dtype)
 